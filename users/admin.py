@@ -4,7 +4,8 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from .models import (
     User, Location, Property, Booking, Payment, Review, Message, PropertyMedia,
     Notification, BookingInquiry, Room, Amenity, PropertyAmenity, Favorite, Manager,
-    MaintenanceRequest, SupportTicket
+    MaintenanceRequest, SupportTicket, DeviceToken, NotificationPreference,
+    NotificationArchive, MessageArchive, ChatSession, ChatTurn, PaymentEvent
 )
 
 @admin.register(User)
@@ -51,18 +52,36 @@ class SupportTicketAdmin(admin.ModelAdmin):
 
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'sender', 'receiver', 'sent_at', 'read_status', 'is_chatbot_message', 'is_deleted')
+    list_display = ('id', 'sender', 'receiver', 'sent_at', 'read_status', 'is_deleted')
     list_filter = ('read_status', 'is_deleted')
     search_fields = ('content', 'sender__username', 'receiver__username')
-    
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs
 
-    def is_chatbot_message(self, obj):
-        return obj.sender == obj.receiver
-    is_chatbot_message.boolean = True
-    is_chatbot_message.short_description = 'Chatbot?'
+class ChatTurnInline(admin.TabularInline):
+    model = ChatTurn
+    fields = ('created_at', 'intent_name', 'message', 'response')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+@admin.register(ChatSession)
+class ChatSessionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'started_at', 'last_activity')
+    search_fields = ('user__username',)
+    list_select_related = ('user',)
+    inlines = [ChatTurnInline]
+
+@admin.register(DeviceToken)
+class DeviceTokenAdmin(admin.ModelAdmin):
+    list_display = ('user', 'platform', 'last_seen', 'created_at')
+    list_filter = ('platform',)
+    search_fields = ('user__username', 'token')
+
+@admin.register(PaymentEvent)
+class PaymentEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event_type', 'payment_intent_id', 'status', 'created', 'processed_at')
+    list_filter = ('status', 'event_type')
+    search_fields = ('event_id', 'payment_intent_id')
+    readonly_fields = ('event_id', 'event_type', 'payment_intent_id', 'created', 'payload', 'received_at')
 
 # Basic registration for remaining models
 admin.site.register(Location)
@@ -71,6 +90,9 @@ admin.site.register(Payment)
 admin.site.register(Review)
 admin.site.register(PropertyMedia)
 admin.site.register(Notification)
+admin.site.register(NotificationPreference)
+admin.site.register(NotificationArchive)
+admin.site.register(MessageArchive)
 admin.site.register(BookingInquiry)
 admin.site.register(Amenity)
 admin.site.register(PropertyAmenity)
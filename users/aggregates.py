@@ -0,0 +1,110 @@
+# users/aggregates.py
+# Review, favourite and booking aggregates kept on Property itself, so
+# listings show, filter and sort by them without joining Review, Favorite or
+# Booking. A new row bumps its property's counters with one atomic UPDATE;
+# edits and deletes recompute the affected properties from their live rows,
+# and reconcile_aggregates() does that for every property to repair drift
+# from writes that skip signals (bulk imports, raw SQL).
+from django.db.models import Avg, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Abs, Cast, Coalesce
+
+from . import catalogue
+from .models import Booking, Favorite, Property, Review
+
+AGGREGATE_FIELDS = ('review_count', 'rating_total', 'average_rating', 'favorite_count', 'booking_count')
+
+# ``sort_by`` values for list and nearby; heaviest first, ties broken by id.
+SORTS = {
+    'rating': (F('average_rating').desc(nulls_last=True), '-review_count', 'pk'),
+    'reviews': ('-review_count', 'pk'),
+    'favorites': ('-favorite_count', 'pk'),
+    'bookings': ('-booking_count', 'pk'),
+}
+MINIMUMS = {
+    'rating_min': ('average_rating', float),
+    'reviews_min': ('review_count', int),
+    'favorites_min': ('favorite_count', int),
+    'bookings_min': ('booking_count', int),
+}
+
+
+def review_added(property_id, rating):
+    # Every F() below reads the row as it was before this UPDATE.
+    Property._base_manager.filter(pk=property_id).update(
+        review_count=F('review_count') + 1,
+        rating_total=F('rating_total') + rating,
+        average_rating=Cast(F('rating_total') + rating, FloatField()) / (F('review_count') + 1),
+    )
+
+
+def favorite_added(property_id):
+    Property._base_manager.filter(pk=property_id).update(favorite_count=F('favorite_count') + 1)
+
+
+def favorite_removed(property_id):
+    Property._base_manager.filter(pk=property_id, favorite_count__gt=0).update(favorite_count=F('favorite_count') - 1)
+
+
+def booking_added(property_id):
+    Property._base_manager.filter(pk=property_id).update(booking_count=F('booking_count') + 1)
+
+
+def _per_property(model, aggregate):
+    rows = model._base_manager.filter(property=OuterRef('pk'))
+    if hasattr(model, 'is_deleted'):
+        rows = rows.filter(is_deleted=False)
+    return Subquery(rows.order_by().values('property').annotate(value=aggregate).values('value'))
+
+
+def true_aggregates():
+    """The aggregates computed from the rows, as expressions over an outer Property queryset."""
+    return {
+        'review_count': Coalesce(_per_property(Review, Count('pk')), Value(0)),
+        'rating_total': Coalesce(_per_property(Review, Sum('rating')), Value(0)),
+        'average_rating': _per_property(Review, Avg('rating', output_field=FloatField())),
+        'favorite_count': Coalesce(_per_property(Favorite, Count('pk')), Value(0)),
+        'booking_count': Coalesce(_per_property(Booking, Count('pk')), Value(0)),
+    }
+
+
+def refresh_aggregates(property_ids):
+    """Recompute the aggregates of ``property_ids`` in one UPDATE."""
+    property_ids = set(property_ids)
+    if property_ids:
+        Property._base_manager.filter(pk__in=property_ids).update(**true_aggregates())
+
+
+def reconcile_aggregates(batch_size=1000):
+    """Recompute drifted aggregates, ``batch_size`` properties at a time. Returns how many were wrong."""
+    expected = {f'expected_{name}': expression for name, expression in true_aggregates().items()}
+    expected['rating_error'] = Abs(F('average_rating') - F('expected_average_rating'))
+    drifted = Q()
+    for name in ('review_count', 'rating_total', 'favorite_count', 'booking_count'):
+        drifted |= ~Q(**{name: F(f'expected_{name}')})
+    # Averages are compared with a tolerance: the database's AVG() may round differently.
+    drifted |= Q(rating_error__gt=1e-6)
+    drifted |= Q(average_rating__isnull=True, expected_average_rating__isnull=False)
+    drifted |= Q(average_rating__isnull=False, expected_average_rating__isnull=True)
+    fixed, last_pk = 0, 0
+    while True:
+        batch = list(
+            Property._base_manager.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return fixed
+        last_pk = batch[-1]
+        wrong = list(
+            Property._base_manager.filter(pk__in=batch).annotate(**expected).filter(drifted).values_list('pk', flat=True)
+        )
+        refresh_aggregates(wrong)
+        catalogue.schedule_refresh(wrong)
+        fixed += len(wrong)
+
+
+def filter_by_aggregates(queryset, params):
+    """Apply ``?rating_min=4&reviews_min=10``-style thresholds; raises ValueError on a malformed number."""
+    for param, (field, cast) in MINIMUMS.items():
+        value = params.get(param)
+        if value not in (None, ''):
+            queryset = queryset.filter(**{f'{field}__gte': cast(value)})
+    return queryset
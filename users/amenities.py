@@ -0,0 +1,84 @@
+# users/amenities.py
+# "Has all of these amenities" filtering. Every Amenity owns one bit and
+# Property.amenity_mask ORs together the bits of the property's amenities, so
+# requiring several amenities is one bitwise AND on the property row instead of
+# a join per amenity or a GROUP BY/HAVING over PropertyAmenity.
+from collections import defaultdict
+
+from django.db.models import F, Q
+
+from .models import Amenity, Property, PropertyAmenity
+
+
+def bit_mask(bits):
+    mask = 0
+    for bit in bits:
+        mask |= 1 << bit
+    return mask
+
+
+def required_mask(param):
+    """
+    Mask for an ``amenities`` query parameter: comma-separated amenity ids or
+    (case-insensitive) names. Returns None when any of them is unknown.
+    """
+    wanted = [value.strip() for value in param.split(',') if value.strip()]
+    ids = {int(value) for value in wanted if value.isdigit()}
+    names = {value.lower() for value in wanted if not value.isdigit()}
+    lookup = Q(pk__in=ids)
+    for name in names:
+        lookup |= Q(name__iexact=name)
+    found = list(Amenity.objects.filter(lookup, bit__isnull=False).values_list('pk', 'name', 'bit'))
+    if ids - {pk for pk, _, _ in found} or names - {name.lower() for _, name, _ in found}:
+        return None
+    return bit_mask(bit for _, _, bit in found)
+
+
+def filter_by_amenities(queryset, param):
+    """Properties of ``queryset`` that have every amenity listed in ``param``."""
+    mask = required_mask(param)
+    if mask is None:
+        return queryset.none()
+    if not mask:
+        return queryset
+    return queryset.alias(matched_amenities=F('amenity_mask').bitand(mask)).filter(matched_amenities=mask)
+
+
+def add_amenity(property_id, amenity_id):
+    bit = Amenity.objects.filter(pk=amenity_id).values_list('bit', flat=True).first()
+    if bit is not None:
+        Property._base_manager.filter(pk=property_id).update(amenity_mask=F('amenity_mask').bitor(1 << bit))
+
+
+def remove_amenity(property_id, amenity_id):
+    bit = Amenity.objects.filter(pk=amenity_id).values_list('bit', flat=True).first()
+    if bit is not None:
+        Property._base_manager.filter(pk=property_id).update(amenity_mask=F('amenity_mask').bitand(~(1 << bit)))
+
+
+def clear_amenity_bit(bit):
+    """Drop a deleted amenity's bit everywhere so a later amenity can reuse it."""
+    Property._base_manager.filter(amenity_mask__gt=0).update(amenity_mask=F('amenity_mask').bitand(~(1 << bit)))
+
+
+def rebuild_amenity_masks(property_ids=None, batch_size=1000):
+    """
+    Recompute masks from PropertyAmenity, e.g. after bulk_create (which skips
+    the signals that keep them current). Returns the number of rows changed.
+    """
+    properties = Property._base_manager.all()
+    links = PropertyAmenity.objects.all()
+    if property_ids is not None:
+        properties = properties.filter(pk__in=property_ids)
+        links = links.filter(property_id__in=property_ids)
+    masks = defaultdict(int)
+    links = links.filter(amenity__bit__isnull=False).values_list('property_id', 'amenity__bit')
+    for property_id, bit in links.iterator(chunk_size=10000):
+        masks[property_id] |= 1 << bit
+    stale = [
+        Property(pk=pk, amenity_mask=masks.get(pk, 0))
+        for pk, mask in properties.values_list('pk', 'amenity_mask').iterator(chunk_size=10000)
+        if mask != masks.get(pk, 0)
+    ]
+    Property._base_manager.bulk_update(stale, ['amenity_mask'], batch_size=batch_size)
+    return len(stale)
@@ -4,4 +4,6 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
-#
\ No newline at end of file
+
+    def ready(self):
+        from . import signals  # noqa: F401
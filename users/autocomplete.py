@@ -0,0 +1,229 @@
+# users/autocomplete.py
+# Search-box suggestions for property names, cities and regions: a sorted
+# array of normalized keys searched by binary search, so each keystroke is two
+# bisects and a top-k over the matching slice instead of an icontains scan.
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter
+
+from django.db.models import Count
+
+from .lazy_index import LazyIndex
+from .name_index import normalize
+
+KINDS = ('property', 'city', 'region')
+# Prefixes matching more keys than this keep their top-k until a write reaches them.
+CACHE_THRESHOLD = 2000
+
+
+def prefix_keys(label):
+    """A label is found by any prefix of any of its words: "ocean view" -> "ocean view", "view"."""
+    words = normalize(label).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """
+    Sorted ``(key, entry)`` pairs, where an entry is ``('property', pk)``,
+    ``('city', name)`` or ``('region', name)``. A property weighs its bookings
+    plus favourites; a city or region weighs the number of listings in it.
+
+    Updates are incremental: changing one property moves its own keys and the
+    listing counts of its old and new city and region.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._labels = {}
+        self._weights = {}
+        self._places = {}  # property pk -> (city entry, region entry)
+        self._top = {}
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def _put(self, entry, label, weight):
+        if self._labels.get(entry) != label:
+            self._drop(entry)
+            for key in prefix_keys(label):
+                bisect.insort(self._keys, (key, entry))
+            self._labels[entry] = label
+        self._weights[entry] = weight
+        self._forget(label)
+
+    def _drop(self, entry):
+        label = self._labels.pop(entry, None)
+        if label is None:
+            return
+        for key in prefix_keys(label):
+            position = bisect.bisect_left(self._keys, (key, entry))
+            if position < len(self._keys) and self._keys[position] == (key, entry):
+                del self._keys[position]
+        del self._weights[entry]
+        self._forget(label)
+
+    def _forget(self, label):
+        """Drop the cached top-k lists of every prefix that can reach ``label``."""
+        if self._top:
+            for key in prefix_keys(label):
+                for end in range(1, len(key) + 1):
+                    self._top.pop(key[:end], None)
+
+    def _count_place(self, entry, label, delta):
+        weight = self._weights.get(entry, 0) + delta
+        if weight > 0:
+            self._put(entry, self._labels.get(entry, label), weight)
+        else:
+            self._drop(entry)
+
+    def load(self, rows):
+        """Fill an empty index with one sort; ``rows`` are ``set_property`` arguments."""
+        keys, place_labels, place_counts = [], {}, Counter()
+        with self._lock:
+            for pk, name, city, region, popularity in rows:
+                places = self._place_entries(city, region)
+                for entry, label in zip(places, (city, region)):
+                    if entry:
+                        place_labels.setdefault(entry, label)
+                        place_counts[entry] += 1
+                self._places[pk] = places
+                self._labels[('property', pk)] = name
+                self._weights[('property', pk)] = popularity
+                keys.extend((key, ('property', pk)) for key in prefix_keys(name))
+            for entry, count in place_counts.items():
+                self._labels[entry] = place_labels[entry]
+                self._weights[entry] = count
+                keys.extend((key, entry) for key in prefix_keys(place_labels[entry]))
+            keys.sort()
+            self._keys = keys
+            self._top.clear()
+
+    @staticmethod
+    def _place_entries(city, region):
+        return (
+            ('city', normalize(city)) if city else None,
+            ('region', normalize(region)) if region else None,
+        )
+
+    def set_property(self, pk, name, city, region, popularity):
+        places = self._place_entries(city, region)
+        labels = (city, region)
+        with self._lock:
+            self._put(('property', pk), name, popularity)
+            old = self._places.get(pk, (None, None))
+            if old != places:
+                for entry in old:
+                    if entry:
+                        self._count_place(entry, None, -1)
+                for entry, label in zip(places, labels):
+                    if entry:
+                        self._count_place(entry, label, 1)
+                self._places[pk] = places
+
+    def remove_property(self, pk):
+        with self._lock:
+            self._drop(('property', pk))
+            for entry in self._places.pop(pk, ()):
+                if entry:
+                    self._count_place(entry, None, -1)
+
+    def search(self, prefix, limit=10, kinds=KINDS):
+        """Return up to ``limit`` ``(kind, id, label, weight)`` tuples, heaviest first."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        kinds = tuple(kind for kind in KINDS if kind in kinds)
+        with self._lock:
+            cached = self._top.get(prefix, {}).get((kinds, limit))
+            if cached is not None:
+                return cached
+            lo = bisect.bisect_left(self._keys, (prefix,))
+            hi = bisect.bisect_left(self._keys, (prefix + '\uffff',))
+            entries = {entry for _, entry in self._keys[lo:hi] if entry[0] in kinds}
+            top = heapq.nsmallest(
+                limit, entries,
+                key=lambda entry: (-self._weights[entry], len(self._labels[entry]), self._labels[entry], entry[0])
+            )
+            results = [
+                (kind, value if kind == 'property' else None, self._labels[(kind, value)], self._weights[(kind, value)])
+                for kind, value in top
+            ]
+            if hi - lo > CACHE_THRESHOLD:
+                self._top.setdefault(prefix, {})[(kinds, limit)] = results
+            return results
+
+
+def _popularity(property_ids=None):
+    from .models import Booking, Favorite
+
+    popularity = Counter()
+    for model in (Booking, Favorite):
+        rows = model.objects.all()
+        if property_ids is not None:
+            rows = rows.filter(property_id__in=property_ids)
+        popularity.update(dict(rows.order_by().values_list('property_id').annotate(count=Count('id'))))
+    return popularity
+
+
+def _rows(properties):
+    return properties.values_list('id', 'property_name', 'location__city', 'location__region')
+
+
+def build_index():
+    from .models import Property
+
+    index = PrefixIndex()
+    popularity = _popularity()
+    index.load(
+        (pk, name, city, region, popularity[pk])
+        for pk, name, city, region in _rows(Property.objects.all()).iterator(chunk_size=5000)
+    )
+    return index
+
+
+_shared = LazyIndex(build_index, 'PROPERTY_AUTOCOMPLETE_INDEX_TTL')
+
+
+def get_index():
+    """
+    Return the process-wide index, building it on first use. Local writes
+    are applied through signals; the whole index is rebuilt in the background
+    every PROPERTY_AUTOCOMPLETE_INDEX_TTL seconds to pick up other workers'.
+    """
+    return _shared.get()
+
+
+def refresh_properties(property_ids):
+    """Reload the given properties, their popularity and places (dropping deleted ones)."""
+    from .models import Property
+
+    index = _shared.current
+    if index is None:
+        return
+    property_ids = set(property_ids)
+    if not property_ids:
+        return
+    popularity = _popularity(property_ids)
+    for pk, name, city, region in _rows(Property.objects.filter(pk__in=property_ids)):
+        index.set_property(pk, name, city, region, popularity[pk])
+        property_ids.discard(pk)
+    for pk in property_ids:
+        index.remove_property(pk)
+
+
+def unindex_property(pk):
+    index = _shared.current
+    if index is not None:
+        index.remove_property(pk)
+
+
+def reset_index():
+    _shared.reset()
+
+
+def suggest(prefix, limit=10, kinds=KINDS):
+    return get_index().search(prefix, limit=limit, kinds=kinds)
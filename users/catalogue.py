@@ -0,0 +1,127 @@
+# users/catalogue.py
+# Keeps the public catalogue's read model in sync. A CatalogueEntry is
+# recomputed from Property (with its review aggregates and amenity mask),
+# Location and PropertyMedia whenever one of them changes, so a catalogue page
+# is a single-table query, and every refresh bumps a generation number that
+# retires cached pages.
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db.models import F, OuterRef, Subquery
+
+from .models import CatalogueEntry, Property, PropertyMedia
+
+GENERATION_KEY = 'catalogue:generation'
+UPDATE_FIELDS = [
+    'property_name', 'property_type', 'rental_type', 'availability_status', 'is_multi_room',
+    'number_of_bedrooms', 'number_of_bathrooms', 'price_per_month', 'price_per_night', 'city', 'region',
+    'city_id', 'region_id', 'latitude', 'longitude', 'thumbnail', 'rating', 'review_count', 'amenity_mask', 'created_at', 'refreshed_at',
+]
+
+
+def build_entries(property_ids):
+    """Unsaved CatalogueEntry rows for the active properties among ``property_ids``."""
+    thumbnails = PropertyMedia.objects.filter(
+        property=OuterRef('pk'), media_type='image'
+    ).exclude(file='').order_by('uploaded_at', 'pk').values('file')[:1]
+    properties = Property.objects.filter(pk__in=property_ids).select_related('location').annotate(
+        thumbnail_file=Subquery(thumbnails),
+    )
+    return [
+        CatalogueEntry(
+            property_id=prop.pk,
+            property_name=prop.property_name,
+            property_type=prop.property_type,
+            rental_type=prop.rental_type,
+            availability_status=prop.availability_status,
+            is_multi_room=prop.is_multi_room,
+            number_of_bedrooms=prop.number_of_bedrooms,
+            number_of_bathrooms=prop.number_of_bathrooms,
+            price_per_month=prop.price_per_month,
+            price_per_night=prop.price_per_night,
+            city=prop.location.city if prop.location else '',
+            region=prop.location.region if prop.location else '',
+            city_id=prop.location.canonical_city_id if prop.location else None,
+            region_id=prop.location.canonical_region_id if prop.location else None,
+            latitude=prop.location.latitude if prop.location else None,
+            longitude=prop.location.longitude if prop.location else None,
+            thumbnail=default_storage.url(prop.thumbnail_file) if prop.thumbnail_file else '',
+            rating=round(prop.average_rating, 2) if prop.average_rating is not None else None,
+            review_count=prop.review_count,
+            amenity_mask=prop.amenity_mask,
+            created_at=prop.created_at,
+        )
+        for prop in properties
+    ]
+
+
+def refresh_catalogue(property_ids):
+    """Upsert the entries of ``property_ids`` and drop those no longer active."""
+    property_ids = set(property_ids)
+    if not property_ids:
+        return
+    entries = build_entries(property_ids)
+    CatalogueEntry.objects.bulk_create(
+        entries, update_conflicts=True, unique_fields=['property'], update_fields=UPDATE_FIELDS
+    )
+    CatalogueEntry.objects.filter(
+        property_id__in=property_ids - {entry.property_id for entry in entries}
+    ).delete()
+    bump_generation()
+
+
+def schedule_refresh(property_ids):
+    from .tasks import enqueue
+
+    enqueue(refresh_catalogue, list(property_ids))
+
+
+def rebuild_catalogue(batch_size=1000):
+    """Recompute every entry, e.g. after bulk writes that skip signals. Returns the entry count."""
+    property_ids = list(Property.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(property_ids), batch_size):
+        refresh_catalogue(property_ids[start:start + batch_size])
+    CatalogueEntry.objects.exclude(property__in=Property.objects.all()).delete()
+    bump_generation()
+    return len(property_ids)
+
+
+def clear_amenity_bit(bit):
+    CatalogueEntry.objects.filter(amenity_mask__gt=0).update(amenity_mask=F('amenity_mask').bitand(~(1 << bit)))
+    bump_generation()
+
+
+def bump_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+
+
+def current_generation():
+    """Bumped by every refresh; caches of property listings key on it to retire on any write."""
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def page_cache_key(request):
+    generation = current_generation()
+    params = urlencode(sorted(request.query_params.items()))
+    url = f'{request.get_host()}{request.path}?{params}'
+    return f'catalogue:{generation}:{hashlib.md5(url.encode()).hexdigest()}'
+
+
+def cached_page(request, render):
+    """
+    Response data for ``request``, rendered at most once per catalogue
+    generation: any refresh retires every cached page, and
+    CATALOGUE_CACHE_TTL only bounds how long an unrequested page is kept.
+    """
+    key = page_cache_key(request)
+    data = cache.get(key)
+    if data is None:
+        data = render()
+        cache.set(key, data, settings.CATALOGUE_CACHE_TTL)
+    return data
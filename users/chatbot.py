@@ -1,38 +1,144 @@
 from google.cloud import dialogflow_v2 as dialogflow
+from google.cloud.dialogflow_v2.services.sessions.transports import SessionsGrpcTransport, SessionsGrpcAsyncIOTransport
+from asgiref.sync import sync_to_async
 from django.conf import settings
+import asyncio
+import itertools
 import os
-from .models import Booking, Property, Message, User, Notification
+import threading
+import weakref
+import grpc
+from google.api_core import exceptions as google_exceptions
+from .models import Booking, Property, Message, User
+from .notifications import resolve_segment, notify_users
+from .intent_classifier import local_intent
+from .name_index import search_property_names
+from .transcripts import record_turn
+from .intent_cache import cached, booking_status_key, property_details_key, LIST_PROPERTIES_KEY
 
 os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = settings.DIALOGFLOW_CREDENTIALS
 
-def detect_intent(text, session_id, project_id='zeuschatbot-wesq'):  # Replace with your Dialogflow project ID
-    session_client = dialogflow.SessionsClient()
-    session = session_client.session_path(project_id, session_id)
+# Process-wide pool of Dialogflow clients, each with its own gRPC channel.
+# Building a client means channel setup, auth and TLS, so it happens once per
+# process rather than once per chat message.
+_client_cycle = None
+_client_lock = threading.Lock()
+# grpc.aio channels are bound to the event loop that created them.
+_async_client_cycles = weakref.WeakKeyDictionary()
+
+def _new_client():
+    if settings.DIALOGFLOW_EMULATOR_HOST:
+        channel = grpc.insecure_channel(settings.DIALOGFLOW_EMULATOR_HOST)
+        return dialogflow.SessionsClient(transport=SessionsGrpcTransport(channel=channel))
+    return dialogflow.SessionsClient()
+
+def _new_async_client():
+    if settings.DIALOGFLOW_EMULATOR_HOST:
+        channel = grpc.aio.insecure_channel(settings.DIALOGFLOW_EMULATOR_HOST)
+        return dialogflow.SessionsAsyncClient(transport=SessionsGrpcAsyncIOTransport(channel=channel))
+    return dialogflow.SessionsAsyncClient()
+
+def get_sessions_client():
+    global _client_cycle
+    if _client_cycle is None:
+        with _client_lock:
+            if _client_cycle is None:
+                _client_cycle = itertools.cycle(
+                    [_new_client() for _ in range(settings.DIALOGFLOW_CHANNEL_POOL_SIZE)]
+                )
+    return next(_client_cycle)
+
+def get_async_sessions_client():
+    loop = asyncio.get_running_loop()
+    cycle = _async_client_cycles.get(loop)
+    if cycle is None:
+        cycle = _async_client_cycles[loop] = itertools.cycle(
+            [_new_async_client() for _ in range(settings.DIALOGFLOW_CHANNEL_POOL_SIZE)]
+        )
+    return next(cycle)
+
+def reset_clients():
+    """Drop pooled clients, e.g. after changing DIALOGFLOW_* settings."""
+    global _client_cycle
+    with _client_lock:
+        _client_cycle = None
+        _async_client_cycles.clear()
+
+def _build_request(text, session_id, project_id):
     text_input = dialogflow.TextInput(text=text, language_code='en')
-    query_input = dialogflow.QueryInput(text=text_input)
-    response = session_client.detect_intent(
-        request={"session": session, "query_input": query_input}
-    )
+    return {
+        "session": dialogflow.SessionsClient.session_path(project_id, session_id),
+        "query_input": dialogflow.QueryInput(text=text_input),
+    }
+
+def _parse_response(response):
     intent_name = response.query_result.intent.display_name
     property_name = response.query_result.parameters.get('property_name', None)
     return response.query_result.fulfillment_text, intent_name, property_name
 
-def handle_chatbot_request(user, message):
-    session_id = str(user.id)
-    response_text, intent_name, property_name = detect_intent(message, session_id)
+class ProviderError(Exception):
+    """Dialogflow did not answer; ``status`` is the HTTP status the chat endpoints report."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+# Failures worth retrying later: Dialogflow is down, overloaded or too slow.
+UNAVAILABLE_ERRORS = (
+    google_exceptions.ServiceUnavailable, google_exceptions.DeadlineExceeded,
+    google_exceptions.TooManyRequests, google_exceptions.RetryError,
+)
+
+def _provider_error(e):
+    status = 503 if isinstance(e, UNAVAILABLE_ERRORS) else 502
+    return ProviderError(f"Chatbot provider error: {e}", status)
+
+def detect_intent(text, session_id, project_id=None):
+    try:
+        response = get_sessions_client().detect_intent(
+            request=_build_request(text, session_id, project_id or settings.DIALOGFLOW_PROJECT_ID),
+            timeout=settings.DIALOGFLOW_TIMEOUT
+        )
+    except (google_exceptions.GoogleAPIError, grpc.RpcError) as e:
+        raise _provider_error(e) from e
+    return _parse_response(response)
 
+async def detect_intent_async(text, session_id, project_id=None):
+    try:
+        response = await get_async_sessions_client().detect_intent(
+            request=_build_request(text, session_id, project_id or settings.DIALOGFLOW_PROJECT_ID),
+            timeout=settings.DIALOGFLOW_TIMEOUT
+        )
+    except (google_exceptions.GoogleAPIError, grpc.RpcError) as e:
+        raise _provider_error(e) from e
+    return _parse_response(response)
+
+def booking_status_text(user_id):
+    latest_booking = Booking.objects.filter(user_id=user_id).select_related('property').order_by('-created_at').first()
+    if latest_booking:
+        return f"Your latest booking for {latest_booking.property.property_name} is {latest_booking.status}."
+    return "You have no bookings yet."
+
+def available_properties_text():
+    names = list(Property.objects.filter(availability_status='Available').values_list('property_name', flat=True)[:5])
+    if names:
+        return "Here are some available properties: " + ", ".join(names)
+    return "No available properties found."
+
+def property_details_text(property_id):
+    property = Property.objects.filter(pk=property_id).first()
+    if property is None:
+        return None
+    price = f"${property.price_per_night}/night" if property.price_per_night else f"${property.price_per_month}/month"
+    return f"{property.property_name} is {property.availability_status}. Price: {price}."
+
+def respond_to_intent(user, message, response_text, intent_name, property_name):
     if intent_name == 'CheckBookingStatus':
-        latest_booking = Booking.objects.filter(user=user).order_by('-created_at').first()
-        if latest_booking:
-            response_text = f"Your latest booking for {latest_booking.property.property_name} is {latest_booking.status}."
-        else:
-            response_text = "You have no bookings yet."
+        response_text = cached(
+            booking_status_key(user.id), lambda: booking_status_text(user.id), settings.CHATBOT_USER_CACHE_TTL
+        )
     elif intent_name == 'ListProperties':
-        properties = Property.objects.filter(availability_status='Available')[:5]
-        if properties:
-            response_text = "Here are some available properties: " + ", ".join(p.property_name for p in properties)
-        else:
-            response_text = "No available properties found."
+        response_text = cached(LIST_PROPERTIES_KEY, available_properties_text, settings.CHATBOT_GLOBAL_CACHE_TTL)
     elif intent_name == 'SupportRequest':
         admin = User.objects.filter(role='admin').first()
         if admin:
@@ -41,28 +147,41 @@ def handle_chatbot_request(user, message):
                 receiver=admin,
                 content=f"Support request from {user.username}: {message}"
             )
-            Notification.objects.create(
-                user=admin,
-                notification_type='Support',
-                message=f"New support request from {user.username}"
+            notify_users(
+                resolve_segment('role', 'admin'),
+                'Support',
+                f"New support request from {user.username}"
             )
             response_text = "Your request has been forwarded to our support team. We’ll get back to you soon!"
         else:
             response_text = "Sorry, no support staff available right now."
     elif intent_name == 'PropertyDetails' and property_name:
-        property = Property.objects.filter(property_name__icontains=property_name).first()
-        if property:
-            price = f"${property.price_per_night}/night" if property.price_per_night else f"${property.price_per_month}/month"
-            response_text = f"{property.property_name} is {property.availability_status}. Price: {price}."
+        matches = search_property_names(property_name, limit=1)
+        details = None
+        if matches:
+            property_id = matches[0][0]
+            details = cached(
+                property_details_key(property_id),
+                lambda: property_details_text(property_id),
+                settings.CHATBOT_USER_CACHE_TTL
+            )
+        if details:
+            response_text = details
         else:
             response_text = f"I couldn’t find a property named '{property_name}'. Try another name."
     # Fallback for unrecognized intents or missing parameters
     if not intent_name or (intent_name == 'PropertyDetails' and not property_name):
         response_text = "I didn’t understand that. Try asking about your booking status, available properties, or request support."
 
-    Message.objects.create(
-        sender=user,
-        receiver=user,
-        content=f"User: {message}\nBot: {response_text}"
-    )
-    return response_text
\ No newline at end of file
+    record_turn(user, message, response_text, intent_name)
+    return response_text
+
+def handle_chatbot_request(user, message):
+    session_id = str(user.id)
+    intent = local_intent(message) or detect_intent(message, session_id)
+    return respond_to_intent(user, message, *intent)
+
+async def handle_chatbot_request_async(user, message):
+    session_id = str(user.id)
+    intent = local_intent(message) or await detect_intent_async(message, session_id)
+    return await sync_to_async(respond_to_intent)(user, message, *intent)
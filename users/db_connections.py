@@ -0,0 +1,173 @@
+# users/db_connections.py
+# How long requests wait for a database connection. With CONN_MAX_AGE each
+# worker thread reuses its connection across requests and CONN_HEALTH_CHECKS
+# pings it when a request first uses it. ConnectionWaitMiddleware times that
+# acquire (the ping, plus connect and authenticate when there was no usable
+# connection) where it happens, so requests that never query the database
+# neither wait nor count, and reports it in a Server-Timing header and
+# connection_stats().
+import functools
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_stats_lock = threading.Lock()
+_waits = deque(maxlen=10000)  # recent acquire times, ms
+_counts = Counter()
+_request = Local()  # .timer: the AcquireTimer of the request being served
+
+
+def record_connect(alias):
+    """Count a newly opened connection (from the connection_created signal)."""
+    with _stats_lock:
+        _counts[f'connects:{alias}'] += 1
+    timer = getattr(_request, 'timer', None)
+    if timer is not None and alias == DEFAULT_DB_ALIAS:
+        timer.connected = True
+
+
+def record_acquire(wait_ms, reused):
+    with _stats_lock:
+        _waits.append(wait_ms)
+        _counts['acquires'] += 1
+        _counts['reused'] += reused
+
+
+def connection_stats():
+    """Acquire count, how many reused a connection, connects per alias and acquire-time percentiles."""
+    with _stats_lock:
+        waits = sorted(_waits)
+        stats = {
+            'acquires': _counts['acquires'],
+            'reused': _counts['reused'],
+            'connects': {key.split(':', 1)[1]: count for key, count in _counts.items() if key.startswith('connects:')},
+        }
+    pick = lambda pct: waits[min(len(waits) - 1, int(pct / 100 * len(waits)))] if waits else 0.0
+    stats['wait_ms'] = {'p50': pick(50), 'p95': pick(95), 'max': waits[-1] if waits else 0.0}
+    return stats
+
+
+def reset_connection_stats():
+    with _stats_lock:
+        _waits.clear()
+        _counts.clear()
+
+
+class AcquireTimer:
+    """
+    Execute wrapper marking the first query of a request; until then the
+    primary's health checks and connects add to ``wait_ms``.
+    """
+
+    def __init__(self):
+        self.wait_ms = 0.0
+        self.connected = False
+        self.used = False
+
+    def __call__(self, execute, sql, params, many, context):
+        self.used = True
+        return execute(sql, params, many, context)
+
+
+def _timed(method):
+    @functools.wraps(method)
+    def timed(*args, **kwargs):
+        timer = getattr(_request, 'timer', None)
+        if timer is None or timer.used:
+            return method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            timer.wait_ms += (time.perf_counter() - started) * 1000
+    return timed
+
+
+def instrument(connection):
+    """Time ``connection``'s health checks and connects into the current request's AcquireTimer."""
+    if not getattr(connection, 'acquire_timed', False):
+        connection.close_if_health_check_failed = _timed(connection.close_if_health_check_failed)
+        connection.ensure_connection = _timed(connection.ensure_connection)
+        connection.acquire_timed = True
+
+
+class ConnectionWaitMiddleware:
+    """Report how long the request waited for the primary's connection, if it used one."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = _request.timer = AcquireTimer()
+        try:
+            with self.timing(timer):
+                response = self.get_response(request)
+        finally:
+            _request.timer = None
+        return self.report(timer, response)
+
+    async def __acall__(self, request):
+        timer = _request.timer = AcquireTimer()
+        # The view's ORM calls run on the request's sync_to_async thread, whose connections are its own.
+        timing = await sync_to_async(self.timing)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(timing.close)()
+            _request.timer = None
+        return self.report(timer, response)
+
+    def timing(self, timer):
+        """Time this thread's primary connection into ``timer`` until the returned stack is closed."""
+        connection = connections[DEFAULT_DB_ALIAS]
+        instrument(connection)
+        stack = ExitStack()
+        stack.enter_context(connection.execute_wrapper(timer))
+        return stack
+
+    def report(self, timer, response):
+        if not timer.used:
+            return response
+        record_acquire(timer.wait_ms, not timer.connected)
+        timing = f'db-connect;dur={timer.wait_ms:.2f}'
+        response['Server-Timing'] = f"{response['Server-Timing']}, {timing}" if response.has_header('Server-Timing') else timing
+        return response
+
+
+def server_max_connections(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW max_connections')
+        return int(cursor.fetchone()[0])
+
+
+@register(Tags.database, deploy=True)
+def check_connection_budget(app_configs=None, databases=None, **kwargs):
+    """Warn when every worker's persistent connections would not fit under the server's max_connections."""
+    connection = connections[DEFAULT_DB_ALIAS]
+    if not databases or DEFAULT_DB_ALIAS not in databases:
+        return []
+    if connection.vendor != 'postgresql' or not connection.settings_dict['CONN_MAX_AGE']:
+        return []
+    needed = settings.WEB_CONCURRENCY * (settings.WEB_THREADS + settings.BACKGROUND_TASK_WORKERS)
+    available = server_max_connections(connection)
+    if needed <= available:
+        return []
+    return [Warning(
+        f"{settings.WEB_CONCURRENCY} workers can hold {needed} persistent connections, "
+        f"but the database allows {available}.",
+        hint="Lower WEB_CONCURRENCY, WEB_THREADS or BACKGROUND_TASK_WORKERS, or put PgBouncer in front.",
+        id='users.W001',
+    )]
@@ -0,0 +1,188 @@
+# users/db_router.py
+# Read/write splitting across DATABASE_REPLICAS. Writes, reads inside a
+# transaction and reads after a write in the same request go to the primary;
+# other reads go to a replica that is not lagging. ReadYourWritesMiddleware
+# keeps a client on the primary for REPLICA_PIN_SECONDS after it writes, so it
+# never reads a replica that has not caught up with its own change yet.
+import hashlib
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Per thread under WSGI, per request under ASGI, where it follows the request into sync_to_async.
+_local = Local()
+_lag = {}  # alias -> (measured at, seconds behind)
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def database_lag(alias):
+    """
+    Seconds the replica ``alias`` is behind its primary: 0 while it streams
+    from the primary and has replayed everything received, infinite when it
+    has never replayed a transaction.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        # An idle primary writes nothing, so the last replay time alone would read as growing lag.
+        # A replica cut off from its primary has replayed everything it received too, so that
+        # only means caught up while its WAL receiver is still streaming.
+        cursor.execute(
+            "SELECT CASE WHEN EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') "
+            "AND pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        lag = cursor.fetchone()[0]
+    return float('inf') if lag is None else float(lag)
+
+
+# How lag is measured; a stand-in replica (see bench_replica_routing) swaps in its own.
+lag_probe = database_lag
+
+
+def replica_lag(alias):
+    """``lag_probe(alias)``, cached for REPLICA_LAG_CHECK_SECONDS; infinite while the replica is unreachable."""
+    now = time.monotonic()
+    measured = _lag.get(alias)
+    if measured and now - measured[0] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return measured[1]
+    try:
+        lag = lag_probe(alias)
+    except DatabaseError as e:
+        print(f"Replica {alias} unavailable: {e}")
+        lag = float('inf')
+    _lag[alias] = (now, lag)
+    return lag
+
+
+def _count(alias, kind):
+    with _stats_lock:
+        _stats[(alias, kind)] += 1
+
+
+def routing_stats():
+    """``{alias: {'read': n, 'write': n}}`` for the queries routed since the last reset."""
+    with _stats_lock:
+        stats = {}
+        for (alias, kind), count in _stats.items():
+            stats.setdefault(alias, {'read': 0, 'write': 0})[kind] = count
+        return stats
+
+
+def reset_routing_stats():
+    with _stats_lock:
+        _stats.clear()
+    _lag.clear()
+
+
+def pinned():
+    return getattr(_local, 'primary', False)
+
+
+def unpin():
+    """Let this thread read from replicas again, e.g. once its request is done."""
+    _local.primary = _local.wrote = False
+
+
+@contextmanager
+def use_primary():
+    """Send every read in the block to the primary, e.g. work triggered by a write that just committed."""
+    previous, _local.primary = pinned(), True
+    try:
+        yield
+    finally:
+        _local.primary = previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = self._read_alias()
+        _count(alias, 'read')
+        return alias
+
+    def _read_alias(self):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        healthy = [alias for alias in replicas if replica_lag(alias) <= settings.REPLICA_MAX_LAG_SECONDS]
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Whatever this thread reads next must see the write.
+        _local.primary = True
+        _local.wrote = True
+        _count(DEFAULT_DB_ALIAS, 'write')
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the primary's data, so objects from any of them may be related.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary's WAL.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def pin_key(request):
+    """Identify the client: its bearer token, else its session, else its address."""
+    client = (
+        request.META.get('HTTP_AUTHORIZATION')
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get('REMOTE_ADDR', '')
+    )
+    return f'db_pin:{hashlib.md5(client.encode()).hexdigest()}'
+
+
+class ReadYourWritesMiddleware:
+    """
+    Route a request's reads to the primary if it is unsafe or its client
+    wrote within REPLICA_PIN_SECONDS, and start that window whenever a
+    request writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        key = pin_key(request)
+        _local.primary = request.method not in SAFE_METHODS or bool(cache.get(key))
+        _local.wrote = False
+        try:
+            return self.get_response(request)
+        finally:
+            if _local.wrote:
+                cache.set(key, 1, settings.REPLICA_PIN_SECONDS)
+            unpin()
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        key = pin_key(request)
+        _local.primary = request.method not in SAFE_METHODS or bool(await cache.aget(key))
+        _local.wrote = False
+        try:
+            return await self.get_response(request)
+        finally:
+            if _local.wrote:
+                await cache.aset(key, 1, settings.REPLICA_PIN_SECONDS)
+            unpin()
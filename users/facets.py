@@ -0,0 +1,56 @@
+# users/facets.py
+# Facet counts for property listings: every facet comes out of one GROUP BY
+# over the filtered queryset, however many values each facet has.
+import hashlib
+from collections import Counter
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .catalogue import current_generation
+
+FACET_FIELDS = {
+    'property_type': 'property_type',
+    'rental_type': 'rental_type',
+    'city': 'location__city',
+    'availability_status': 'availability_status',
+}
+# Query parameters that change the page but not the result set.
+PAGE_PARAMS = {'page', 'page_size', 'facets'}
+
+
+def facet_counts(queryset):
+    """
+    Return ``{facet: {value: count}}`` for ``queryset``, values by descending
+    count. The query groups by the combination of all facet fields; the few
+    hundred resulting rows are summed into per-facet counts in Python.
+    """
+    counters = {name: Counter() for name in FACET_FIELDS}
+    rows = queryset.order_by().values(*FACET_FIELDS.values()).annotate(facet_count=Count('pk'))
+    for row in rows:
+        for name, field in FACET_FIELDS.items():
+            if row[field] is not None:
+                counters[name][row[field]] += row['facet_count']
+    return {name: dict(counter.most_common()) for name, counter in counters.items()}
+
+
+def cached_facet_counts(queryset, request, scope=None):
+    """
+    ``facet_counts`` cached for PROPERTY_FACET_CACHE_TTL seconds under the
+    request path and filter parameters. ``scope`` separates result sets that
+    share a URL, e.g. one landlord's listings from another's. The key carries
+    the catalogue generation, so a property write retires every cached count.
+    """
+    timeout = settings.PROPERTY_FACET_CACHE_TTL
+    if not timeout:
+        return facet_counts(queryset)
+    params = sorted((key, value) for key, value in request.query_params.items() if key not in PAGE_PARAMS)
+    digest = hashlib.md5(f'{request.path}|{scope}|{urlencode(params)}'.encode()).hexdigest()
+    key = f'property_facets:{current_generation()}:{digest}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = facet_counts(queryset)
+        cache.set(key, counts, timeout)
+    return counts
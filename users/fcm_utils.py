@@ -1,29 +1,143 @@
 # users/fcm_utils.py
-from pyfcm import FCMNotification
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
 from django.conf import settings
 
+# Per-token errors from the FCM HTTP API that mean the token will never work again.
+INVALID_TOKEN_ERRORS = {'NotRegistered', 'InvalidRegistration', 'MismatchSenderId'}
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_session():
+    # One keep-alive session per worker thread; requests.Session is not thread-safe.
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.FCM_MAX_CONCURRENCY,
+                    thread_name_prefix='fcm'
+                )
+    return _executor
+
+
+def _send_batch(tokens, title, body, data=None):
+    """
+    Send one multicast request and return the per-token result list,
+    in the same order as ``tokens``.
+    """
+    payload = {
+        'registration_ids': tokens,
+        'notification': {'title': title, 'body': body},
+    }
+    if data:
+        payload['data'] = data
+    response = _get_session().post(
+        settings.FCM_ENDPOINT,
+        json=payload,
+        headers={'Authorization': f'key={settings.FCM_SERVER_KEY}'},
+        timeout=settings.FCM_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json().get('results', [])
+
+
+def prune_invalid_tokens(tokens):
+    from .models import DeviceToken, User
+
+    if not tokens:
+        return 0
+    deleted, _ = DeviceToken.objects.filter(token__in=tokens).delete()
+    User.objects.filter(fcm_token__in=tokens).update(fcm_token=None)
+    return deleted
+
+
+def send_multicast(tokens, title, body, data=None, prune=True):
+    """
+    Deliver one notification to many device tokens.
+
+    Tokens are de-duplicated and grouped into batches of
+    ``FCM_MULTICAST_BATCH_SIZE`` (the provider limit per request), and the
+    batches are sent concurrently on a shared thread pool.
+
+    Returns:
+        dict: ``success`` and ``failure`` counts plus the ``invalid_tokens``
+        that the provider rejected (pruned from the registry when ``prune``).
+    """
+    tokens = list(dict.fromkeys(t for t in tokens if t))
+    stats = {'success': 0, 'failure': 0, 'invalid_tokens': []}
+    if not tokens:
+        return stats
+
+    size = settings.FCM_MULTICAST_BATCH_SIZE
+    batches = [tokens[i:i + size] for i in range(0, len(tokens), size)]
+
+    def collect(batch, results):
+        for token, result in zip(batch, results):
+            error = result.get('error')
+            if error:
+                stats['failure'] += 1
+                if error in INVALID_TOKEN_ERRORS:
+                    stats['invalid_tokens'].append(token)
+            else:
+                stats['success'] += 1
+        # Tokens the provider did not answer for count as failed.
+        stats['failure'] += max(len(batch) - len(results), 0)
+
+    if len(batches) == 1:
+        try:
+            collect(batches[0], _send_batch(batches[0], title, body, data))
+        except (requests.RequestException, ValueError) as e:
+            print(f"FCM error: {e}")
+            stats['failure'] += len(batches[0])
+    else:
+        executor = _get_executor()
+        futures = {executor.submit(_send_batch, batch, title, body, data): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                collect(batch, future.result())
+            except (requests.RequestException, ValueError) as e:
+                print(f"FCM error: {e}")
+                stats['failure'] += len(batch)
+
+    if prune and stats['invalid_tokens']:
+        prune_invalid_tokens(stats['invalid_tokens'])
+    return stats
+
+
+def send_notification_to_users(users, title, body, data=None):
+    """
+    Push one notification to every registered device of ``users``
+    (a queryset, or an iterable of User instances or ids).
+    """
+    from .models import DeviceToken
+
+    tokens = DeviceToken.objects.filter(user__in=users).values_list('token', flat=True)
+    return send_multicast(tokens, title, body, data)
+
+
 def send_fcm_notification(user, title, body):
     """
-    Send a push notification to a user's device via FCM.
-    
+    Send a push notification to all of a user's devices via FCM.
+
     Args:
-        user: User instance with an fcm_token
+        user: User instance with registered device tokens
         title: Notification title (string)
         body: Notification message (string)
     Returns:
-        bool: True if successful, False otherwise
-    """
-    if not user.fcm_token:
-        return False
-    
-    push_service = FCMNotification(api_key=settings.FCM_SERVER_KEY)
-    try:
-        result = push_service.notify_single_device(
-            registration_id=user.fcm_token,
-            message_title=title,
-            message_body=body
-        )
-        return result.get('success', 0) == 1
-    except Exception as e:
-        print(f"FCM error: {e}")
-        return False
\ No newline at end of file
+        bool: True if at least one device accepted it, False otherwise
+    """
+    return send_notification_to_users([user], title, body)['success'] > 0
@@ -0,0 +1,36 @@
+# users/intent_cache.py
+# Cached answers for the chatbot's data-backed intents. Global answers expire
+# after CHATBOT_GLOBAL_CACHE_TTL seconds; per-user and per-property answers are
+# also dropped by signals (users/signals.py) as soon as their rows change.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+LIST_PROPERTIES_KEY = 'chatbot:list_properties'
+
+
+def booking_status_key(user_id):
+    return f'chatbot:booking_status:{user_id}'
+
+
+def property_details_key(property_id):
+    return f'chatbot:property_details:{property_id}'
+
+
+def cached(key, compute, timeout):
+    """Return the cached value for ``key``, computing and storing it on a miss."""
+    if not settings.CHATBOT_INTENT_CACHE:
+        return compute()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache.set(key, value, timeout)
+    return value
+
+
+def invalidate(*keys):
+    cache.delete_many(keys)
+    # Delete again once the write commits, in case a chat turn re-cached the
+    # old answer while the transaction was still open.
+    transaction.on_commit(lambda: cache.delete_many(keys))
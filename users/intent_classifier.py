@@ -0,0 +1,147 @@
+# users/intent_classifier.py
+# In-process fast path for the chatbot: confidently matched messages are
+# answered locally and only ambiguous ones are sent to Dialogflow.
+import json
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+# "tell me about X", "details of X", "how much is X", "what's the price of X", ...
+# anchored at the start, so questions that merely contain one of these words
+# ("is there wifi at X") are not mistaken for a property name.
+PROPERTY_NAME_RE = re.compile(
+    r"^(?:(?:please|can you|could you)\s+)?"
+    r"(?:tell me (?:more )?about|details (?:of|for|on)|info(?:rmation)? (?:on|about)|"
+    r"(?:what(?:'s| is) the )?price of|how much (?:is|does)|describe)"
+    r"\s+(?:the\s+)?(?P<name>.+?)(?:\s+(?:cost|available|per night|per month))*\s*[?.!]*$",
+    re.IGNORECASE
+)
+# A "name" with these in it is about the user's own things ("the booking I made").
+FIRST_PERSON = {'i', 'me', 'my', 'mine', 'we', 'us', 'our'}
+
+
+def _features(text):
+    words = TOKEN_RE.findall(text.lower())
+    features = [f'w:{word}' for word in words]
+    features += [f'b:{a} {b}' for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f' {word} '
+        for n in (3, 4):
+            features += [f'c:{padded[i:i + n]}' for i in range(len(padded) - n + 1)]
+    return Counter(features)
+
+
+def extract_property_name(text):
+    match = PROPERTY_NAME_RE.search(text.strip())
+    if not match or FIRST_PERSON & set(TOKEN_RE.findall(match.group('name').lower())):
+        return None
+    return match.group('name').strip()
+
+
+class IntentClassifier:
+    """
+    TF-IDF over word, word-bigram and character 3/4-gram features with
+    nearest-phrase cosine scoring. Each intent scores as its best-matching
+    training phrase; a prediction is confident when that score clears
+    ``threshold`` and beats the runner-up intent by ``margin``. Intents whose
+    name starts with an underscore (e.g. ``_smalltalk``) are reject classes:
+    winning them means "leave this to Dialogflow".
+    """
+
+    def __init__(self, phrases, threshold=0.5, margin=0.1):
+        self.threshold = threshold
+        self.margin = margin
+        self.intents = list(phrases)
+        texts, offsets = [], []
+        for intent in self.intents:
+            offsets.append(len(texts))
+            texts.extend(phrases[intent])
+        self.offsets = np.array(offsets)
+
+        counts = [_features(text) for text in texts]
+        self.vocabulary = {}
+        for row in counts:
+            for feature in row:
+                self.vocabulary.setdefault(feature, len(self.vocabulary))
+        tf = np.zeros((len(texts), len(self.vocabulary)), dtype=np.float32)
+        for i, row in enumerate(counts):
+            for feature, count in row.items():
+                tf[i, self.vocabulary[feature]] = 1 + np.log(count)
+        document_frequency = (tf > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = tf * self.idf
+        self.matrix = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, encoding='utf-8') as phrase_file:
+            return cls(json.load(phrase_file), **kwargs)
+
+    def vectorize(self, text):
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for feature, count in _features(text).items():
+            index = self.vocabulary.get(feature)
+            if index is not None:
+                vector[index] = 1 + np.log(count)
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def scores(self, text):
+        """Best cosine similarity per intent, in ``self.intents`` order."""
+        vector = self.vectorize(text)
+        if vector is None:
+            return np.zeros(len(self.intents), dtype=np.float32)
+        return np.maximum.reduceat(self.matrix @ vector, self.offsets)
+
+    def classify(self, text):
+        """Return ``(intent, score)`` when confident, otherwise None."""
+        scores = self.scores(text)
+        ranked = np.argsort(scores)[::-1]
+        best = scores[ranked[0]]
+        runner_up = scores[ranked[1]] if len(ranked) > 1 else 0.0
+        intent = self.intents[ranked[0]]
+        if best >= self.threshold and best - runner_up >= self.margin and not intent.startswith('_'):
+            return intent, float(best)
+        return None
+
+
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_classifier():
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                _classifier = IntentClassifier.from_file(
+                    settings.CHATBOT_INTENT_PHRASES,
+                    threshold=settings.CHATBOT_LOCAL_INTENT_THRESHOLD,
+                    margin=settings.CHATBOT_LOCAL_INTENT_MARGIN
+                )
+    return _classifier
+
+
+def local_intent(text):
+    """
+    Answer ``text`` without Dialogflow when possible. Returns the same
+    ``(fulfillment_text, intent_name, property_name)`` triple as
+    ``chatbot.detect_intent``, or None to fall through to Dialogflow.
+    """
+    if not settings.CHATBOT_LOCAL_INTENTS:
+        return None
+    prediction = get_classifier().classify(text)
+    if prediction is None:
+        return None
+    intent_name = prediction[0]
+    property_name = None
+    if intent_name == 'PropertyDetails':
+        property_name = extract_property_name(text)
+        if not property_name:
+            return None
+    return '', intent_name, property_name
@@ -0,0 +1,42 @@
+# users/lazy_index.py
+# The process-wide slot each in-memory index (name_index, search_index,
+# autocomplete) is served from. The index is built on first use; writes made
+# in this process are applied to it through signals, and to pick up writes
+# from other workers it is rebuilt on the background pool once it is older
+# than its TTL setting, while the old one keeps serving.
+import threading
+import time
+
+from django.conf import settings
+
+
+class LazyIndex:
+    """Holds the index ``build()`` returns; the index must record its ``built_at`` (time.monotonic())."""
+
+    def __init__(self, build, ttl_setting):
+        self._build = build
+        self._ttl_setting = ttl_setting
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self.current = None  # None until first use, or after reset()
+
+    def get(self):
+        from .tasks import enqueue
+
+        if self.current is None:
+            with self._lock:
+                if self.current is None:
+                    self.current = self._build()
+        elif time.monotonic() - self.current.built_at > getattr(settings, self._ttl_setting) and not self._rebuilding:
+            self._rebuilding = True
+            enqueue(self._rebuild)
+        return self.current
+
+    def _rebuild(self):
+        try:
+            self.current = self._build()
+        finally:
+            self._rebuilding = False
+
+    def reset(self):
+        self.current = None
@@ -0,0 +1,76 @@
+# Shared helpers for the bench_* commands.
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from users.models import User
+
+
+@contextmanager
+def scratch_database(verbosity=0):
+    """
+    Run the block against a freshly migrated throwaway database (the same one
+    the test runner would use), so benchmarks never touch real data. Requests
+    made through the test client are not throttled and use a local cache.
+    """
+    old_name = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': []}
+    try:
+        with override_settings(
+            # Sized like a shared cache: the locmem default of 300 entries would cull constantly.
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'OPTIONS': {'MAX_ENTRIES': 1000000},
+            }},
+            REST_FRAMEWORK=rest_framework,
+        ):
+            yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+        teardown_test_environment()
+
+
+def timed(fn, repeat):
+    """Call ``fn`` ``repeat`` times and return the latencies in milliseconds."""
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# Distinct phone-number ranges so several roles can be seeded side by side.
+PHONE_PREFIXES = {'tenant': 7, 'landlord': 6, 'hotel_manager': 5, 'admin': 4}
+
+
+def seed_users(count, role='tenant', prefix='bench', batch_size=5000):
+    """Insert ``count`` users with unusable passwords and return their ids."""
+    User.objects.bulk_create(
+        [
+            User(
+                username=f'{prefix}{role}{i}',
+                name=f'{prefix} {role} {i}',
+                email=f'{prefix}{role}{i}@example.com',
+                phone_number=f'+255{PHONE_PREFIXES[role]}{i:08d}',
+                password='!',
+                role=role,
+            )
+            for i in range(count)
+        ],
+        batch_size=batch_size
+    )
+    return list(User.objects.filter(username__startswith=f'{prefix}{role}').values_list('id', flat=True))
@@ -0,0 +1,128 @@
+# Local stand-ins for third-party services, used by the bench_* commands.
+import json
+import re
+import threading
+import time
+from concurrent import futures
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+from google.cloud.dialogflow_v2 import types as dialogflow_types
+
+
+@contextmanager
+def stub_server(respond):
+    """
+    Run a threaded HTTP server on a free localhost port for the duration of
+    the block and yield its base URL.
+
+    ``respond(path, payload)`` receives the decoded JSON request body (None
+    for a GET) and returns ``(status_code, response_dict)``.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.reply(*respond(self.path, None))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            self.reply(*respond(self.path, payload))
+
+        def reply(self, status_code, body):
+            data = json.dumps(body).encode()
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_address[1]}'
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@contextmanager
+def fake_stripe_server(intents, latency=0.0):
+    """
+    Serve ``GET /v1/payment_intents/<id>`` from ``intents`` (id -> status, or
+    id -> full PaymentIntent dict) and yield the base URL for STRIPE_API_BASE.
+    ``latency`` seconds are added to every call to mimic the remote round-trip.
+    """
+    def respond(path, payload):
+        if latency:
+            time.sleep(latency)
+        intent_id = path.rsplit('/', 1)[-1]
+        intent = intents.get(intent_id)
+        if intent is None:
+            return 404, {'error': {'type': 'invalid_request_error', 'code': 'resource_missing'}}
+        return 200, intent if isinstance(intent, dict) else {'id': intent_id, 'object': 'payment_intent', 'status': intent}
+
+    with stub_server(respond) as url:
+        yield url
+
+
+def keyword_intent(text):
+    """
+    Tiny rule-based stand-in for the Dialogflow agent's four intents.
+    Returns ``(fulfillment_text, intent_name, parameters)``.
+    """
+    lowered = text.lower()
+    match = re.search(r'(?:about|details (?:of|for)) (.+?)[?.!]*$', text, re.IGNORECASE)
+    if match:
+        return '', 'PropertyDetails', {'property_name': match.group(1)}
+    if 'booking' in lowered:
+        return '', 'CheckBookingStatus', {}
+    if 'propert' in lowered or 'available' in lowered:
+        return '', 'ListProperties', {}
+    if 'help' in lowered or 'support' in lowered:
+        return '', 'SupportRequest', {}
+    return "Sorry, I didn't get that.", '', {}
+
+
+@contextmanager
+def fake_dialogflow_server(resolve=keyword_intent, latency=0.0, workers=64):
+    """
+    Serve the Dialogflow Sessions.DetectIntent RPC on a free localhost port
+    and yield its ``host:port`` (for DIALOGFLOW_EMULATOR_HOST). ``latency``
+    seconds are added to every call to mimic the remote round-trip.
+    """
+    def detect_intent(request, context):
+        if latency:
+            time.sleep(latency)
+        fulfillment_text, intent_name, parameters = resolve(request.query_input.text.text)
+        return dialogflow_types.DetectIntentResponse(
+            query_result=dialogflow_types.QueryResult(
+                query_text=request.query_input.text.text,
+                fulfillment_text=fulfillment_text,
+                intent=dialogflow_types.Intent(display_name=intent_name),
+                parameters=parameters,
+            )
+        )
+
+    handler = grpc.method_handlers_generic_handler('google.cloud.dialogflow.v2.Sessions', {
+        'DetectIntent': grpc.unary_unary_rpc_method_handler(
+            detect_intent,
+            request_deserializer=dialogflow_types.DetectIntentRequest.deserialize,
+            response_serializer=dialogflow_types.DetectIntentResponse.serialize,
+        ),
+    })
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=workers))
+    server.add_generic_rpc_handlers((handler,))
+    port = server.add_insecure_port('127.0.0.1:0')
+    server.start()
+    try:
+        yield f'127.0.0.1:{port}'
+    finally:
+        server.stop(0)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from users.retention import archive_messages, archive_notifications
+
+
+class Command(BaseCommand):
+    help = (
+        "Move soft-deleted and aged notifications and messages into their archive tables "
+        "(NOTIFICATION_RETENTION_DAYS / MESSAGE_RETENTION_DAYS). Safe to run repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--only', choices=['notifications', 'messages'])
+
+    def handle(self, *args, **options):
+        if options['only'] != 'messages':
+            moved = archive_notifications(options['batch_size'])
+            self.stdout.write(f"Archived {moved} notifications")
+        if options['only'] != 'notifications':
+            moved = archive_messages(options['batch_size'])
+            self.stdout.write(f"Archived {moved} messages")
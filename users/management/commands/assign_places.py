@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users.places import assign_places
+
+
+class Command(BaseCommand):
+    help = (
+        "Link locations written without Location.save() (bulk imports, raw SQL) to their City and Region "
+        "and store the canonical spellings. Safe to run repeatedly, e.g. after an import or from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        assigned = assign_places(options['batch_size'])
+        self.stdout.write(f"Assigned places to {assigned} locations")
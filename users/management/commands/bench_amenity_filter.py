@@ -0,0 +1,88 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from users.amenities import filter_by_amenities, rebuild_amenity_masks
+from users.models import Amenity, Location, Property, PropertyAmenity
+from ._bench import percentile, scratch_database, seed_users, timed
+
+AMENITIES = ['Wi-Fi', 'Parking', 'Swimming Pool', 'Air Conditioning', 'Generator', 'Security Guard', 'Gym',
+             'Garden', 'Balcony', 'Water Tank', 'CCTV', 'Laundry', 'Elevator', 'DSTV', 'Furnished Kitchen']
+
+
+def joined(queryset, amenity_ids):
+    """One join on the through table per required amenity."""
+    for amenity_id in amenity_ids:
+        queryset = queryset.filter(property_amenities__amenity_id=amenity_id)
+    return queryset
+
+
+def grouped(queryset, amenity_ids):
+    """A GROUP BY/HAVING over the through table."""
+    return queryset.filter(property_amenities__amenity_id__in=amenity_ids).annotate(
+        matched=Count('property_amenities', distinct=True)
+    ).filter(matched=len(amenity_ids))
+
+
+class Command(BaseCommand):
+    help = "Compare the amenity bitmask filter with per-amenity joins and GROUP BY/HAVING."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            owner_id = seed_users(1, role='landlord')[0]
+            location = Location.objects.create(
+                address='Bench', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='0'
+            )
+            amenities = [Amenity.objects.create(name=name) for name in AMENITIES]
+            Property.objects.bulk_create(
+                [
+                    Property(owner_id=owner_id, location=location, property_name=f'Bench {i}',
+                             property_type='Apartment', rental_type='long-term', description='Bench',
+                             price_per_month=500)
+                    for i in range(options['properties'])
+                ],
+                batch_size=5000
+            )
+            PropertyAmenity.objects.bulk_create(
+                [
+                    PropertyAmenity(property_id=pk, amenity=amenity)
+                    for pk in Property.objects.values_list('pk', flat=True)
+                    for amenity in rng.sample(amenities, rng.randint(1, 8))
+                ],
+                batch_size=10000
+            )
+            started = time.perf_counter()
+            rebuild_amenity_masks()
+            self.stdout.write(
+                f"Built masks for {options['properties']} properties in {(time.perf_counter() - started):.1f}s"
+            )
+
+            queryset = Property.get_active().filter(owner_id=owner_id)
+
+            def page(filtered):
+                filtered = filtered.order_by('pk')
+                return filtered.count(), list(filtered.values_list('pk', flat=True)[:10])
+
+            self.stdout.write(
+                f"{'amenities':>9} {'hits':>7} {'joins p50 ms':>13} {'group by p50 ms':>16} {'bitmask p50 ms':>15}"
+            )
+            for size in (1, 2, 3, 4):
+                wanted = rng.sample(amenities, size)
+                ids = [amenity.pk for amenity in wanted]
+                param = ','.join(amenity.name for amenity in wanted)
+                expected = page(joined(queryset, ids))
+                assert page(grouped(queryset, ids)) == expected == page(filter_by_amenities(queryset, param))
+                join_ms = timed(lambda: page(joined(queryset, ids)), options['repeat'])
+                group_ms = timed(lambda: page(grouped(queryset, ids)), options['repeat'])
+                mask_ms = timed(lambda: page(filter_by_amenities(queryset, param)), options['repeat'])
+                self.stdout.write(
+                    f"{size:>9} {expected[0]:>7} {percentile(join_ms, 50):>13.1f} "
+                    f"{percentile(group_ms, 50):>16.1f} {percentile(mask_ms, 50):>15.1f}"
+                )
@@ -0,0 +1,93 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from users.autocomplete import build_index
+from users.models import Booking, Favorite, Location, Property
+from ._bench import percentile, scratch_database, seed_users, timed
+from .bench_property_search import AREAS, KINDS, NAMES
+
+# What a user types, one keystroke at a time.
+TYPED = ['masaki', 'ocean res', 'arusha', 'zanz', 'baobab lodge', 'dodoma']
+
+
+def icontains_suggestions(text, limit=10):
+    """The scan the search box used to trigger: icontains on names, cities and regions."""
+    properties = list(
+        Property.get_active().filter(property_name__icontains=text)
+        .annotate(popularity=Count('bookings', distinct=True) + Count('favorited_by', distinct=True))
+        .order_by('-popularity').values_list('id', 'property_name')[:limit]
+    )
+    places = list(
+        Location.objects.filter(Q(city__icontains=text) | Q(region__icontains=text))
+        .values('city', 'region').annotate(listings=Count('property')).order_by('-listings')[:limit]
+    )
+    return properties, places
+
+
+class Command(BaseCommand):
+    help = "Compare the prefix autocomplete index with icontains lookups, one query per keystroke."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            owner_id = seed_users(1, role='landlord')[0]
+            tenant_ids = seed_users(200)
+            locations = Location.objects.bulk_create([
+                Location(address=f'{area} {i}', city=city, region=area, country='Tanzania', postal_code='0')
+                for i in range(50) for area, city in AREAS
+            ])
+            Property.objects.bulk_create(
+                [
+                    Property(owner_id=owner_id, location=rng.choice(locations),
+                             property_name=f'{rng.choice(NAMES)} {rng.choice(KINDS)} {i}',
+                             property_type='Apartment', rental_type='long-term', description='Bench',
+                             price_per_month=500)
+                    for i in range(options['properties'])
+                ],
+                batch_size=5000
+            )
+            property_ids = list(Property.objects.values_list('pk', flat=True))
+            Favorite.objects.bulk_create(
+                [Favorite(user_id=user_id, property_id=pk)
+                 for user_id in tenant_ids for pk in rng.sample(property_ids, 50)],
+                batch_size=5000, ignore_conflicts=True
+            )
+            Booking.objects.bulk_create(
+                [Booking(user_id=rng.choice(tenant_ids), property_id=pk, start_date='2026-01-01',
+                         end_date='2026-02-01', rental_type='long-term', monthly_rent=500)
+                 for pk in rng.sample(property_ids, 5000)],
+                batch_size=5000
+            )
+
+            started = time.perf_counter()
+            index = build_index()
+            self.stdout.write(
+                f"Indexed {len(index)} suggestions in {(time.perf_counter() - started):.1f}s ({len(index._keys)} keys)"
+            )
+            keystrokes = [text[:end] for text in TYPED for end in range(1, len(text) + 1)]
+            old = [ms for text in keystrokes for ms in timed(lambda: icontains_suggestions(text), 1)]
+            new = [ms for text in keystrokes for ms in timed(lambda: index.search(text), options['repeat'])]
+            # A write clears cached top-k lists, so measure the cold path too.
+            cold = []
+            for text in keystrokes:
+                index._top.clear()
+                cold += timed(lambda: index.search(text), 1)
+            updates = timed(
+                lambda: index.set_property(rng.choice(property_ids), f'Renamed {rng.random()}', 'Arusha', 'Njiro', 1),
+                options['repeat'] * 10
+            )
+            self.stdout.write(
+                f"{len(keystrokes)} keystrokes\n"
+                f"icontains:   p50={percentile(old, 50):.2f}ms p95={percentile(old, 95):.2f}ms\n"
+                f"index:       p50={percentile(new, 50):.3f}ms p95={percentile(new, 95):.3f}ms\n"
+                f"index, cold: p50={percentile(cold, 50):.3f}ms p95={percentile(cold, 95):.3f}ms "
+                f"max={max(cold):.2f}ms\n"
+                f"incremental update: p50={percentile(updates, 50):.3f}ms p95={percentile(updates, 95):.3f}ms"
+            )
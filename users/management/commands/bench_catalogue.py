@@ -0,0 +1,104 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIClient
+
+from users.catalogue import rebuild_catalogue
+from users.models import Location, Property, User
+from ._bench import percentile, scratch_database, seed_users, timed
+
+NEARBY = {'latitude': -6.7924, 'longitude': 39.2083, 'radius': 10, 'sort_by': 'price_per_month'}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the public catalogue (read model + page cache) with the tenant nearby endpoint, "
+        "and measure cached catalogue throughput through the full request stack."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=5000, help="Requests for the throughput run")
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--clients', type=int, default=1000,
+                            help="Client IPs the throughput run spreads over; each has CATALOGUE_THROTTLE_RATE")
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            owner_id = seed_users(1, role='landlord')[0]
+            tenant = User.objects.get(pk=seed_users(1)[0])
+            locations = Location.objects.bulk_create([
+                Location(address=f'{i}', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+                         postal_code='0', latitude=-6.7924 + rng.uniform(-0.5, 0.5),
+                         longitude=39.2083 + rng.uniform(-0.5, 0.5))
+                for i in range(2000)
+            ])
+            Property.objects.bulk_create(
+                [
+                    Property(owner_id=owner_id, location=rng.choice(locations), property_name=f'Bench {i}',
+                             property_type='Apartment', rental_type='long-term', description='Bench',
+                             price_per_month=rng.randint(100, 3000),
+                             availability_status=rng.choice(['Available', 'Available', 'Rented']))
+                    for i in range(options['properties'])
+                ],
+                batch_size=5000
+            )
+            started = time.perf_counter()
+            rebuild_catalogue(batch_size=2000)
+            # Planner statistics, as autovacuum keeps them on PostgreSQL; without them SQLite
+            # walks the status index instead of the coordinate range.
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            self.stdout.write(
+                f"Built the catalogue for {options['properties']} properties in {time.perf_counter() - started:.1f}s"
+            )
+
+            tenant_client = APIClient()
+            tenant_client.force_authenticate(user=tenant)
+            public_client = APIClient()
+
+            def get(client, url, params, **extra):
+                response = client.get(url, params, **extra)
+                assert response.status_code == 200, response.status_code
+
+            nearby = timed(lambda: get(tenant_client, '/api/v1/properties/nearby/', NEARBY), options['repeat'])
+
+            def uncached():
+                cache.clear()
+                get(public_client, '/api/v1/catalogue/', NEARBY)
+
+            cold = timed(uncached, options['repeat'])
+            warm = timed(lambda: get(public_client, '/api/v1/catalogue/', NEARBY), options['repeat'])
+            self.stdout.write(f"{'endpoint':>28} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, latencies in [('properties/nearby/', nearby), ('catalogue/, page not cached', cold),
+                                     ('catalogue/, cached page', warm)]:
+                self.stdout.write(f"{label:>28} {percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}")
+
+            # Cached pages across a spread of filters, as a CDN-less node would see them.
+            pages = [{'page': page, 'sort_by': sort} for page in range(1, 21) for sort in ('newest', 'price_per_month')]
+            for params in pages:
+                get(public_client, '/api/v1/catalogue/', params)
+
+            def worker(thread):
+                client = APIClient()
+                for i in range(per_thread):
+                    # Real traffic comes from many clients, each under the production rate limit.
+                    ip = (thread * per_thread + i) % options['clients']
+                    get(client, '/api/v1/catalogue/', pages[i % len(pages)], REMOTE_ADDR=f'10.0.{ip // 256}.{ip % 256}')
+                connection.close()
+
+            per_thread = options['requests'] // options['threads']
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+                list(executor.map(worker, range(options['threads'])))
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"cached catalogue throughput: {per_thread * options['threads'] / elapsed:.0f} requests/s "
+                f"({options['threads']} threads, one process)"
+            )
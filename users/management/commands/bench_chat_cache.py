@@ -0,0 +1,97 @@
+import random
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from users import chatbot
+from users.models import Booking, Location, Property, User
+from users.transcripts import TranscriptWriter, get_writer
+from ._bench import percentile, scratch_database, seed_users, timed
+from ._stubs import fake_dialogflow_server
+
+
+class Command(BaseCommand):
+    help = "Chat load test reporting DB queries per turn with and without cached intent answers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--properties', type=int, default=500)
+        parser.add_argument('--turns', type=int, default=3000)
+        parser.add_argument('--booking-change-every', type=int, default=50,
+                            help="Save one booking every N turns to exercise invalidation")
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database(), fake_dialogflow_server() as host, \
+                override_settings(DIALOGFLOW_EMULATOR_HOST=host), \
+                mock.patch.object(TranscriptWriter, '_ensure_thread'):
+            chatbot.reset_clients()
+            tenants = list(User.objects.filter(pk__in=seed_users(options['users'])))
+            owner_id = seed_users(1, role='landlord')[0]
+            location = Location.objects.create(
+                address='Bench', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='00000'
+            )
+            Property.objects.bulk_create([
+                Property(owner_id=owner_id, location=location, property_name=f'Bench Residence {i}',
+                         property_type='Apartment', rental_type='long-term', description='Bench',
+                         price_per_month=400 + i)
+                for i in range(options['properties'])
+            ])
+            properties = list(Property.objects.all())
+            today = date.today()
+            # One booking per property so status changes never trip the overlap check.
+            Booking.objects.bulk_create([
+                Booking(user=tenant, property=property, start_date=today,
+                        end_date=today + timedelta(days=30), rental_type='long-term', monthly_rent=500)
+                for tenant, property in zip(tenants[::2], rng.sample(properties, len(tenants[::2])))
+            ])
+            bookings = list(Booking.objects.all())
+
+            clients = []
+            for tenant in tenants:
+                client = APIClient()
+                client.force_authenticate(user=tenant)
+                clients.append(client)
+            script = [
+                (rng.randrange(len(clients)), rng.choice([
+                    'Check my booking status',
+                    'Show me available properties',
+                    f'Tell me about {rng.choice(properties).property_name}',
+                ]))
+                for _ in range(options['turns'])
+            ]
+
+            self.stdout.write(f"{'cache':>6} {'turns':>6} {'queries/turn':>13} {'p50 ms':>8} {'p95 ms':>8}")
+            for enabled in (False, True):
+                cache.clear()
+                counts = {'queries': 0}
+                turns = iter(enumerate(script))
+
+                def count(execute, sql, params, many, context):
+                    counts['queries'] += 1
+                    return execute(sql, params, many, context)
+
+                def turn():
+                    i, (client_index, message) = next(turns)
+                    if i and i % options['booking_change_every'] == 0:
+                        booking = rng.choice(bookings)
+                        booking.monthly_rent += 1
+                        booking.save(update_fields=['monthly_rent'])
+                    # Only the chat request itself is counted, not the booking writes above.
+                    with connection.execute_wrapper(count):
+                        response = clients[client_index].post('/api/v1/users/chat/', {'message': message}, format='json')
+                    assert response.status_code == 200, response.status_code
+
+                with override_settings(CHATBOT_INTENT_CACHE=enabled):
+                    latencies = timed(turn, len(script))
+                    with connection.execute_wrapper(count):
+                        get_writer().flush()
+                self.stdout.write(
+                    f"{'on' if enabled else 'off':>6} {len(script):>6} {counts['queries'] / len(script):>13.2f} "
+                    f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}"
+                )
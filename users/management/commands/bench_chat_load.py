@@ -0,0 +1,159 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users import chatbot
+from users.models import Booking, Location, Property, User
+from users.tasks import drain
+from users.transcripts import TranscriptWriter, get_writer
+from ._bench import percentile, scratch_database, seed_users
+from ._stubs import fake_dialogflow_server
+
+# The messages the old live-server script sent; the last two always reach Dialogflow.
+MESSAGES = [
+    "Check my booking status",
+    "Show me available properties",
+    "I need help",
+    "Tell me about Test Property",
+    "What’s up?",
+    "hello",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Offline chatbot load test: concurrent virtual users drive users/chat/ in-process against a "
+        "local Dialogflow stand-in and report latency percentiles, throughput and DB queries per turn."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Concurrent virtual users")
+        parser.add_argument('--turns', type=int, default=20, help="Chat turns per virtual user")
+        parser.add_argument('--latency-ms', type=float, default=50, help="Simulated Dialogflow latency")
+        parser.add_argument('--think-ms', type=float, default=0, help="Pause between a user's turns")
+        parser.add_argument('--pool-size', type=int, default=4, help="DIALOGFLOW_CHANNEL_POOL_SIZE")
+        parser.add_argument('--no-local-intents', action='store_true',
+                            help="Send every message to the Dialogflow stand-in")
+        parser.add_argument('--seed', type=int, default=7)
+        parser.add_argument('--output', help="Also write the report as JSON to this file")
+
+    def seed(self, count):
+        tenant_ids = seed_users(count)
+        owner_id = seed_users(1, role='landlord')[0]
+        seed_users(1, role='admin')
+        location = Location.objects.create(
+            address='Bench', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='00000'
+        )
+        properties = Property.objects.bulk_create([
+            Property(owner_id=owner_id, location=location, property_name=name, property_type='Apartment',
+                     rental_type='long-term', description='Bench', price_per_month=500)
+            for name in ['Test Property'] + [f'Bench Residence {i}' for i in range(count)]
+        ])
+        today = date.today()
+        Booking.objects.bulk_create([
+            Booking(user_id=user_id, property=property, start_date=today, end_date=today + timedelta(days=30),
+                    rental_type='long-term', monthly_rent=500)
+            for user_id, property in zip(tenant_ids[::2], properties[1:])
+        ])
+        return [str(RefreshToken.for_user(user).access_token) for user in User.objects.filter(pk__in=tenant_ids)]
+
+    def virtual_user(self, index, token, options, start):
+        rng = random.Random(options['seed'] + index)
+        client = Client(raise_request_exception=False)
+        result = {'latencies': [], 'queries': 0, 'errors': 0}
+
+        def count(execute, sql, params, many, context):
+            result['queries'] += 1
+            return execute(sql, params, many, context)
+
+        start.wait()
+        with connection.execute_wrapper(count):
+            for _ in range(options['turns']):
+                started = time.perf_counter()
+                response = client.post(
+                    '/api/v1/users/chat/',
+                    json.dumps({'message': rng.choice(MESSAGES)}),
+                    content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Bearer {token}'
+                )
+                result['latencies'].append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    result['errors'] += 1
+                if options['think_ms']:
+                    time.sleep(options['think_ms'] / 1000)
+        connection.close()
+        return result
+
+    def handle(self, *args, **options):
+        with scratch_database(), \
+                fake_dialogflow_server(latency=options['latency_ms'] / 1000) as host, \
+                override_settings(
+                    DIALOGFLOW_EMULATOR_HOST=host,
+                    DIALOGFLOW_CHANNEL_POOL_SIZE=options['pool_size'],
+                    CHATBOT_LOCAL_INTENTS=not options['no_local_intents'],
+                ), \
+                mock.patch.object(TranscriptWriter, '_ensure_thread'):
+            chatbot.reset_clients()
+            tokens = self.seed(options['users'])
+            start = threading.Barrier(options['users'] + 1)
+            with ThreadPoolExecutor(max_workers=options['users']) as executor:
+                futures = [
+                    executor.submit(self.virtual_user, i, token, options, start)
+                    for i, token in enumerate(tokens)
+                ]
+                start.wait()
+                began = time.perf_counter()
+                results = [future.result() for future in futures]
+                elapsed = time.perf_counter() - began
+            drain()
+            # Transcript turns still buffered are part of the cost of a turn.
+            flush = {'latencies': [], 'queries': 0, 'errors': 0}
+
+            def count(execute, sql, params, many, context):
+                flush['queries'] += 1
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                get_writer().flush()
+            results.append(flush)
+            chatbot.reset_clients()
+
+        latencies = [latency for result in results for latency in result['latencies']]
+        turns = len(latencies)
+        report = {
+            'config': {key: options[key] for key in (
+                'users', 'turns', 'latency_ms', 'think_ms', 'pool_size', 'no_local_intents', 'seed'
+            )},
+            'turns': turns,
+            'errors': sum(result['errors'] for result in results),
+            'elapsed_s': round(elapsed, 3),
+            'throughput_rps': round(turns / elapsed, 1),
+            'latency_ms': {
+                'mean': round(sum(latencies) / turns, 2),
+                'p50': round(percentile(latencies, 50), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(max(latencies), 2),
+            },
+            'queries_per_turn': round(sum(result['queries'] for result in results) / turns, 2),
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, indent=2)
+        latency = report['latency_ms']
+        self.stdout.write(
+            f"{turns} turns from {options['users']} users in {report['elapsed_s']}s, {report['errors']} errors\n"
+            f"throughput={report['throughput_rps']} turns/s  p50={latency['p50']}ms  p95={latency['p95']}ms  "
+            f"p99={latency['p99']}ms  max={latency['max']}ms\n"
+            f"queries/turn={report['queries_per_turn']}"
+        )
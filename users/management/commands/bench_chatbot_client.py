@@ -0,0 +1,82 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users import chatbot
+from ._bench import percentile
+from ._stubs import fake_dialogflow_server
+
+MESSAGES = [
+    "Check my booking status",
+    "Show me available properties",
+    "I need help",
+    "Tell me about Test Property",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark Dialogflow client setup cost and concurrency against a local fake intent server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=400)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--latency-ms', type=float, default=50, help="Simulated Dialogflow latency")
+        parser.add_argument('--pool-size', type=int, default=4)
+
+    def report(self, label, latencies, elapsed):
+        self.stdout.write(
+            f"{label:>24}: p50={percentile(latencies, 50):7.2f}ms p95={percentile(latencies, 95):7.2f}ms "
+            f"throughput={len(latencies) / elapsed:8.1f} req/s"
+        )
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        with fake_dialogflow_server(latency=options['latency_ms'] / 1000) as host, \
+                override_settings(DIALOGFLOW_EMULATOR_HOST=host, DIALOGFLOW_CHANNEL_POOL_SIZE=options['pool_size']):
+            chatbot.reset_clients()
+
+            def per_call(i):
+                # Previous behaviour: a fresh client (and channel) for every message.
+                started = time.perf_counter()
+                client = chatbot._new_client()
+                client.detect_intent(request=chatbot._build_request(MESSAGES[i % 4], str(i), 'bench'))
+                client.transport.close()
+                return (time.perf_counter() - started) * 1000
+
+            def pooled(i):
+                started = time.perf_counter()
+                chatbot.detect_intent(MESSAGES[i % 4], str(i))
+                return (time.perf_counter() - started) * 1000
+
+            sequential = min(total, 100)
+            for label, fn in [('sequential, per-call', per_call), ('sequential, pooled', pooled)]:
+                started = time.perf_counter()
+                latencies = [fn(i) for i in range(sequential)]
+                self.report(label, latencies, time.perf_counter() - started)
+
+            for label, fn in [('threads, per-call', per_call), ('threads, pooled', pooled)]:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    started = time.perf_counter()
+                    latencies = list(pool.map(fn, range(total)))
+                self.report(f"{label} x{options['concurrency']}", latencies, time.perf_counter() - started)
+
+            async def run_async():
+                semaphore = asyncio.Semaphore(options['concurrency'])
+
+                async def one(i):
+                    async with semaphore:
+                        started = time.perf_counter()
+                        await chatbot.detect_intent_async(MESSAGES[i % 4], str(i))
+                        return (time.perf_counter() - started) * 1000
+
+                await one(0)  # Build the loop-bound client pool outside the timing.
+                started = time.perf_counter()
+                latencies = await asyncio.gather(*(one(i) for i in range(total)))
+                return latencies, time.perf_counter() - started
+
+            latencies, elapsed = asyncio.run(run_async())
+            self.report(f"asyncio, pooled x{options['concurrency']}", latencies, elapsed)
+            chatbot.reset_clients()
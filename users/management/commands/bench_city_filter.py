@@ -0,0 +1,99 @@
+import random
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+
+from users import places
+from users.models import Location, Property
+from ._bench import percentile, scratch_database, seed_users, timed
+
+CITIES = [('Dar es Salaam', 'Dar es Salaam'), ('Arusha', 'Arusha'), ('Mwanza', 'Mwanza'), ('Dodoma', 'Dodoma'),
+          ('Zanzibar City', 'Zanzibar'), ('Moshi', 'Kilimanjaro'), ('Tanga', 'Tanga'), ('Morogoro', 'Morogoro'),
+          ('Mbeya', 'Mbeya'), ('Iringa', 'Iringa'), ('Tabora', 'Tabora'), ('Kigoma', 'Kigoma')]
+
+
+def misspell(rng, name):
+    """How free-text entry spells a city: mostly right, sometimes in the wrong case or spacing."""
+    return rng.choice([name, name, name, name.upper(), name.lower(), f' {name}', name.replace(' ', '  ')])
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare city filters on the free-text Location.city column with the integer City key, and the "
+        "locations list's DISTINCT join with a semi-join."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=100000)
+        parser.add_argument('--landlords', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            owner_ids = seed_users(options['landlords'], role='landlord')
+            # One location per property, as listings are entered, spelled as typed.
+            Location.objects.bulk_create(
+                [
+                    Location(address=f'{i} Bench Rd', city=misspell(rng, city), region=region, country='Tanzania',
+                             postal_code='0')
+                    for i, (city, region) in enumerate(rng.choice(CITIES) for _ in range(options['properties']))
+                ],
+                batch_size=5000
+            )
+            Property.objects.bulk_create(
+                [
+                    Property(owner_id=rng.choice(owner_ids), location_id=location_id, property_name=f'Bench {i}',
+                             property_type='Apartment', rental_type='long-term', description='Bench',
+                             price_per_month=500)
+                    for i, location_id in enumerate(Location.objects.order_by('pk').values_list('pk', flat=True))
+                ],
+                batch_size=5000
+            )
+            queryset = Property.get_active().order_by('pk')
+
+            def page(filtered):
+                return filtered.count(), list(filtered.values_list('pk', flat=True)[:10])
+
+            def landlord_locations(owner_id, semi_join):
+                if semi_join:
+                    properties = Property._base_manager.filter(owner_id=owner_id)
+                    locations = Location.objects.filter(pk__in=properties.values('location'))
+                else:
+                    locations = Location.objects.filter(property__owner_id=owner_id).distinct()
+                return list(locations.order_by('pk').values_list('pk', flat=True)[:10])
+
+            rows = [
+                ("text city = 'Dar es Salaam'", lambda: page(queryset.filter(location__city='Dar es Salaam'))),
+                ("text city iexact", lambda: page(queryset.filter(location__city__iexact='dar es salaam'))),
+            ]
+            before = [(label, run(), timed(run, options['repeat'])) for label, run in rows]
+            before.append(('locations DISTINCT join', None, timed(
+                lambda: landlord_locations(rng.choice(owner_ids), False), options['repeat']
+            )))
+
+            started = time.perf_counter()
+            # Nothing is indexed or catalogued yet, so skip the refreshes respelled rows would trigger.
+            with mock.patch.object(places.search_index, 'reindex_properties'), \
+                    mock.patch.object(places.autocomplete, 'refresh_properties'), \
+                    mock.patch.object(places.catalogue, 'schedule_refresh'):
+                assigned = places.assign_places(batch_size=5000)
+            self.stdout.write(
+                f"Linked {assigned} locations to their city in {time.perf_counter() - started:.1f}s"
+            )
+
+            params = {'location__city': 'dar es salaam'}
+            after = [
+                ('city key (any spelling)', page(places.filter_by_places(queryset, params)),
+                 timed(lambda: page(places.filter_by_places(queryset, params)), options['repeat'])),
+                ('locations semi-join', None, timed(
+                    lambda: landlord_locations(rng.choice(owner_ids), True), options['repeat']
+                )),
+            ]
+            self.stdout.write(f"{'filter':>30} {'hits':>7} {'p50 ms':>8} {'p95 ms':>8}")
+            for label, result, latencies in before + after:
+                hits = result[0] if result else '-'
+                self.stdout.write(
+                    f"{label:>30} {hits:>7} {percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f}"
+                )
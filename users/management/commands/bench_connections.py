@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import RequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users import db_connections
+from users.models import Notification, User
+from users.views import NotificationViewSet
+from ._bench import percentile, scratch_database, seed_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve authenticated API requests through the full WSGI cycle with a new database connection per "
+        "request (CONN_MAX_AGE=0) and with persistent, health-checked connections, and compare latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help="Requests per run")
+        parser.add_argument('--threads', type=int, default=4, help="Worker threads, i.e. connections kept open")
+        parser.add_argument('--max-age', type=int, default=300, help="CONN_MAX_AGE for the persistent run")
+
+    def run(self, handler, environs, threads, requests):
+        def start_response(status, headers):
+            assert status.startswith('200'), status
+
+        def worker(count):
+            latencies = []
+            for i in range(count):
+                started = time.perf_counter()
+                response = handler(dict(environs[i % len(environs)]), start_response)
+                b''.join(response)
+                # Ends the request: request_finished closes connections past their CONN_MAX_AGE.
+                response.close()
+                latencies.append((time.perf_counter() - started) * 1000)
+            connections.close_all()
+            return latencies
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            runs = executor.map(worker, [requests // threads] * threads)
+            return [ms for latencies in runs for ms in latencies]
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            if connection.vendor == 'sqlite':
+                # An in-memory test database is never really closed, which would hide the connect cost.
+                connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+            with scratch_database(), mock.patch.object(NotificationViewSet, 'throttle_classes', []):
+                tenants = User.objects.filter(pk__in=seed_users(50))
+                Notification.objects.bulk_create([
+                    Notification(user=tenant, notification_type='Alert', message='Bench')
+                    for tenant in tenants for _ in range(20)
+                ])
+                factory = RequestFactory()
+                environs = [
+                    factory.get('/api/v1/notifications/',
+                                HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(tenant).access_token}').environ
+                    for tenant in tenants
+                ]
+                handler = WSGIHandler()
+                settings_dict = connection.settings_dict
+                self.stdout.write(
+                    f"{'connections':>24} {'p50 ms':>7} {'p95 ms':>7} {'connects':>9} "
+                    f"{'wait p50 ms':>12} {'wait p95 ms':>12}"
+                )
+                for label, max_age in (('new per request', 0), (f'persistent ({options["max_age"]}s)', options['max_age'])):
+                    # Every thread's wrapper reads this dict when it connects.
+                    settings_dict['CONN_MAX_AGE'] = max_age
+                    settings_dict['CONN_HEALTH_CHECKS'] = bool(max_age)
+                    connections.close_all()
+                    self.run(handler, environs, options['threads'], options['threads'] * 20)  # warm up
+                    db_connections.reset_connection_stats()
+                    latencies = self.run(handler, environs, options['threads'], options['requests'])
+                    stats = db_connections.connection_stats()
+                    self.stdout.write(
+                        f"{label:>24} {percentile(latencies, 50):>7.2f} {percentile(latencies, 95):>7.2f} "
+                        f"{sum(stats['connects'].values()):>9} {stats['wait_ms']['p50']:>12.3f} "
+                        f"{stats['wait_ms']['p95']:>12.3f}"
+                    )
@@ -0,0 +1,59 @@
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from users.models import Notification, NotificationPreference, User
+from users.notifications import notify
+from ._bench import scratch_database, seed_users
+
+
+class Command(BaseCommand):
+    help = "Compare notification rows, writes and pushes with and without digest coalescing."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--landlords', type=int, default=50)
+        parser.add_argument('--events', type=int, default=200, help="Events per landlord")
+        parser.add_argument('--hours', type=float, default=8, help="Period the events are spread over")
+        parser.add_argument('--window', type=int, default=15, help="Digest window in minutes")
+
+    def handle(self, *args, **options):
+        random.seed(7)
+        span = options['hours'] * 3600
+        with scratch_database():
+            landlords = User.objects.in_bulk(seed_users(options['landlords'], role='landlord'))
+            start = timezone.now()
+            events = sorted(
+                (random.uniform(0, span), random.choice(list(landlords)), random.choice(['Message', 'Alert', 'Reminder']))
+                for _ in range(options['landlords'] * options['events'])
+            )
+            for label, digest_enabled in [('per-event', False), ('digest', True)]:
+                Notification.objects.all().delete()
+                NotificationPreference.objects.all().delete()
+                NotificationPreference.objects.bulk_create([
+                    NotificationPreference(user_id=user_id, digest_enabled=digest_enabled,
+                                           digest_window_minutes=options['window'])
+                    for user_id in landlords
+                ])
+                counts = {'queries': 0, 'writes': 0}
+
+                def count(execute, sql, params, many, context):
+                    counts['queries'] += 1
+                    if sql.lstrip().upper().startswith(('INSERT', 'UPDATE')):
+                        counts['writes'] += 1
+                    return execute(sql, params, many, context)
+
+                with override_settings(BACKGROUND_TASKS_EAGER=True), \
+                        mock.patch('users.notifications.send_notification_to_users') as fake_push, \
+                        connection.execute_wrapper(count):
+                    for offset, user_id, notification_type in events:
+                        with mock.patch('django.utils.timezone.now', return_value=start + timedelta(seconds=offset)):
+                            notify(landlords[user_id], notification_type, f"{notification_type} event")
+                self.stdout.write(
+                    f"{label:>10}: {len(events)} events -> {Notification.objects.count()} rows, "
+                    f"{counts['writes']} writes, {fake_push.call_count} pushes, {counts['queries']} queries"
+                )
@@ -0,0 +1,57 @@
+import random
+
+from django.core.management.base import BaseCommand
+
+from users.facets import FACET_FIELDS, facet_counts
+from users.models import Location, Property
+from ._bench import percentile, scratch_database, seed_users, timed
+
+
+def per_value_counts(queryset):
+    """The approach facets replace: one COUNT per facet value."""
+    counts = {}
+    for name, field in FACET_FIELDS.items():
+        values = queryset.order_by().values_list(field, flat=True).distinct()
+        counts[name] = {value: queryset.filter(**{field: value}).count() for value in values if value is not None}
+    return counts
+
+
+class Command(BaseCommand):
+    help = "Compare single-query facet counts with one COUNT per facet value as the number of cities grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=50000)
+        parser.add_argument('--cities', default='10,100,1000', help="Comma-separated distinct city counts")
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            owner_id = seed_users(1, role='landlord')[0]
+            self.stdout.write(f"{'cities':>7} {'per-value p50 ms':>17} {'queries':>8} {'grouped p50 ms':>15} {'queries':>8}")
+            for cities in [int(step) for step in options['cities'].split(',')]:
+                Property.objects.all().delete()
+                Location.objects.all().delete()
+                locations = Location.objects.bulk_create([
+                    Location(address=f'{i}', city=f'City {i}', region='Region', country='Tanzania', postal_code='0')
+                    for i in range(cities)
+                ])
+                Property.objects.bulk_create(
+                    [
+                        Property(owner_id=owner_id, location=rng.choice(locations), property_name=f'Bench {i}',
+                                 property_type=rng.choice(Property.PROPERTY_TYPE_CHOICES)[0],
+                                 rental_type=rng.choice(Property.RENTAL_TYPE_CHOICES)[0],
+                                 availability_status=rng.choice(Property.AVAILABILITY_CHOICES)[0],
+                                 description='Bench', price_per_month=500)
+                        for i in range(options['properties'])
+                    ],
+                    batch_size=5000
+                )
+                queryset = Property.get_active().filter(owner_id=owner_id, rental_type='long-term')
+                assert per_value_counts(queryset) == facet_counts(queryset)
+                old = timed(lambda: per_value_counts(queryset), options['repeat'])
+                new = timed(lambda: facet_counts(queryset), options['repeat'])
+                old_queries = 4 + sum(len(values) for values in facet_counts(queryset).values())
+                self.stdout.write(
+                    f"{cities:>7} {percentile(old, 50):>17.1f} {old_queries:>8} {percentile(new, 50):>15.1f} {1:>8}"
+                )
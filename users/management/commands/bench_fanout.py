@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.models import Notification
+from users.notifications import fan_out, resolve_segment
+from ._bench import scratch_database, seed_users
+
+
+class Command(BaseCommand):
+    help = "Time a bulk notification fan-out against per-row creation on a scratch database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=50000)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--baseline', type=int, default=2000,
+                            help="Recipients for the one-create-per-row baseline (0 to skip)")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            user_ids = seed_users(options['recipients'])
+            self.stdout.write(f"Seeded {len(user_ids)} tenants")
+
+            if options['baseline']:
+                started = time.perf_counter()
+                for user_id in user_ids[:options['baseline']]:
+                    Notification.objects.create(user_id=user_id, notification_type='Alert', message='Baseline')
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"  per-row create: {options['baseline']} rows in {elapsed:.2f}s "
+                    f"({options['baseline'] / elapsed:,.0f} rows/s)"
+                )
+
+            with override_settings(NOTIFICATION_FANOUT_CHUNK_SIZE=options['chunk_size'], BACKGROUND_TASKS_EAGER=True):
+                started = time.perf_counter()
+                created = fan_out(resolve_segment('role', 'tenant'), 'Alert', 'Fan-out benchmark')
+                elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"  fan-out:        {created} rows in {elapsed:.2f}s ({created / elapsed:,.0f} rows/s, "
+                f"chunk={options['chunk_size']}, push lookups included)"
+            )
@@ -0,0 +1,193 @@
+import random
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from users import views
+from users.models import (
+    Booking, BookingInquiry, Location, MaintenanceRequest, Message, Notification, Payment, Property, Review,
+    SupportTicket, User,
+)
+from ._bench import percentile, scratch_database, seed_users, timed
+
+# Index names added for the hot query shapes; dropped for the "before" run.
+LIVE_INDEXES = {
+    User: ['idx_user_live_role'],
+    Property: ['idx_property_live_owner'],
+    Booking: ['idx_booking_live_user', 'idx_booking_live_prop_status'],
+    Payment: ['idx_payment_live_booking'],
+    Review: ['idx_review_live_user', 'idx_review_live_property'],
+    Message: ['idx_message_live_receiver', 'idx_message_live_sender'],
+    Notification: ['idx_notification_live_user', 'idx_notif_live_user_read'],
+    BookingInquiry: ['idx_inquiry_live_user', 'idx_inquiry_live_property'],
+    MaintenanceRequest: ['idx_maint_live_user', 'idx_maint_live_property'],
+    SupportTicket: ['idx_ticket_live_user'],
+}
+
+
+def viewset_queryset(viewset_class, user, **params):
+    """The queryset a viewset's list action runs for ``user``, filters included."""
+    request = Request(RequestFactory().get('/', params))
+    request.user = user
+    view = viewset_class(request=request, format_kwarg=None, action='list', kwargs={})
+    return view.filter_queryset(view.get_queryset())
+
+
+INDEX_RE = re.compile(r'(?:USING (?:COVERING )?INDEX|Index (?:Only )?Scan using|Bitmap Index Scan on) (\w+)')
+
+
+def indexes_used(plan):
+    return list(dict.fromkeys(INDEX_RE.findall(plan)))
+
+
+def full_scans(plan):
+    """Plan lines that read a whole table (SQLite "SCAN", PostgreSQL "Seq Scan")."""
+    return [
+        line.strip() for line in plan.splitlines()
+        if (' SCAN ' in f' {line} ' and 'USING' not in line and 'CONSTANT ROW' not in line) or 'Seq Scan' in line
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot viewset queries on a large seeded dataset with and without the partial "
+        "is_deleted=false indexes, and fail if any still reads a whole table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--rows', type=int, default=200000, help="Rows per hot table")
+        parser.add_argument('--deleted', type=float, default=0.3, help="Share of soft-deleted rows")
+        parser.add_argument('--hot-share', type=float, default=0.05,
+                            help="Share of rows owned by the measured (heaviest) tenant and landlord")
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--show-plans', action='store_true')
+
+    def seed(self, options):
+        rng = random.Random(7)
+        rows = options['rows']
+        tenant_ids = seed_users(options['users'])
+        landlord_ids = seed_users(options['users'] // 20, role='landlord')
+        seed_users(5, role='admin')
+        deleted = lambda: rng.random() < options['deleted']
+
+        def pick(ids):
+            # The first id is a heavy user: the one whose queries are measured.
+            return ids[0] if rng.random() < options['hot_share'] else rng.choice(ids)
+
+        locations = Location.objects.bulk_create([
+            Location(address=f'Bench {i}', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+                     postal_code='0')
+            for i in range(rows // 100)
+        ])
+        Property.objects.bulk_create(
+            [Property(owner_id=pick(landlord_ids), location=rng.choice(locations), property_name=f'Bench {i}',
+                      property_type='Apartment', rental_type='long-term', description='Bench',
+                      price_per_month=500, is_deleted=deleted())
+             for i in range(rows // 10)],
+            batch_size=5000
+        )
+        property_ids = list(Property._base_manager.values_list('pk', flat=True))
+        start = date(2024, 1, 1)
+        Booking.objects.bulk_create(
+            [Booking(user_id=pick(tenant_ids), property_id=rng.choice(property_ids),
+                     start_date=start + timedelta(days=i % 700), end_date=start + timedelta(days=i % 700 + 30),
+                     rental_type='long-term', monthly_rent=500,
+                     status=rng.choice(['Pending', 'Confirmed', 'Completed', 'Cancelled']), is_deleted=deleted())
+             for i in range(rows)],
+            batch_size=5000
+        )
+        booking_ids = list(Booking._base_manager.values_list('pk', flat=True))
+        Payment.objects.bulk_create(
+            [Payment(booking_id=booking_id, amount=500, payment_method='Mobile Money', is_deleted=deleted())
+             for booking_id in booking_ids],
+            batch_size=5000
+        )
+        for model, extra in [
+            (Review, lambda: {'property_id': rng.choice(property_ids), 'rating': 4, 'review_text': 'Bench'}),
+            (BookingInquiry, lambda: {'property_id': rng.choice(property_ids), 'message': 'Bench'}),
+            (MaintenanceRequest, lambda: {'property_id': rng.choice(property_ids), 'description': 'Bench'}),
+            (SupportTicket, lambda: {'subject': 'Bench', 'description': 'Bench'}),
+        ]:
+            model.objects.bulk_create(
+                [model(user_id=pick(tenant_ids), is_deleted=deleted(), **extra()) for _ in range(rows // 4)],
+                batch_size=5000
+            )
+        Message.objects.bulk_create(
+            [Message(sender_id=rng.choice(tenant_ids), receiver_id=pick(landlord_ids), content='Bench',
+                     is_deleted=deleted()) for _ in range(rows)],
+            batch_size=5000
+        )
+        Notification.objects.bulk_create(
+            [Notification(user_id=pick(tenant_ids), notification_type='Alert', message='Bench',
+                          read_status=rng.choice(['Read', 'Unread']), is_deleted=deleted()) for _ in range(rows)],
+            batch_size=5000
+        )
+        return User.objects.get(pk=tenant_ids[0]), User.objects.get(pk=landlord_ids[0]), property_ids[0]
+
+    def hot_queries(self, tenant, landlord, property_id):
+        today = timezone.now().date()
+        return [
+            ('properties (landlord)', viewset_queryset(views.PropertyViewSet, landlord)),
+            ('bookings (tenant)', viewset_queryset(views.BookingViewSet, tenant)),
+            ('bookings (landlord)', viewset_queryset(views.BookingViewSet, landlord)),
+            ('booking overlap check', Booking.objects.filter(
+                property_id=property_id, status__in=['Pending', 'Confirmed'],
+                start_date__lte=today + timedelta(days=30), end_date__gte=today)),
+            ('payments (tenant)', viewset_queryset(views.PaymentViewSet, tenant)),
+            ('reviews (tenant)', viewset_queryset(views.ReviewViewSet, tenant)),
+            ('reviews (landlord)', viewset_queryset(views.ReviewViewSet, landlord)),
+            ('messages (inbox + sent)', viewset_queryset(views.MessageViewSet, landlord)),
+            ('notifications', viewset_queryset(views.NotificationViewSet, tenant)),
+            ('notifications, unread', viewset_queryset(views.NotificationViewSet, tenant, read_status='Unread')),
+            ('notification digest lookup', Notification.get_active().filter(
+                user=tenant, notification_type='Alert', read_status='Unread',
+                sent_at__gte=timezone.now() - timedelta(minutes=15)).order_by('-sent_at')),
+            ('inquiries (tenant)', viewset_queryset(views.BookingInquiryViewSet, tenant)),
+            ('inquiries (landlord)', viewset_queryset(views.BookingInquiryViewSet, landlord)),
+            ('maintenance (tenant)', viewset_queryset(views.MaintenanceRequestViewSet, tenant)),
+            ('support tickets', viewset_queryset(views.SupportTicketViewSet, tenant)),
+            ('users by role (segment)', User.get_active().filter(role='admin')),
+        ]
+
+    def set_indexes(self, present):
+        with connection.schema_editor() as editor:
+            for model, names in LIVE_INDEXES.items():
+                for index in model._meta.indexes:
+                    if index.name in names:
+                        (editor.add_index if present else editor.remove_index)(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            tenant, landlord, property_id = self.seed(options)
+            results = {}
+            for label, present in (('before', False), ('after', True)):
+                self.set_indexes(present)
+                for name, queryset in self.hot_queries(tenant, landlord, property_id):
+                    page = queryset[:10]
+                    plan = page.explain()
+                    latencies = timed(lambda: (queryset.count(), list(page)), options['repeat'])
+                    results.setdefault(name, {})[label] = (full_scans(plan), percentile(latencies, 50), plan)
+
+        self.stdout.write(f"{'query':>28} {'before p50 ms':>14} {'after p50 ms':>13}  index used after (before)")
+        scanning = []
+        for name, runs in results.items():
+            (before_scans, before_ms, before_plan), (after_scans, after_ms, after_plan) = runs['before'], runs['after']
+            describe = lambda scans, plan: 'FULL SCAN' if scans else ', '.join(indexes_used(plan))
+            self.stdout.write(
+                f"{name:>28} {before_ms:>14.2f} {after_ms:>13.2f}  "
+                f"{describe(after_scans, after_plan)} ({describe(before_scans, before_plan)})"
+            )
+            if options['show_plans']:
+                self.stdout.write(runs['after'][2])
+            if runs['after'][0]:
+                scanning.append(f"{name}: {'; '.join(runs['after'][0])}")
+        if scanning:
+            raise CommandError("Hot queries still read whole tables:\n" + '\n'.join(scanning))
@@ -0,0 +1,92 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.models import Location, Property
+from users.name_index import build_index
+from ._bench import percentile, scratch_database, seed_users, timed
+
+ADJECTIVES = ['Sunset', 'Ocean', 'Palm', 'Golden', 'Royal', 'Coral', 'Green', 'Silver', 'Blue', 'Harbour',
+              'Baobab', 'Kilimanjaro', 'Savanna', 'Sunrise', 'Jasmine', 'Mango', 'Pearl', 'Cedar', 'Amani', 'Upendo']
+NOUNS = ['Villa', 'Apartments', 'Residence', 'Court', 'Heights', 'Gardens', 'Suites', 'Lodge', 'House', 'Towers',
+         'Terrace', 'Place', 'Homes', 'Retreat', 'View', 'Plaza', 'Studios', 'Manor', 'Cottage', 'Inn']
+AREAS = ['Masaki', 'Mikocheni', 'Oysterbay', 'Sinza', 'Kinondoni', 'Mbezi', 'Kariakoo', 'Upanga', 'Msasani',
+         'Tegeta', 'Kigamboni', 'Ilala', 'Temeke', 'Ubungo', 'Mwenge']
+
+
+def typo(name, rng):
+    """Drop, swap or double one character so lookups exercise fuzzy matching."""
+    i = rng.randrange(1, len(name) - 1)
+    kind = rng.randrange(3)
+    if kind == 0:
+        return name[:i] + name[i + 1:]
+    if kind == 1:
+        return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+    return name[:i] + name[i] + name[i:]
+
+
+class Command(BaseCommand):
+    help = "Benchmark fuzzy property-name lookups (trigram index) against the old icontains query."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=7)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with scratch_database():
+            owner_id = seed_users(1, role='landlord')[0]
+            location = Location.objects.create(
+                address='Bench', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='00000'
+            )
+            names = [
+                f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(AREAS)} {i}"
+                for i in range(options['properties'])
+            ]
+            Property.objects.bulk_create(
+                [
+                    Property(owner_id=owner_id, location=location, property_name=name, property_type='Apartment',
+                             rental_type='long-term', description='Bench property', price_per_month=500)
+                    for name in names
+                ],
+                batch_size=5000
+            )
+            ids = dict(Property.objects.values_list('property_name', 'id'))
+
+            started = time.perf_counter()
+            index = build_index()
+            build_ms = (time.perf_counter() - started) * 1000
+            self.stdout.write(f"Indexed {len(index)} properties in {build_ms:.0f}ms")
+
+            targets = rng.sample(names, options['queries'])
+            queries = [(ids[name], typo(name, rng)) for name in targets]
+            partial = [(ids[name], name.rsplit(' ', 2)[0]) for name in targets]  # "Sunset Villa"
+
+            def run(label, lookup, cases):
+                hits = []
+                state = iter(cases)
+
+                def one():
+                    expected, query = next(state)
+                    hits.append(expected in lookup(query))
+
+                latencies = timed(one, len(cases))
+                self.stdout.write(
+                    f"{label:>28}: p50={percentile(latencies, 50):8.2f}ms p95={percentile(latencies, 95):8.2f}ms "
+                    f"found={sum(hits) / len(hits):6.1%}"
+                )
+
+            def trigram(query):
+                return [pk for pk, _, _ in index.search(query, limit=10)]
+
+            def icontains(query):
+                return list(Property.objects.filter(property_name__icontains=query).values_list('id', flat=True)[:10])
+
+            run('icontains, typo', icontains, queries)
+            run('trigram index, typo', trigram, queries)
+            run('trigram index, exact name', trigram, [(ids[name], name) for name in targets])
+            # Partial names match many rows; report latency only (found = target in top 10).
+            run('icontains, partial', icontains, partial)
+            run('trigram index, partial', trigram, partial)
@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import Notification, User
+from users.retention import archive_notifications
+from ._bench import percentile, scratch_database, seed_users, timed
+
+
+class Command(BaseCommand):
+    help = "Measure NotificationViewSet list latency as one user's history grows, before and after archiving."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--steps', default='1000,10000,50000', help="Comma-separated history sizes")
+        parser.add_argument('--recent', type=int, default=200, help="Rows inside the retention window")
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            user_id = seed_users(1)[0]
+            client = APIClient()
+            client.force_authenticate(user=User.objects.get(pk=user_id))
+            old = timezone.now() - timedelta(days=365)
+
+            def list_page():
+                response = client.get('/api/v1/notifications/')
+                assert response.status_code == 200, response.status_code
+
+            self.stdout.write(f"{'history':>8} {'hot rows':>9} {'p50 ms':>8} {'p95 ms':>8}")
+            for size in [int(step) for step in options['steps'].split(',')]:
+                Notification.objects.all().delete()
+                Notification.objects.bulk_create(
+                    [Notification(user_id=user_id, notification_type='Alert', message=f'Old {i}')
+                     for i in range(size - options['recent'])],
+                    batch_size=5000
+                )
+                Notification.objects.update(sent_at=old)
+                Notification.objects.bulk_create(
+                    [Notification(user_id=user_id, notification_type='Alert', message=f'Recent {i}')
+                     for i in range(options['recent'])]
+                )
+                for label in ('before', 'after'):
+                    if label == 'after':
+                        archive_notifications(batch_size=5000)
+                    latencies = timed(list_page, options['repeat'])
+                    self.stdout.write(
+                        f"{size:>8} {Notification.objects.count():>9} "
+                        f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}  ({label} archiving)"
+                    )
@@ -0,0 +1,80 @@
+import datetime
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from users import payments
+from users.models import Booking, Payment, Property
+from ._bench import scratch_database, seed_users
+from ._stubs import fake_stripe_server
+
+# Share of pending payments whose intent has, by the time the job runs, reached each status.
+INTENT_STATUSES = [('succeeded', 0.6), ('canceled', 0.05), ('requires_payment_method', 0.05), ('processing', 0.3)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcile pending payments against a local PaymentIntent stand-in, one lookup at a time and with "
+        "concurrent lookups, and report throughput and the UPDATEs issued."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32])
+        parser.add_argument('--latency-ms', type=float, default=20, help="Simulated provider latency per request")
+        parser.add_argument('--baseline-payments', type=int, default=500,
+                            help="Payments for the sequential baseline (0 to skip)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        statuses, weights = zip(*INTENT_STATUSES)
+        intents = {}
+        for i in range(options['payments']):
+            status = rng.choices(statuses, weights)[0]
+            intents[f'pi_bench{i:08d}'] = {
+                'id': f'pi_bench{i:08d}', 'status': status,
+                'last_payment_error': {'code': 'card_declined'} if status == 'requires_payment_method' else None,
+            }
+        with scratch_database(), fake_stripe_server(intents, latency=options['latency_ms'] / 1000) as url:
+            tenant_id = seed_users(1)[0]
+            owner_id = seed_users(1, role='landlord')[0]
+            prop = Property.objects.create(
+                owner_id=owner_id, property_name='Bench', property_type='Apartment', rental_type='long-term',
+                description='Bench', price_per_month=500
+            )
+            start = datetime.date.today() + datetime.timedelta(days=1)
+            booking = Booking.objects.create(
+                user_id=tenant_id, property=prop, start_date=start, end_date=start + datetime.timedelta(days=30),
+                rental_type='long-term', monthly_rent=500
+            )
+            Payment.objects.bulk_create(
+                [Payment(booking=booking, amount=500, payment_method='Credit Card', stripe_payment_intent_id=intent_id)
+                 for intent_id in intents],
+                batch_size=5000
+            )
+            runs = [(f'concurrency {n}', options['payments'], n) for n in options['concurrency']]
+            if options['baseline_payments']:
+                runs.insert(0, ('sequential', options['baseline_payments'], 1))
+            for label, count, concurrency in runs:
+                Payment.objects.update(payment_status='Pending')
+                # Only the first ``count`` payments are pending for this run.
+                Payment.objects.filter(pk__gt=Payment.objects.order_by('pk')[count - 1:count].get().pk).update(
+                    payment_status='Completed'
+                )
+                with override_settings(STRIPE_API_BASE=url, PAYMENT_PROVIDER_MAX_CONCURRENCY=concurrency), \
+                        CaptureQueriesContext(connection) as queries:
+                    payments.reset_executor()
+                    started = time.perf_counter()
+                    counts = payments.reconcile_payments(options['batch_size'])
+                    elapsed = time.perf_counter() - started
+                updates = sum(q['sql'].startswith('UPDATE') for q in queries)
+                self.stdout.write(
+                    f"{label:>15}: {count} payments in {elapsed:.2f}s, {count / elapsed:,.0f} payments/s, "
+                    f"{updates} UPDATEs (completed={counts.get('Completed', 0)} failed={counts.get('Failed', 0)} "
+                    f"pending={counts.get('pending', 0)} errors={counts.get('errors', 0)})"
+                )
+            payments.reset_executor()
@@ -0,0 +1,142 @@
+import datetime
+import json
+import random
+import time
+from collections import Counter
+
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from users import tasks, webhooks
+from users.models import Booking, Payment, PaymentEvent, Property
+from ._bench import percentile, scratch_database, seed_users
+
+SECRET = 'whsec_bench'
+
+# What the provider sends for one payment, oldest first: most go straight through,
+# some are declined once and retried, a few are declined for good.
+LIFECYCLES = [
+    (['payment_intent.created', 'payment_intent.processing', 'payment_intent.succeeded'], 0.75),
+    (['payment_intent.created', 'payment_intent.payment_failed', 'payment_intent.succeeded'], 0.15),
+    (['payment_intent.created', 'payment_intent.payment_failed', 'payment_intent.canceled'], 0.10),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver signed payment webhooks through the endpoint, first applying each inside its request, then "
+        "only acknowledging them and applying the stored events on the background pool, and report throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=10000)
+        parser.add_argument('--redeliveries', type=float, default=0.05, help="Share of events delivered twice")
+        parser.add_argument('--window', type=int, default=50, help="Deliveries shuffled within windows this size")
+        parser.add_argument('--workers', type=int, default=4, help="Background pool size (1 on SQLite)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        lifecycles, weights = zip(*LIFECYCLES)
+        events, outcomes = [], {}
+        base = int(time.time()) - 3600
+        while len(events) < options['events']:
+            intent_id = f'pi_bench{len(outcomes):08d}'
+            lifecycle = rng.choices(lifecycles, weights)[0]
+            for step, event_type in enumerate(lifecycle):
+                events.append({
+                    'id': f'evt_bench{len(events):08d}', 'type': event_type, 'created': base + len(outcomes) + step * 60,
+                    'data': {'object': {'id': intent_id, 'object': 'payment_intent'}},
+                })
+            outcomes[intent_id] = 'Pending'
+        events = events[:options['events']]
+        for event in events:
+            # What the newest settling event decides, or still Pending.
+            intent_id = event['data']['object']['id']
+            outcomes[intent_id] = webhooks.EVENT_OUTCOMES.get(event['type'], outcomes[intent_id])
+        deliveries = events + rng.sample(events, int(len(events) * options['redeliveries']))
+        # Providers do not promise delivery order.
+        for start in range(0, len(deliveries), options['window']):
+            window = deliveries[start:start + options['window']]
+            rng.shuffle(window)
+            deliveries[start:start + options['window']] = window
+        bodies = [json.dumps(event).encode() for event in deliveries]
+
+        with scratch_database(), override_settings(STRIPE_WEBHOOK_SECRET=SECRET):
+            tenant_id = seed_users(1)[0]
+            owner_id = seed_users(1, role='landlord')[0]
+            prop = Property.objects.create(
+                owner_id=owner_id, property_name='Bench', property_type='Apartment', rental_type='long-term',
+                description='Bench', price_per_month=500
+            )
+            start = datetime.date.today() + datetime.timedelta(days=1)
+            # One booking per payment; bulk_create skips Booking.save()'s overlap check.
+            Booking.objects.bulk_create(
+                [Booking(user_id=tenant_id, property=prop, start_date=start, end_date=start + datetime.timedelta(days=30),
+                         rental_type='long-term', monthly_rent=500) for _ in outcomes],
+                batch_size=5000
+            )
+            Payment.objects.bulk_create(
+                [Payment(booking_id=booking_id, amount=500, payment_method='Credit Card', stripe_payment_intent_id=intent_id)
+                 for booking_id, intent_id in zip(Booking.objects.order_by('pk').values_list('pk', flat=True), outcomes)],
+                batch_size=5000
+            )
+            client = Client()
+
+            def deliver_all():
+                latencies = []
+                for body in bodies:
+                    timestamp = int(time.time())
+                    sent = time.perf_counter()
+                    response = client.post(
+                        '/api/v1/payments/webhook/', body, content_type='application/json',
+                        HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={webhooks.sign(body, timestamp, SECRET)}'
+                    )
+                    latencies.append((time.perf_counter() - sent) * 1000)
+                    assert response.status_code == 200, response.content
+                return latencies
+
+            def reset():
+                PaymentEvent.objects.all().delete()
+                Payment.objects.update(payment_status='Pending')
+                Booking.objects.update(status='Pending')
+
+            def report(label, latencies, elapsed, settled=True):
+                line = f"{label:>22}: {len(events) / elapsed:>6,.0f} events/s ({elapsed:.2f}s)"
+                if latencies:
+                    line += f", ack p50 {percentile(latencies, 50):.2f}ms p95 {percentile(latencies, 95):.2f}ms"
+                if settled:
+                    statuses = dict(Payment.objects.values_list('stripe_payment_intent_id', 'payment_status'))
+                    wrong = sum(statuses[intent_id] != outcome for intent_id, outcome in outcomes.items())
+                    events_by_status = Counter(PaymentEvent.objects.values_list('status', flat=True))
+                    line += f"; {wrong} payments wrong; " + ' '.join(
+                        f'{status}={count}' for status, count in sorted(events_by_status.items())
+                    )
+                self.stdout.write(line)
+
+            self.stdout.write(f"{len(bodies)} deliveries ({len(events)} events) for {len(outcomes)} payments")
+            with override_settings(BACKGROUND_TASKS_EAGER=True):
+                started = time.perf_counter()
+                latencies = deliver_all()
+                report('applied in request', latencies, time.perf_counter() - started)
+
+            reset()
+            # Acknowledge everything first, then let the pool apply the stored events: SQLite
+            # cannot take the request's writes and the workers' at once, and takes one worker.
+            workers = 1 if connection.vendor == 'sqlite' else options['workers']
+            with mock.patch.object(webhooks, 'schedule'):
+                started = time.perf_counter()
+                latencies = deliver_all()
+                acknowledged = time.perf_counter() - started
+            report('acknowledged only', latencies, acknowledged, settled=False)
+            # Seeding started the pool at its configured size; the next task starts one sized as above.
+            tasks.drain()
+            with override_settings(BACKGROUND_TASKS_EAGER=False, BACKGROUND_TASK_WORKERS=workers):
+                started = time.perf_counter()
+                webhooks.replay()
+                applied = time.perf_counter() - started
+            report(f'applied on {workers} worker(s)', [], applied, settled=False)
+            report('end to end', [], acknowledged + applied)
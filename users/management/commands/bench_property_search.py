@@ -0,0 +1,102 @@
+import random
+import time
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from users.models import Amenity, Location, Property, PropertyAmenity
+from users.search_index import build_index, rank_order
+from ._bench import percentile, scratch_database, seed_users, timed
+
+AREAS = [('Masaki', 'Dar es Salaam'), ('Mikocheni', 'Dar es Salaam'), ('Sinza', 'Dar es Salaam'),
+         ('Njiro', 'Arusha'), ('Kijenge', 'Arusha'), ('Stone Town', 'Zanzibar'), ('Nungwi', 'Zanzibar'),
+         ('Kilimahewa', 'Mwanza'), ('Forest', 'Morogoro'), ('Uzunguni', 'Dodoma')]
+NAMES = ['Ocean', 'Palm', 'Garden', 'Sunset', 'Coral', 'Baobab', 'Harbour', 'Jasmine', 'Mango', 'Cedar']
+KINDS = ['Apartments', 'Villa', 'House', 'Residence', 'Studios', 'Cottage', 'Suites', 'Lodge']
+WORDS = ('quiet spacious furnished modern sea view balcony garden parking secure family friendly close beach '
+         'market school hospital bright airy newly renovated kitchen tiled floors fenced compound water backup '
+         'generator rooftop terrace walking distance shops restaurants nightlife serene neighbourhood').split()
+AMENITIES = ['Wi-Fi', 'Parking', 'Swimming Pool', 'Air Conditioning', 'Generator', 'Security Guard', 'Gym',
+             'Garden', 'Balcony', 'Water Tank', 'CCTV', 'Laundry', 'Elevator', 'DSTV', 'Furnished Kitchen']
+QUERIES = ['ocean', 'swimming pool', 'masaki apartments', 'quiet garden', 'sea view balcony', 'arusha villa gym',
+           'furnished', 'zanzibar beach cottage', 'generator parking', 'renov']
+
+
+class Command(BaseCommand):
+    help = "Benchmark ranked property search (in-memory BM25 index) against the old icontains SearchFilter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--properties', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        with scratch_database():
+            owner_id = seed_users(1, role='landlord')[0]
+            locations = [
+                Location.objects.create(address=region, city=city, region=region, country='Tanzania', postal_code='0')
+                for region, city in AREAS
+            ]
+            amenities = [Amenity.objects.create(name=name) for name in AMENITIES]
+            Property.objects.bulk_create(
+                [
+                    Property(owner_id=owner_id, location=rng.choice(locations),
+                             property_name=f'{rng.choice(NAMES)} {rng.choice(KINDS)} {i}',
+                             property_type='Apartment', rental_type='long-term', price_per_month=500,
+                             description=' '.join(rng.choices(WORDS, k=rng.randint(15, 40))))
+                    for i in range(options['properties'])
+                ],
+                batch_size=5000
+            )
+            PropertyAmenity.objects.bulk_create(
+                [
+                    PropertyAmenity(property_id=pk, amenity=amenity)
+                    for pk in Property.objects.values_list('pk', flat=True)
+                    for amenity in rng.sample(amenities, rng.randint(1, 6))
+                ],
+                batch_size=10000
+            )
+
+            started = time.perf_counter()
+            index = build_index()
+            self.stdout.write(
+                f"Indexed {len(index)} properties in {(time.perf_counter() - started):.1f}s "
+                f"({len(index._vocabulary)} terms)"
+            )
+            owned = Property.get_active().filter(owner_id=owner_id)
+
+            def old_page(query):
+                terms = query.split()
+                queryset = owned.filter(reduce(and_, [
+                    Q(property_name__icontains=term) | Q(description__icontains=term) for term in terms
+                ])).order_by('pk')
+                return queryset.count(), list(queryset[:10])
+
+            def new_page(query):
+                ids = [pk for pk, _ in index.search(query, limit=settings.PROPERTY_SEARCH_MAX_RESULTS, owner_id=owner_id)]
+                queryset = owned.filter(pk__in=ids).order_by(rank_order(ids))
+                return queryset.count(), list(queryset[:10])
+
+            self.stdout.write(
+                f"{'query':>24} {'icontains hits':>14} {'p50 ms':>8} {'index hits':>10} {'p50 ms':>8} {'lookup ms':>9}"
+            )
+            old_all, new_all = [], []
+            for query in QUERIES:
+                old_hits = old_page(query)[0]
+                new_hits = len(index.search(query, limit=10 ** 6, owner_id=owner_id))
+                old_latencies = timed(lambda: old_page(query), options['repeat'])
+                new_latencies = timed(lambda: new_page(query), options['repeat'])
+                lookup = timed(lambda: index.search(query, limit=1000, owner_id=owner_id), options['repeat'])
+                old_all += old_latencies
+                new_all += new_latencies
+                self.stdout.write(
+                    f"{query:>24} {old_hits:>14} {percentile(old_latencies, 50):>8.1f} {new_hits:>10} "
+                    f"{percentile(new_latencies, 50):>8.1f} {percentile(lookup, 50):>9.1f}"
+                )
+            self.stdout.write(
+                f"overall first page: icontains p50={percentile(old_all, 50):.1f}ms p95={percentile(old_all, 95):.1f}ms, "
+                f"index p50={percentile(new_all, 50):.1f}ms p95={percentile(new_all, 95):.1f}ms"
+            )
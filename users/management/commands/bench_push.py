@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.fcm_utils import send_multicast
+from ._stubs import stub_server
+
+
+class Command(BaseCommand):
+    help = "Measure push delivery throughput (messages/sec) against a local FCM stand-in."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--latency-ms', type=float, default=20, help="Simulated provider latency per request")
+        parser.add_argument('--invalid-ratio', type=float, default=0.01)
+        parser.add_argument('--baseline-devices', type=int, default=200,
+                            help="Devices for the one-request-per-device baseline (0 to skip)")
+
+    def handle(self, *args, **options):
+        latency = options['latency_ms'] / 1000
+        invalid_ratio = options['invalid_ratio']
+
+        def respond(path, payload):
+            time.sleep(latency)
+            results = [
+                {'error': 'NotRegistered'} if random.random() < invalid_ratio else {'message_id': token[-8:]}
+                for token in payload.get('registration_ids', [])
+            ]
+            return 200, {'results': results}
+
+        with stub_server(respond) as url:
+            runs = [('multicast', options['devices'], options['batch_size'], options['concurrency'])]
+            if options['baseline_devices']:
+                runs.insert(0, ('sequential', options['baseline_devices'], 1, 1))
+            for label, devices, batch_size, concurrency in runs:
+                tokens = [f'bench-token-{i:08d}' for i in range(devices)]
+                with override_settings(FCM_ENDPOINT=f'{url}/fcm/send',
+                                       FCM_MULTICAST_BATCH_SIZE=batch_size,
+                                       FCM_MAX_CONCURRENCY=concurrency):
+                    if label == 'sequential':
+                        started = time.perf_counter()
+                        stats = {'success': 0, 'failure': 0, 'invalid_tokens': []}
+                        for token in tokens:
+                            result = send_multicast([token], 'Bench', 'Benchmark message', prune=False)
+                            for key in ('success', 'failure'):
+                                stats[key] += result[key]
+                            stats['invalid_tokens'] += result['invalid_tokens']
+                    else:
+                        started = time.perf_counter()
+                        stats = send_multicast(tokens, 'Bench', 'Benchmark message', prune=False)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label:>10}: {devices} devices, batch={batch_size}, concurrency={concurrency}, "
+                    f"{elapsed:.2f}s, {devices / elapsed:,.0f} msg/s "
+                    f"(ok={stats['success']} failed={stats['failure']} invalid={len(stats['invalid_tokens'])})"
+                )
@@ -0,0 +1,194 @@
+import logging
+import os
+import random
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users import db_router
+from users.models import Booking, Location, Notification, Property, User
+from ._bench import percentile, scratch_database, seed_users
+
+REPLICA = 'replica_1'
+
+
+class SnapshotReplica:
+    """
+    A second SQLite database standing in for a streaming replica: ``sync()``
+    copies the primary into it with SQLite's online backup, and its lag is the
+    time since the primary first wrote something the copy does not have.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.synced_at = time.monotonic()
+        self.dirty_since = None
+
+    def sync(self):
+        primary, replica = connections['default'], connections[self.alias]
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+        self.synced_at, self.dirty_since = time.monotonic(), None
+
+    def wrote(self, execute, sql, params, many, context):
+        if self.dirty_since is None and not sql.lstrip().upper().startswith('SELECT'):
+            self.dirty_since = time.monotonic()
+        return execute(sql, params, many, context)
+
+    def lag(self, alias):
+        return 0.0 if self.dirty_since is None else time.monotonic() - self.dirty_since
+
+
+@contextmanager
+def sqlite_replica(alias):
+    """Register ``alias`` as a file-backed SQLite copy of the scratch primary."""
+    with tempfile.TemporaryDirectory() as directory:
+        connections.settings[alias] = {
+            **connections['default'].settings_dict, 'NAME': os.path.join(directory, 'replica.sqlite3'),
+        }
+        replica = SnapshotReplica(alias)
+        try:
+            replica.sync()
+            with connections['default'].execute_wrapper(replica.wrote):
+                yield replica
+        finally:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.counts = {}
+
+    def __call__(self, alias):
+        def count(execute, sql, params, many, context):
+            self.counts[alias] = self.counts.get(alias, 0) + 1
+            return execute(sql, params, many, context)
+        return count
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a tenant read/write mix through the replica router against a primary and a snapshot "
+        "SQLite replica, and report the query split, stale own-reads and lag fallback."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenants', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=40, help="Browsing rounds per tenant")
+        parser.add_argument('--write-share', type=float, default=0.1,
+                            help="Share of rounds in which a tenant also sends a message and opens it")
+        parser.add_argument('--pin-seconds', type=int, default=1)
+        parser.add_argument('--replicate-every', type=int, default=25,
+                            help="Requests between replica syncs, i.e. how far the replica trails")
+
+    def seed(self):
+        rng = random.Random(7)
+        owner = User.objects.get(pk=seed_users(1, role='landlord')[0])
+        locations = Location.objects.bulk_create([
+            Location(address=f'{i}', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='0')
+            for i in range(50)
+        ])
+        properties = Property.objects.bulk_create([
+            Property(owner=owner, location=rng.choice(locations), property_name=f'Bench {i}',
+                     property_type='Apartment', rental_type='long-term', description='Bench', price_per_month=500)
+            for i in range(2000)
+        ])
+        tenant_ids = seed_users(self.options['tenants'])
+        Booking.objects.bulk_create([
+            Booking(user_id=user_id, property=rng.choice(properties), start_date='2026-01-01', end_date='2026-02-01',
+                    rental_type='long-term', monthly_rent=500)
+            for user_id in tenant_ids for _ in range(20)
+        ])
+        Notification.objects.bulk_create([
+            Notification(user_id=user_id, notification_type='Alert', message='Bench')
+            for user_id in tenant_ids for _ in range(50)
+        ])
+        clients = []
+        for tenant in User.objects.filter(pk__in=tenant_ids):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(tenant).access_token}')
+            clients.append((tenant, client))
+        return owner, clients
+
+    def workload(self, replica, owner, clients):
+        """Browse, sometimes send a message and open it: returns (latencies, stale own-reads, requests)."""
+        rng = random.Random(7)
+        latencies, stale, requests = [], 0, 0
+
+        def call(method, *args, **kwargs):
+            nonlocal requests
+            started = time.perf_counter()
+            response = method(*args, **kwargs)
+            latencies.append((time.perf_counter() - started) * 1000)
+            requests += 1
+            if requests % self.options['replicate_every'] == 0:
+                replica.sync()
+            return response
+
+        for round_number in range(self.options['rounds']):
+            for tenant, client in clients:
+                assert call(client.get, '/api/v1/bookings/').status_code == 200
+                assert call(client.get, '/api/v1/notifications/').status_code == 200
+                if rng.random() >= self.options['write_share']:
+                    continue
+                sent = call(client.post, '/api/v1/messages/', {
+                    'sender': tenant.pk, 'receiver': owner.pk, 'content': f'Round {round_number}',
+                }, format='json')
+                assert sent.status_code == 201, sent.content
+                if call(client.get, f"/api/v1/messages/{sent.data['id']}/").status_code == 404:
+                    stale += 1
+        return latencies, stale, requests
+
+    def handle(self, *args, **options):
+        self.options = options
+        # Stale reads are counted below; don't log each of their 404s.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with scratch_database() as primary:
+            if primary.vendor != 'sqlite':
+                raise CommandError("The snapshot replica needs SQLite; point DB_REPLICA_HOSTS at a real replica instead.")
+            owner, clients = self.seed()
+            phases = [
+                ('read-your-writes', {'REPLICA_PIN_SECONDS': options['pin_seconds']}, None),
+                ('no pinning', {'REPLICA_PIN_SECONDS': 0}, None),
+                ('replica lagging', {'REPLICA_PIN_SECONDS': options['pin_seconds']}, 60.0),
+            ]
+            self.stdout.write(
+                f"{'phase':>18} {'requests':>9} {'primary q':>10} {'replica q':>10} {'replica %':>10} "
+                f"{'stale reads':>12} {'p50 ms':>7} {'p95 ms':>7}"
+            )
+            for label, pinning, forced_lag in phases:
+                with ExitStack() as stack:
+                    replica = stack.enter_context(sqlite_replica(REPLICA))
+                    stack.enter_context(override_settings(
+                        DATABASE_REPLICAS=[REPLICA], REPLICA_MAX_LAG_SECONDS=2, REPLICA_LAG_CHECK_SECONDS=0.1,
+                        **pinning
+                    ))
+                    probe = (lambda alias: forced_lag) if forced_lag is not None else replica.lag
+                    stack.enter_context(mock.patch.object(db_router, 'lag_probe', probe))
+                    counter = QueryCounter()
+                    for alias in ('default', REPLICA):
+                        stack.enter_context(connections[alias].execute_wrapper(counter(alias)))
+                    db_router.reset_routing_stats()
+                    db_router.unpin()
+                    latencies, stale, requests = self.workload(replica, owner, clients)
+                on_primary, on_replica = counter.counts.get('default', 0), counter.counts.get(REPLICA, 0)
+                self.stdout.write(
+                    f"{label:>18} {requests:>9} {on_primary:>10} {on_replica:>10} "
+                    f"{100 * on_replica / max(1, on_primary + on_replica):>9.1f}% {stale:>12} "
+                    f"{percentile(latencies, 50):>7.2f} {percentile(latencies, 95):>7.2f}"
+                )
+                routed = ', '.join(
+                    f"{alias} {counts['read']} reads/{counts['write']} writes"
+                    for alias, counts in sorted(db_router.routing_stats().items())
+                )
+                self.stdout.write(f"{'':>18} routed: {routed}")
@@ -0,0 +1,72 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users import chatbot
+from users.intent_classifier import local_intent
+from ._bench import percentile
+from ._stubs import fake_dialogflow_server
+
+
+class Command(BaseCommand):
+    help = (
+        "Evaluate the local intent classifier on a labelled set: local-hit rate, accuracy of local "
+        "answers, and end-to-end intent latency versus always calling a (fake) Dialogflow."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--labelled', default=str(settings.BASE_DIR / 'users' / 'data' / 'intent_labelled.json'),
+                            help='JSON list of [message, expected_intent]; "" means "not ours to answer"')
+        parser.add_argument('--remote-latency-ms', type=float, default=120, help="Simulated Dialogflow latency")
+        parser.add_argument('--rounds', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with open(options['labelled'], encoding='utf-8') as labelled_file:
+            labelled = json.load(labelled_file)
+
+        answered = correct = 0
+        for text, expected in labelled:
+            prediction = local_intent(text)
+            if prediction is None:
+                continue
+            answered += 1
+            if prediction[1] == expected:
+                correct += 1
+            else:
+                self.stdout.write(f"  mislabelled locally: {text!r} -> {prediction[1]} (expected {expected or 'none'})")
+        self.stdout.write(f"local-hit rate:   {answered}/{len(labelled)} ({answered / len(labelled):.0%})")
+        self.stdout.write(f"local accuracy:   {correct}/{answered} ({correct / max(answered, 1):.0%})")
+
+        local_latencies = []
+        for _ in range(options['rounds']):
+            for text, _expected in labelled:
+                started = time.perf_counter()
+                local_intent(text)
+                local_latencies.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f"classifier:       p50={percentile(local_latencies, 50):.3f}ms p95={percentile(local_latencies, 95):.3f}ms"
+        )
+
+        with fake_dialogflow_server(latency=options['remote_latency_ms'] / 1000) as host, \
+                override_settings(DIALOGFLOW_EMULATOR_HOST=host):
+            chatbot.reset_clients()
+            chatbot.detect_intent('warm up', 'eval')
+            results = {}
+            for label, use_local in [('always remote', False), ('local fast path', True)]:
+                latencies = []
+                for text, _expected in labelled:
+                    started = time.perf_counter()
+                    if not (use_local and local_intent(text)):
+                        chatbot.detect_intent(text, 'eval')
+                    latencies.append((time.perf_counter() - started) * 1000)
+                results[label] = sum(latencies) / len(latencies)
+                self.stdout.write(
+                    f"{label + ':':<18}mean={results[label]:.1f}ms p50={percentile(latencies, 50):.1f}ms "
+                    f"p95={percentile(latencies, 95):.1f}ms"
+                )
+            chatbot.reset_clients()
+        saved = results['always remote'] - results['local fast path']
+        self.stdout.write(f"latency saved:    {saved:.1f}ms per message ({saved / results['always remote']:.0%})")
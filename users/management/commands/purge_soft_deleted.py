@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from users.soft_delete import cascade_orphans, purge_soft_deleted
+
+
+class Command(BaseCommand):
+    help = (
+        "Soft-delete live rows left under deleted parents, then hard-delete rows soft-deleted more than "
+        "SOFT_DELETE_RETENTION_DAYS ago in bounded batches. Payments, archived history and the rows they hang "
+        "off are kept. Safe to run repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--retention-days', type=int, help="Overrides SOFT_DELETE_RETENTION_DAYS")
+        parser.add_argument('--skip-orphans', action='store_true', help="Only purge")
+
+    def handle(self, *args, **options):
+        if not options['skip_orphans']:
+            total, flagged = cascade_orphans()
+            self.stdout.write(f"Soft-deleted {total} orphaned rows" + self.describe(flagged))
+        purged = purge_soft_deleted(options['retention_days'], options['batch_size'])
+        self.stdout.write(f"Purged {sum(purged.values())} rows" + self.describe(purged))
+
+    @staticmethod
+    def describe(counts):
+        return f" ({', '.join(f'{label} {count}' for label, count in sorted(counts.items()))})" if counts else ''
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from users.amenities import rebuild_amenity_masks
+from users.catalogue import rebuild_catalogue
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute amenity masks and the public catalogue read model from the source tables, "
+        "e.g. after bulk imports that bypass model signals. Safe to run repeatedly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        changed = rebuild_amenity_masks(batch_size=options['batch_size'])
+        self.stdout.write(f"Fixed {changed} amenity masks")
+        entries = rebuild_catalogue(options['batch_size'])
+        self.stdout.write(f"Refreshed {entries} catalogue entries")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from users.aggregates import reconcile_aggregates
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the review, favourite and booking aggregates on Property from their rows and fix any "
+        "that drifted. Safe to run repeatedly, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_aggregates(options['batch_size'])
+        self.stdout.write(f"Reconciled aggregates; {fixed} properties had drifted")
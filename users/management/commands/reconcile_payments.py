@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from users.payments import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = (
+        "Look up every pending payment's PaymentIntent with the processor and settle the ones that succeeded "
+        "or failed. Safe to run repeatedly, e.g. every few minutes from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Overrides PAYMENT_RECONCILE_BATCH_SIZE")
+
+    def handle(self, *args, **options):
+        counts = reconcile_payments(options['batch_size'])
+        self.stdout.write(
+            f"Completed {counts.get('Completed', 0)}, failed {counts.get('Failed', 0)}, "
+            f"still pending {counts.get('pending', 0)}, lookup errors {counts.get('errors', 0)}"
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from users.models import PaymentEvent
+from users.webhooks import replay
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply stored payment webhook events again: the given event ids, every event in the given statuses "
+        "(e.g. --status Unmatched Failed) and any still pending, in order per payment. Safe to run from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help="Provider event ids, e.g. evt_...")
+        parser.add_argument(
+            '--status', nargs='+', default=[], choices=[status for status, _ in PaymentEvent.STATUS_CHOICES],
+            help="Replay every event in these statuses"
+        )
+
+    def handle(self, *args, **options):
+        counts = replay(options['event_ids'], options['status'])
+        summary = ', '.join(f'{status} {count}' for status, count in sorted(counts.items()))
+        self.stdout.write(f"Replayed {sum(counts.values())} events" + (f" ({summary})" if summary else ''))
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:06
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_legacy_tokens(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    DeviceToken = apps.get_model("users", "DeviceToken")
+    users = User.objects.exclude(fcm_token__isnull=True).exclude(fcm_token="")
+    DeviceToken.objects.bulk_create(
+        [
+            DeviceToken(user_id=user_id, token=token)
+            for user_id, token in users.values_list("id", "fcm_token")
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_user_fcm_token"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeviceToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "token",
+                    models.CharField(
+                        help_text="FCM registration token of one device",
+                        max_length=255,
+                        unique=True,
+                    ),
+                ),
+                (
+                    "platform",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("android", "Android"),
+                            ("ios", "iOS"),
+                            ("web", "Web"),
+                        ],
+                        max_length=10,
+                        null=True,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("last_seen", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="device_tokens",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(copy_legacy_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0007_notification_digest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MessageArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("content", models.TextField()),
+                ("sent_at", models.DateTimeField()),
+                (
+                    "read_status",
+                    models.CharField(
+                        choices=[("Unread", "Unread"), ("Read", "Read")],
+                        default="Unread",
+                        max_length=20,
+                    ),
+                ),
+                ("is_deleted", models.BooleanField(default=False)),
+                ("deleted_at", models.DateTimeField(blank=True, null=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "receiver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_received_messages",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "sender",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_sent_messages",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["receiver", "sent_at"],
+                        name="idx_msg_archive_receiver_sent",
+                    ),
+                    models.Index(
+                        fields=["sender", "sent_at"], name="idx_msg_archive_sender_sent"
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="NotificationArchive",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                (
+                    "notification_type",
+                    models.CharField(
+                        choices=[
+                            ("Alert", "Alert"),
+                            ("Reminder", "Reminder"),
+                            ("Message", "Message"),
+                            ("Support", "Support"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("message", models.TextField()),
+                ("count", models.PositiveIntegerField(default=1)),
+                ("sent_at", models.DateTimeField()),
+                (
+                    "read_status",
+                    models.CharField(
+                        choices=[("Unread", "Unread"), ("Read", "Read")],
+                        default="Unread",
+                        max_length=20,
+                    ),
+                ),
+                ("is_deleted", models.BooleanField(default=False)),
+                ("deleted_at", models.DateTimeField(blank=True, null=True)),
+                ("archived_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_notifications",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["user", "sent_at"], name="idx_notif_archive_user_sent"
+                    )
+                ],
+            },
+        ),
+    ]
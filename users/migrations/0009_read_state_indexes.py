@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0008_history_archive"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["receiver", "read_status"], name="idx_message_receiver_read"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["user", "read_status"], name="idx_notification_user_read"
+            ),
+        ),
+    ]
@@ -0,0 +1,138 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:25
+
+from datetime import timedelta
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+# Chatbot exchanges were stored as Message rows with sender == receiver and
+# content "User: ...\nBot: ...". Turns further apart than this start a new session.
+SESSION_IDLE = timedelta(minutes=30)
+BATCH_SIZE = 2000
+
+
+def split_transcript(content):
+    message, _, response = content.partition("\nBot: ")
+    return message.removeprefix("User: "), response
+
+
+def move_chatbot_messages(apps, schema_editor):
+    ChatSession = apps.get_model("users", "ChatSession")
+    ChatTurn = apps.get_model("users", "ChatTurn")
+    for model_name in ("Message", "MessageArchive"):
+        model = apps.get_model("users", model_name)
+        self_messages = model.objects.filter(sender_id=models.F("receiver_id"))
+        sessions, turns = [], []
+
+        def write():
+            ChatSession.objects.bulk_create(sessions)
+            ChatTurn.objects.bulk_create(turns)
+            sessions.clear()
+            turns.clear()
+
+        session = None
+        rows = self_messages.order_by("sender_id", "sent_at", "id").values_list(
+            "sender_id", "content", "sent_at"
+        )
+        for user_id, content, sent_at in rows.iterator(chunk_size=BATCH_SIZE):
+            if (
+                session is None
+                or session.user_id != user_id
+                or sent_at - session.last_activity > SESSION_IDLE
+            ):
+                if len(turns) >= BATCH_SIZE:
+                    write()
+                session = ChatSession(
+                    user_id=user_id, started_at=sent_at, last_activity=sent_at
+                )
+                sessions.append(session)
+            session.last_activity = sent_at
+            message, response = split_transcript(content)
+            turns.append(
+                ChatTurn(
+                    session=session,
+                    message=message,
+                    response=response,
+                    created_at=sent_at,
+                )
+            )
+        write()
+        self_messages.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0009_read_state_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatSession",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("started_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "last_activity",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chat_sessions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ChatTurn",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("message", models.TextField()),
+                ("response", models.TextField()),
+                ("intent_name", models.CharField(blank=True, max_length=100)),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="turns",
+                        to="users.chatsession",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="chatsession",
+            index=models.Index(
+                fields=["user", "-last_activity"], name="idx_chatsession_user_activity"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chatturn",
+            index=models.Index(
+                fields=["session", "created_at"], name="idx_chatturn_session_created"
+            ),
+        ),
+        migrations.RunPython(move_chatbot_messages, migrations.RunPython.noop),
+    ]
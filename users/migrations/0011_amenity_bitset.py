@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:47
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def assign_bits(apps, schema_editor):
+    Amenity = apps.get_model("users", "Amenity")
+    Property = apps.get_model("users", "Property")
+    PropertyAmenity = apps.get_model("users", "PropertyAmenity")
+    amenities = list(Amenity.objects.order_by("id"))
+    if len(amenities) > 63:
+        raise RuntimeError(
+            f"{len(amenities)} amenities do not fit in a 63-bit amenity_mask."
+        )
+    for bit, amenity in enumerate(amenities):
+        amenity.bit = bit
+    Amenity.objects.bulk_update(amenities, ["bit"])
+
+    masks = defaultdict(int)
+    links = PropertyAmenity.objects.values_list("property_id", "amenity__bit")
+    for property_id, bit in links.iterator(chunk_size=BATCH_SIZE):
+        masks[property_id] |= 1 << bit
+    Property.objects.bulk_update(
+        [Property(pk=pk, amenity_mask=mask) for pk, mask in masks.items()],
+        ["amenity_mask"],
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0010_chat_transcripts"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="amenity",
+            name="bit",
+            field=models.PositiveSmallIntegerField(
+                editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="amenity_mask",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(assign_bits, migrations.RunPython.noop),
+    ]
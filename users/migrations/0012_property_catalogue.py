@@ -0,0 +1,202 @@
+# Generated by Django 5.1.6 on 2026-10-19 10:57
+
+import django.db.models.deletion
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def fill_catalogue(apps, schema_editor):
+    Property = apps.get_model("users", "Property")
+    PropertyMedia = apps.get_model("users", "PropertyMedia")
+    CatalogueEntry = apps.get_model("users", "CatalogueEntry")
+    live_reviews = models.Q(reviews__is_deleted=False)
+    thumbnails = (
+        PropertyMedia.objects.filter(property=models.OuterRef("pk"), media_type="image")
+        .exclude(file="")
+        .order_by("uploaded_at", "pk")
+        .values("file")[:1]
+    )
+    properties = (
+        Property.objects.filter(is_deleted=False)
+        .select_related("location")
+        .annotate(
+            average_rating=models.Avg("reviews__rating", filter=live_reviews),
+            live_review_count=models.Count("reviews", filter=live_reviews),
+            thumbnail_file=models.Subquery(thumbnails),
+        )
+        .order_by("pk")
+    )
+    entries = []
+    for prop in properties.iterator(chunk_size=BATCH_SIZE):
+        location = prop.location
+        entries.append(
+            CatalogueEntry(
+                property_id=prop.pk,
+                property_name=prop.property_name,
+                property_type=prop.property_type,
+                rental_type=prop.rental_type,
+                availability_status=prop.availability_status,
+                is_multi_room=prop.is_multi_room,
+                number_of_bedrooms=prop.number_of_bedrooms,
+                number_of_bathrooms=prop.number_of_bathrooms,
+                price_per_month=prop.price_per_month,
+                price_per_night=prop.price_per_night,
+                city=location.city if location else "",
+                region=location.region if location else "",
+                latitude=location.latitude if location else None,
+                longitude=location.longitude if location else None,
+                thumbnail=(
+                    default_storage.url(prop.thumbnail_file)
+                    if prop.thumbnail_file
+                    else ""
+                ),
+                rating=(
+                    round(prop.average_rating, 2)
+                    if prop.average_rating is not None
+                    else None
+                ),
+                review_count=prop.live_review_count,
+                amenity_mask=prop.amenity_mask,
+                created_at=prop.created_at,
+            )
+        )
+        if len(entries) >= BATCH_SIZE:
+            CatalogueEntry.objects.bulk_create(entries)
+            entries.clear()
+    CatalogueEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0011_amenity_bitset"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CatalogueEntry",
+            fields=[
+                (
+                    "property",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="catalogue_entry",
+                        serialize=False,
+                        to="users.property",
+                    ),
+                ),
+                ("property_name", models.CharField(max_length=100)),
+                (
+                    "property_type",
+                    models.CharField(
+                        choices=[
+                            ("Apartment", "Apartment"),
+                            ("House", "House"),
+                            ("Studio", "Studio"),
+                            ("Villa", "Villa"),
+                            ("Hotel", "Hotel"),
+                            ("Airbnb", "Airbnb"),
+                            ("Other", "Other"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                (
+                    "rental_type",
+                    models.CharField(
+                        choices=[
+                            ("long-term", "Long-Term"),
+                            ("short-term", "Short-Term"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "availability_status",
+                    models.CharField(
+                        choices=[
+                            ("Available", "Available"),
+                            ("Rented", "Rented"),
+                            ("Booked", "Booked"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("is_multi_room", models.BooleanField(default=False)),
+                ("number_of_bedrooms", models.IntegerField(blank=True, null=True)),
+                ("number_of_bathrooms", models.IntegerField(blank=True, null=True)),
+                (
+                    "price_per_month",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "price_per_night",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=10, null=True
+                    ),
+                ),
+                ("city", models.CharField(blank=True, max_length=100)),
+                ("region", models.CharField(blank=True, max_length=100)),
+                (
+                    "latitude",
+                    models.DecimalField(
+                        blank=True, decimal_places=8, max_digits=10, null=True
+                    ),
+                ),
+                (
+                    "longitude",
+                    models.DecimalField(
+                        blank=True, decimal_places=8, max_digits=11, null=True
+                    ),
+                ),
+                (
+                    "thumbnail",
+                    models.CharField(
+                        blank=True,
+                        help_text="URL of the first uploaded image",
+                        max_length=255,
+                    ),
+                ),
+                (
+                    "rating",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=3, null=True
+                    ),
+                ),
+                ("review_count", models.PositiveIntegerField(default=0)),
+                ("amenity_mask", models.BigIntegerField(default=0)),
+                ("created_at", models.DateTimeField()),
+                ("refreshed_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["availability_status", "-created_at"],
+                        name="idx_catalogue_status_newest",
+                    ),
+                    models.Index(
+                        fields=["availability_status", "city"],
+                        name="idx_catalogue_status_city",
+                    ),
+                    models.Index(
+                        fields=["availability_status", "price_per_month"],
+                        name="idx_catalogue_status_month",
+                    ),
+                    models.Index(
+                        fields=["availability_status", "price_per_night"],
+                        name="idx_catalogue_status_night",
+                    ),
+                    models.Index(
+                        fields=["latitude", "longitude"],
+                        name="idx_catalogue_coordinates",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(fill_catalogue, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0012_property_catalogue"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-start_date"],
+                name="idx_booking_live_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="booking",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["property", "status", "start_date"],
+                name="idx_booking_live_prop_status",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookinginquiry",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-inquiry_date"],
+                name="idx_inquiry_live_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="bookinginquiry",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["property", "status"],
+                name="idx_inquiry_live_property",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="maintenancerequest",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-created_at"],
+                name="idx_maint_live_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="maintenancerequest",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["property", "status"],
+                name="idx_maint_live_property",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["receiver", "-sent_at"],
+                name="idx_message_live_receiver",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["sender", "-sent_at"],
+                name="idx_message_live_sender",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-sent_at"],
+                name="idx_notification_live_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "read_status", "-sent_at"],
+                name="idx_notif_live_user_read",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["booking", "-payment_date"],
+                name="idx_payment_live_booking",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["owner", "-created_at"],
+                name="idx_property_live_owner",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-created_at"],
+                name="idx_review_live_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="review",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["property", "-created_at"],
+                name="idx_review_live_property",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="supportticket",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["user", "-created_at"],
+                name="idx_ticket_live_user",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["role"],
+                name="idx_user_live_role",
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="user",
+            name="idx_role",
+        ),
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="idx_notification_user_read",
+        ),
+    ]
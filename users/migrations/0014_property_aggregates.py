@@ -0,0 +1,74 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:23
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, FloatField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_aggregates(apps, schema_editor):
+    Property = apps.get_model("users", "Property")
+    Review = apps.get_model("users", "Review")
+    Favorite = apps.get_model("users", "Favorite")
+    Booking = apps.get_model("users", "Booking")
+
+    def per_property(rows, aggregate):
+        rows = rows.filter(property=OuterRef("pk")).order_by().values("property")
+        return Subquery(rows.annotate(value=aggregate).values("value"))
+
+    reviews = Review.objects.filter(is_deleted=False)
+    Property.objects.update(
+        review_count=Coalesce(per_property(reviews, Count("pk")), Value(0)),
+        rating_total=Coalesce(per_property(reviews, Sum("rating")), Value(0)),
+        average_rating=per_property(reviews, Avg("rating", output_field=FloatField())),
+        favorite_count=Coalesce(
+            per_property(Favorite.objects.all(), Count("pk")), Value(0)
+        ),
+        booking_count=Coalesce(
+            per_property(Booking.objects.filter(is_deleted=False), Count("pk")),
+            Value(0),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0013_live_row_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="property",
+            name="average_rating",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="booking_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="favorite_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="rating_total",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="property",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="property",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["-average_rating", "-review_count"],
+                name="idx_property_live_rating",
+            ),
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
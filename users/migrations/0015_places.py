@@ -0,0 +1,102 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0014_property_aggregates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="City",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("slug", models.SlugField(allow_unicode=True, max_length=100)),
+            ],
+            options={
+                "verbose_name_plural": "cities",
+            },
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="canonical_city",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="locations",
+                to="users.city",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Region",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("slug", models.SlugField(allow_unicode=True, max_length=100)),
+                ("country", models.CharField(max_length=100)),
+                (
+                    "country_slug",
+                    models.SlugField(
+                        allow_unicode=True, db_index=False, max_length=100
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("country_slug", "slug"), name="uniq_region_country_slug"
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="city",
+            name="region",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="cities",
+                to="users.region",
+            ),
+        ),
+        migrations.AddField(
+            model_name="location",
+            name="canonical_region",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="locations",
+                to="users.region",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="city",
+            constraint=models.UniqueConstraint(
+                fields=("region", "slug"), name="uniq_city_region_slug"
+            ),
+        ),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:40
+
+from collections import Counter
+
+from django.db import migrations, transaction
+from django.db.models import Count
+from django.utils.text import slugify
+
+BATCH_SIZE = 2000
+
+
+def key(name):
+    return slugify(name, allow_unicode=True)
+
+
+def spelling(name):
+    return " ".join(name.split())
+
+
+def canonical(spellings):
+    """The most common spelling; on a tie, one in mixed case over ALL CAPS or all lower."""
+    return max(
+        spellings,
+        key=lambda name: (
+            spellings[name],
+            name != name.upper(),
+            name != name.lower(),
+        ),
+    )
+
+
+def backfill_places(apps, schema_editor):
+    Location = apps.get_model("users", "Location")
+    Region = apps.get_model("users", "Region")
+    City = apps.get_model("users", "City")
+
+    regions, cities = {}, {}
+    spellings = list(
+        Location.objects.values_list("country", "region", "city")
+        .annotate(rows=Count("pk"))
+        .order_by()
+    )
+    for country, region, city, count in spellings:
+        region_key = (key(country), key(region))
+        region_names, country_names = regions.setdefault(
+            region_key, (Counter(), Counter())
+        )
+        region_names[spelling(region)] += count
+        country_names[spelling(country)] += count
+        cities.setdefault((region_key, key(city)), Counter())[spelling(city)] += count
+    with transaction.atomic():
+        Region.objects.bulk_create(
+            [
+                Region(
+                    country_slug=country_slug,
+                    slug=slug,
+                    name=canonical(region_names),
+                    country=canonical(country_names),
+                )
+                for (country_slug, slug), (
+                    region_names,
+                    country_names,
+                ) in regions.items()
+            ],
+            ignore_conflicts=True,
+        )
+        region_ids = {
+            (region.country_slug, region.slug): region.pk
+            for region in Region.objects.all()
+        }
+        City.objects.bulk_create(
+            [
+                City(
+                    region_id=region_ids[region_key],
+                    slug=slug,
+                    name=canonical(names),
+                )
+                for (region_key, slug), names in cities.items()
+            ],
+            ignore_conflicts=True,
+        )
+    region_by_id = {region.pk: region for region in Region.objects.all()}
+    city_by_key = {(city.region_id, city.slug): city for city in City.objects.all()}
+
+    # One UPDATE per spelling, in short batches so a large table is never locked as a whole.
+    for country, region, city, _ in spellings:
+        region_id = region_ids[(key(country), key(region))]
+        canonical_city = city_by_key[(region_id, key(city))]
+        rows = Location.objects.filter(
+            canonical_city__isnull=True, country=country, region=region, city=city
+        )
+        while pks := list(rows.values_list("pk", flat=True)[:BATCH_SIZE]):
+            with transaction.atomic():
+                Location.objects.filter(pk__in=pks).update(
+                    canonical_city=canonical_city,
+                    canonical_region_id=region_id,
+                    city=canonical_city.name,
+                    region=region_by_id[region_id].name,
+                    country=region_by_id[region_id].country,
+                )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("users", "0015_places"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_places, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0016_backfill_places"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payment",
+            name="idempotency_key",
+            field=models.CharField(
+                blank=True, editable=False, max_length=300, null=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                condition=models.Q(
+                    ("is_deleted", False), ("payment_status", "Pending")
+                ),
+                fields=["id"],
+                name="idx_payment_live_pending",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="payment",
+            constraint=models.UniqueConstraint(
+                fields=("idempotency_key",), name="uniq_payment_idempotency_key"
+            ),
+        ),
+    ]
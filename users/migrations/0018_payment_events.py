@@ -0,0 +1,72 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0017_payment_idempotency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PaymentEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("event_id", models.CharField(max_length=255, unique=True)),
+                ("event_type", models.CharField(max_length=100)),
+                (
+                    "payment_intent_id",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("created", models.DateTimeField()),
+                ("payload", models.TextField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("Pending", "Pending"),
+                            ("Applied", "Applied"),
+                            ("Ignored", "Ignored"),
+                            ("Unmatched", "Unmatched"),
+                            ("Failed", "Failed"),
+                        ],
+                        default="Pending",
+                        max_length=20,
+                    ),
+                ),
+                ("error", models.TextField(blank=True, default="")),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["stripe_payment_intent_id"], name="idx_payment_intent"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentevent",
+            index=models.Index(
+                condition=models.Q(("status", "Pending")),
+                fields=["payment_intent_id", "created", "id"],
+                name="idx_paymentevent_pending",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="paymentevent",
+            index=models.Index(
+                fields=["payment_intent_id", "-created"], name="idx_paymentevent_intent"
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:29
+
+from django.db import migrations, models, transaction
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 2000
+
+
+def refresh_places(apps, schema_editor):
+    """
+    Copy each entry's place from its location: the new keys, and the names
+    that 0016 rewrote to their canonical spelling with update(), which
+    refreshed no entry.
+    """
+    CatalogueEntry = apps.get_model("users", "CatalogueEntry")
+    Property = apps.get_model("users", "Property")
+
+    def location(field):
+        return Subquery(
+            Property.objects.filter(pk=OuterRef("property_id")).values(
+                f"location__{field}"
+            )[:1]
+        )
+
+    pks = list(CatalogueEntry.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(pks), BATCH_SIZE):
+        with transaction.atomic():
+            CatalogueEntry.objects.filter(
+                pk__in=pks[start : start + BATCH_SIZE]
+            ).update(
+                city=Coalesce(location("city"), Value("")),
+                region=Coalesce(location("region"), Value("")),
+                city_id=location("canonical_city_id"),
+                region_id=location("canonical_region_id"),
+            )
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("users", "0018_payment_events"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="catalogueentry",
+            name="idx_catalogue_status_city",
+        ),
+        migrations.AddField(
+            model_name="catalogueentry",
+            name="city_id",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="catalogueentry",
+            name="region_id",
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="catalogueentry",
+            index=models.Index(
+                fields=["availability_status", "city_id"],
+                name="idx_catalogue_status_city_id",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="catalogueentry",
+            index=models.Index(
+                fields=["availability_status", "region_id"],
+                name="idx_catalogue_status_region_id",
+            ),
+        ),
+        migrations.RunPython(refresh_places, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,10 @@
 # users/models.py
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser, Group, Permission, UserManager
 from django.core.validators import RegexValidator, MinValueValidator, MaxValueValidator, FileExtensionValidator
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.utils.text import slugify
 
 class ActiveUserManager(UserManager):
     def get_queryset(self):
@@ -13,6 +14,10 @@ class ActiveManager(models.Manager):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
 
+# Condition of the partial indexes below: the filter both active managers add to
+# every query, so the indexes skip soft-deleted rows and stay small.
+LIVE_ROWS = models.Q(is_deleted=False)
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('tenant', 'Tenant'),
@@ -51,9 +56,8 @@ class User(AbstractUser):
     )
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
@@ -66,9 +70,84 @@ class User(AbstractUser):
         app_label = 'users'
         indexes = [
             models.Index(fields=['phone_number'], name='idx_phone_number'),
-            models.Index(fields=['role'], name='idx_role'),
+            models.Index(fields=['role'], condition=LIVE_ROWS, name='idx_user_live_role'),
+        ]
+
+class DeviceToken(models.Model):
+    PLATFORM_CHOICES = [
+        ('android', 'Android'),
+        ('ios', 'iOS'),
+        ('web', 'Web'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='device_tokens')
+    token = models.CharField(max_length=255, unique=True, help_text="FCM registration token of one device")
+    platform = models.CharField(max_length=10, choices=PLATFORM_CHOICES, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_seen = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def register(cls, user, token, platform=None):
+        # A token belongs to one device; re-registering it moves it to the current user.
+        device, _ = cls.objects.update_or_create(
+            token=token,
+            defaults={'user': user, 'platform': platform, 'last_seen': timezone.now()}
+        )
+        return device
+
+    def __str__(self):
+        return f"{self.platform or 'device'} token for {self.user.username}"
+
+def place_key(name):
+    """Spelling-insensitive key of a place name: "Dar es  Salaam" and "dar-es-salaam" share one."""
+    return slugify(name, allow_unicode=True)
+
+def place_name(name):
+    return ' '.join(name.split())
+
+# City and region dimension tables. Each place is stored once under its
+# canonical spelling (the first one seen, or the most common one when
+# migration 0016 backfilled them); locations point at it with integer keys,
+# so city and region filters are index lookups instead of text comparisons.
+class Region(models.Model):
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, allow_unicode=True)
+    country = models.CharField(max_length=100)
+    country_slug = models.SlugField(max_length=100, allow_unicode=True, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['country_slug', 'slug'], name='uniq_region_country_slug'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}, {self.country}"
+
+class City(models.Model):
+    region = models.ForeignKey(Region, on_delete=models.PROTECT, related_name='cities')
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, allow_unicode=True)
+
+    class Meta:
+        verbose_name_plural = 'cities'
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'slug'], name='uniq_city_region_slug'),
         ]
 
+    def __str__(self):
+        return f"{self.name}, {self.region.name}"
+
+    @classmethod
+    def resolve(cls, city, region, country):
+        """The City (with its Region) for these names in any spelling, created on first sight."""
+        region, _ = Region.objects.get_or_create(
+            country_slug=place_key(country), slug=place_key(region),
+            defaults={'name': place_name(region), 'country': place_name(country)},
+        )
+        city, _ = cls.objects.get_or_create(
+            region=region, slug=place_key(city), defaults={'name': place_name(city)}
+        )
+        return city
+
 class Location(models.Model):
     address = models.TextField()
     city = models.CharField(max_length=100)
@@ -77,10 +156,29 @@ class Location(models.Model):
     latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
     longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
     postal_code = models.CharField(max_length=20)
+    canonical_city = models.ForeignKey(
+        City, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='locations'
+    )
+    canonical_region = models.ForeignKey(
+        Region, on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='locations'
+    )
+
+    PLACE_FIELDS = ('city', 'region', 'country')
 
     def __str__(self):
         return f"{self.address}, {self.city}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.PLACE_FIELDS):
+            # Store the canonical spellings alongside the keys filters use.
+            city = City.resolve(self.city, self.region, self.country)
+            self.canonical_city, self.canonical_region = city, city.region
+            self.city, self.region, self.country = city.name, city.region.name, city.region.country
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.PLACE_FIELDS, 'canonical_city', 'canonical_region'}
+        super().save(*args, **kwargs)
+
 class Property(models.Model):
     PROPERTY_TYPE_CHOICES = [
         ('Apartment', 'Apartment'),
@@ -116,10 +214,32 @@ class Property(models.Model):
     price_per_night = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     availability_status = models.CharField(max_length=20, choices=AVAILABILITY_CHOICES, default='Available')
     amenities = models.ManyToManyField('Amenity', through='PropertyAmenity', related_name='properties')
+    # Bit ``Amenity.bit`` is set for each amenity the property has; kept in sync by users/amenities.py
+    amenity_mask = models.BigIntegerField(default=0, editable=False)
+    # Live review, favourite and booking aggregates; kept in sync by users/aggregates.py
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_total = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(null=True, blank=True, editable=False)
+    favorite_count = models.PositiveIntegerField(default=0, editable=False)
+    booking_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    # Columns only ever changed by UPDATE statements; save() on a loaded instance
+    # must not write back the copies it read, which may be stale by then.
+    MAINTAINED_FIELDS = (
+        'amenity_mask', 'review_count', 'rating_total', 'average_rating', 'favorite_count', 'booking_count',
+    )
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.MAINTAINED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def clean(self):
         if self.rental_type == 'short-term' and not self.price_per_night:
             raise ValidationError("Price per night is required for short-term rentals.")
@@ -127,9 +247,8 @@ class Property(models.Model):
             raise ValidationError("Price per month is required for long-term rentals.")
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
@@ -143,6 +262,8 @@ class Property(models.Model):
             models.Index(fields=['owner'], name='idx_property_owner'),
             models.Index(fields=['location'], name='idx_property_location'),
             models.Index(fields=['property_name'], name='idx_property_name'),
+            models.Index(fields=['owner', '-created_at'], condition=LIVE_ROWS, name='idx_property_live_owner'),
+            models.Index(fields=['-average_rating', '-review_count'], condition=LIVE_ROWS, name='idx_property_live_rating'),
         ]
 
 class Room(models.Model):
@@ -229,12 +350,21 @@ class Booking(models.Model):
             end_date__gte=timezone.now()
         ).exists()
         property.availability_status = 'Booked' if active_bookings else 'Available'
-        property.save()
+        property.save(update_fields=['availability_status'])
+
+    @classmethod
+    def release_properties(cls, property_ids):
+        """Mark the 'Booked' properties among ``property_ids`` that no live booking holds any more 'Available'."""
+        held = cls.objects.filter(
+            property_id__in=property_ids, status__in=['Pending', 'Confirmed'], end_date__gte=timezone.now()
+        ).values('property_id')
+        return Property.objects.filter(
+            pk__in=property_ids, availability_status='Booked'
+        ).exclude(pk__in=held).update(availability_status='Available')
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
@@ -243,6 +373,10 @@ class Booking(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['start_date', 'end_date'], name='idx_booking_dates'),
+            models.Index(fields=['user', '-start_date'], condition=LIVE_ROWS, name='idx_booking_live_user'),
+            models.Index(
+                fields=['property', 'status', 'start_date'], condition=LIVE_ROWS, name='idx_booking_live_prop_status'
+            ),
         ]
 
 class Payment(models.Model):
@@ -265,6 +399,8 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=50, choices=PAYMENT_METHOD_CHOICES)
     payment_status = models.CharField(max_length=20, choices=PAYMENT_STATUS_CHOICES, default='Pending')
     stripe_payment_intent_id = models.CharField(max_length=255, null=True, blank=True)
+    # "<user id>:<Idempotency-Key header>" of the request that created the payment.
+    idempotency_key = models.CharField(max_length=300, null=True, blank=True, editable=False)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
@@ -272,14 +408,58 @@ class Payment(models.Model):
         return f"Payment of {self.amount} for {self.booking}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
         return cls.objects.all()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['booking', '-payment_date'], condition=LIVE_ROWS, name='idx_payment_live_booking'),
+            # What reconcile_payments pages through.
+            models.Index(fields=['id'], condition=LIVE_ROWS & models.Q(payment_status='Pending'), name='idx_payment_live_pending'),
+            # How webhook events find their payment.
+            models.Index(fields=['stripe_payment_intent_id'], name='idx_payment_intent'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['idempotency_key'], name='uniq_payment_idempotency_key'),
+        ]
+
+# A payment webhook as the provider delivered it (users/webhooks.py). Rows are
+# written by the webhook endpoint and applied to their payment in ``created`` order.
+class PaymentEvent(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Applied', 'Applied'),
+        ('Ignored', 'Ignored'),
+        ('Unmatched', 'Unmatched'),
+        ('Failed', 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payment_intent_id = models.CharField(max_length=255, blank=True, default='')
+    created = models.DateTimeField()  # When the provider created the event
+    payload = models.TextField()  # The request body, byte for byte
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['payment_intent_id', 'created', 'id'], condition=models.Q(status='Pending'),
+                name='idx_paymentevent_pending'
+            ),
+            models.Index(fields=['payment_intent_id', '-created'], name='idx_paymentevent_intent'),
+        ]
+
 class Review(models.Model):
     objects = ActiveManager()
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reviews')
@@ -294,14 +474,19 @@ class Review(models.Model):
         return f"Review of {self.property.property_name} by {self.user.username}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
         return cls.objects.all()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], condition=LIVE_ROWS, name='idx_review_live_user'),
+            models.Index(fields=['property', '-created_at'], condition=LIVE_ROWS, name='idx_review_live_property'),
+        ]
+
 class Message(models.Model):
     objects = ActiveManager()
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
@@ -316,14 +501,71 @@ class Message(models.Model):
         return f"Message from {self.sender.username} to {self.receiver.username}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
         return cls.objects.all()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['receiver', 'read_status'], name='idx_message_receiver_read'),
+            models.Index(fields=['receiver', '-sent_at'], condition=LIVE_ROWS, name='idx_message_live_receiver'),
+            models.Index(fields=['sender', '-sent_at'], condition=LIVE_ROWS, name='idx_message_live_sender'),
+        ]
+
+# Messages moved out of the hot table by the archive_history job.
+class MessageArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_sent_messages')
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_received_messages')
+    content = models.TextField()
+    sent_at = models.DateTimeField()
+    read_status = models.CharField(max_length=20, choices=[('Unread', 'Unread'), ('Read', 'Read')], default='Unread')
+    is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived message from {self.sender.username} to {self.receiver.username}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['receiver', 'sent_at'], name='idx_msg_archive_receiver_sent'),
+            models.Index(fields=['sender', 'sent_at'], name='idx_msg_archive_sender_sent'),
+        ]
+
+# Chatbot conversations, kept out of the user-to-user Message inbox. Turns are
+# written in batches by users/transcripts.py, so timestamps are set by the writer.
+class ChatSession(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chat_sessions')
+    started_at = models.DateTimeField(default=timezone.now)
+    last_activity = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Chat session {self.id} for {self.user.username}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-last_activity'], name='idx_chatsession_user_activity'),
+        ]
+
+class ChatTurn(models.Model):
+    session = models.ForeignKey(ChatSession, on_delete=models.CASCADE, related_name='turns')
+    message = models.TextField()
+    response = models.TextField()
+    intent_name = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Chat turn {self.id} in session {self.session_id}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'created_at'], name='idx_chatturn_session_created'),
+        ]
+
 class PropertyMedia(models.Model):
     MEDIA_TYPE_CHOICES = [
         ('image', 'Image'),
@@ -348,6 +590,7 @@ class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
     notification_type = models.CharField(max_length=50, choices=NOTIFICATION_TYPE_CHOICES)
     message = models.TextField()
+    count = models.PositiveIntegerField(default=1, help_text="Number of events coalesced into this notification")
     sent_at = models.DateTimeField(auto_now_add=True)
     read_status = models.CharField(max_length=20, choices=[('Unread', 'Unread'), ('Read', 'Read')], default='Unread')
     is_deleted = models.BooleanField(default=False)
@@ -357,14 +600,48 @@ class Notification(models.Model):
         return f"{self.notification_type} for {self.user.username}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
         return cls.objects.all()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-sent_at'], condition=LIVE_ROWS, name='idx_notification_live_user'),
+            models.Index(fields=['user', 'read_status', '-sent_at'], condition=LIVE_ROWS, name='idx_notif_live_user_read'),
+        ]
+
+# Cold copy of aged/soft-deleted notifications; ids are preserved from the hot table.
+class NotificationArchive(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    notification_type = models.CharField(max_length=50, choices=Notification.NOTIFICATION_TYPE_CHOICES)
+    message = models.TextField()
+    count = models.PositiveIntegerField(default=1)
+    sent_at = models.DateTimeField()
+    read_status = models.CharField(max_length=20, choices=[('Unread', 'Unread'), ('Read', 'Read')], default='Unread')
+    is_deleted = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived {self.notification_type} for {self.user.username}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sent_at'], name='idx_notif_archive_user_sent'),
+        ]
+
+class NotificationPreference(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_preference')
+    digest_enabled = models.BooleanField(default=True)
+    digest_window_minutes = models.PositiveIntegerField(default=15, validators=[MinValueValidator(1), MaxValueValidator(1440)])
+
+    def __str__(self):
+        return f"Notification preferences for {self.user.username}"
+
 class BookingInquiry(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -384,14 +661,19 @@ class BookingInquiry(models.Model):
         return f"Inquiry for {self.property.property_name} by {self.user.username}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
         return cls.objects.all()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-inquiry_date'], condition=LIVE_ROWS, name='idx_inquiry_live_user'),
+            models.Index(fields=['property', 'status'], condition=LIVE_ROWS, name='idx_inquiry_live_property'),
+        ]
+
 class MaintenanceRequest(models.Model):
     STATUS_CHOICES = [
         ('Pending', 'Pending'),
@@ -411,20 +693,54 @@ class MaintenanceRequest(models.Model):
         return f"Maintenance for {self.property.property_name} by {self.user.username}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
         return cls.objects.all()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], condition=LIVE_ROWS, name='idx_maint_live_user'),
+            models.Index(fields=['property', 'status'], condition=LIVE_ROWS, name='idx_maint_live_property'),
+        ]
+
 class Amenity(models.Model):
+    # Bits 0-62 of a signed 64-bit Property.amenity_mask
+    MAX_AMENITIES = 63
+
     name = models.CharField(max_length=100, unique=True)
+    bit = models.PositiveSmallIntegerField(unique=True, null=True, editable=False)
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def free_bit(cls):
+        used = set(cls.objects.exclude(bit__isnull=True).values_list('bit', flat=True))
+        free = [bit for bit in range(cls.MAX_AMENITIES) if bit not in used]
+        if not free:
+            raise ValidationError(f"The amenity catalog is full ({cls.MAX_AMENITIES} amenities).")
+        return free[0]
+
+    def save(self, *args, **kwargs):
+        if self.bit is not None:
+            return super().save(*args, **kwargs)
+        # Concurrent creates can pick the same free bit; the unique constraint
+        # rejects all but one, and the others pick again.
+        for _ in range(self.MAX_AMENITIES):
+            self.bit = self.free_bit()
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Amenity.objects.filter(bit=self.bit).exists()
+                self.bit = None
+                if not taken:
+                    raise
+        raise ValidationError("Could not allocate an amenity bit.")
+
 class PropertyAmenity(models.Model):
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='property_amenities')
     amenity = models.ForeignKey(Amenity, on_delete=models.CASCADE, related_name='property_amenities')
@@ -446,6 +762,47 @@ class Favorite(models.Model):
     def __str__(self):
         return f"{self.property.property_name} favorited by {self.user.username}"
 
+# Denormalized read model behind the public catalogue: one row per active
+# property with everything a listing card shows. Rebuilt from the source
+# tables by users/catalogue.py whenever they change; never edited directly.
+class CatalogueEntry(models.Model):
+    property = models.OneToOneField(Property, on_delete=models.CASCADE, primary_key=True, related_name='catalogue_entry')
+    property_name = models.CharField(max_length=100)
+    property_type = models.CharField(max_length=50, choices=Property.PROPERTY_TYPE_CHOICES)
+    rental_type = models.CharField(max_length=20, choices=Property.RENTAL_TYPE_CHOICES)
+    availability_status = models.CharField(max_length=20, choices=Property.AVAILABILITY_CHOICES)
+    is_multi_room = models.BooleanField(default=False)
+    number_of_bedrooms = models.IntegerField(null=True, blank=True)
+    number_of_bathrooms = models.IntegerField(null=True, blank=True)
+    price_per_month = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price_per_night = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    region = models.CharField(max_length=100, blank=True)
+    # The location's canonical City and Region keys, which the catalogue filters on.
+    city_id = models.IntegerField(null=True, blank=True)
+    region_id = models.IntegerField(null=True, blank=True)
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    thumbnail = models.CharField(max_length=255, blank=True, help_text="URL of the first uploaded image")
+    rating = models.DecimalField(max_digits=3, decimal_places=2, null=True, blank=True)
+    review_count = models.PositiveIntegerField(default=0)
+    amenity_mask = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['availability_status', '-created_at'], name='idx_catalogue_status_newest'),
+            models.Index(fields=['availability_status', 'city_id'], name='idx_catalogue_status_city_id'),
+            models.Index(fields=['availability_status', 'region_id'], name='idx_catalogue_status_region_id'),
+            models.Index(fields=['availability_status', 'price_per_month'], name='idx_catalogue_status_month'),
+            models.Index(fields=['availability_status', 'price_per_night'], name='idx_catalogue_status_night'),
+            models.Index(fields=['latitude', 'longitude'], name='idx_catalogue_coordinates'),
+        ]
+
+    def __str__(self):
+        return f"Catalogue entry for {self.property_name}"
+
 class Manager(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='managed_properties')
     property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='managers')
@@ -475,10 +832,14 @@ class SupportTicket(models.Model):
         return f"Ticket #{self.id}: {self.subject} by {self.user.username}"
 
     def delete(self, *args, **kwargs):
-        self.is_deleted = True
-        self.deleted_at = timezone.now()
-        self.save()
+        from .soft_delete import soft_delete
+        return soft_delete(self)
 
     @classmethod
     def get_active(cls):
-        return cls.objects.all()
\ No newline at end of file
+        return cls.objects.all()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], condition=LIVE_ROWS, name='idx_ticket_live_user'),
+        ]
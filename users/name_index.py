@@ -0,0 +1,163 @@
+# users/name_index.py
+# In-memory trigram index over property names, shared by the chatbot's
+# PropertyDetails intent and the properties/name_search/ endpoint.
+import re
+import threading
+import time
+from array import array
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .lazy_index import LazyIndex
+
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text):
+    return NON_ALNUM_RE.sub(' ', text.lower()).strip()
+
+
+def trigrams(text):
+    """pg_trgm-style trigrams: every word padded with two leading and one trailing space."""
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigram to index slots. Postings, slot ids and
+    trigram counts are ``array`` buffers so queries can view them as NumPy
+    arrays without copying and count shared trigrams with one ``bincount``.
+
+    Updates are incremental: a renamed or removed property leaves a dead
+    slot behind, and the index compacts itself once dead slots pile up.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = defaultdict(lambda: array('i'))
+        self._ids = array('q')
+        self._lengths = array('i')  # trigram count per slot, 0 when dead
+        self._names = []
+        self._slot_of = {}
+        self._dead = 0
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def add(self, pk, name):
+        with self._lock:
+            self._remove(pk)
+            grams = trigrams(name)
+            if not grams:
+                return
+            slot = len(self._ids)
+            self._ids.append(pk)
+            self._lengths.append(len(grams))
+            self._names.append(name)
+            self._slot_of[pk] = slot
+            for gram in grams:
+                self._postings[gram].append(slot)
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+            if self._dead > 1000 and self._dead > len(self._ids) // 5:
+                self._compact()
+
+    def _remove(self, pk):
+        slot = self._slot_of.pop(pk, None)
+        if slot is not None:
+            self._lengths[slot] = 0
+            self._dead += 1
+
+    def _compact(self):
+        live = [(self._ids[slot], self._names[slot]) for slot in self._slot_of.values()]
+        self.__init__()
+        for pk, name in live:
+            self.add(pk, name)
+
+    def search(self, query, limit=10, min_score=None):
+        """
+        Return up to ``limit`` ``(pk, name, score)`` tuples, best first.
+        ``score`` averages how much of the query the name covers with the
+        trigram Jaccard similarity, so both partial input and typos rank well.
+        """
+        min_score = settings.PROPERTY_NAME_MIN_SCORE if min_score is None else min_score
+        grams = trigrams(query)
+        if not grams:
+            return []
+        with self._lock:
+            postings = [self._postings[gram] for gram in grams if gram in self._postings]
+            if not postings:
+                return []
+            slots = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in postings])
+            shared = np.bincount(slots, minlength=len(self._ids))
+            lengths = np.frombuffer(self._lengths, dtype=np.int32)
+            candidates = np.nonzero((shared > 0) & (lengths > 0))[0]
+            common = shared[candidates]
+            coverage = common / len(grams)
+            jaccard = common / (len(grams) + lengths[candidates] - common)
+            scores = (coverage + jaccard) / 2
+            keep = scores >= min_score
+            candidates, scores = candidates[keep], scores[keep]
+            if len(candidates) > limit:
+                top = np.argpartition(-scores, limit)[:limit]
+                candidates, scores = candidates[top], scores[top]
+            order = np.argsort(-scores, kind='stable')
+            return [
+                (self._ids[slot], self._names[slot], round(float(score), 3))
+                for slot, score in zip(candidates[order], scores[order])
+            ]
+
+
+def build_index():
+    from .models import Property
+
+    index = TrigramIndex()
+    for pk, name in Property.objects.values_list('id', 'property_name').iterator(chunk_size=5000):
+        index.add(pk, name)
+    return index
+
+
+_shared = LazyIndex(build_index, 'PROPERTY_NAME_INDEX_TTL')
+
+
+def get_index():
+    """
+    Return the process-wide index, building it on first use. Writes made in
+    this process are applied through signals; to pick up writes from other
+    workers the index is rebuilt in the background every
+    PROPERTY_NAME_INDEX_TTL seconds while the old one keeps serving.
+    """
+    return _shared.get()
+
+
+def index_property(instance):
+    index = _shared.current
+    if index is None:
+        return
+    if instance.is_deleted:
+        index.remove(instance.pk)
+    else:
+        index.add(instance.pk, instance.property_name)
+
+
+def unindex_property(instance):
+    index = _shared.current
+    if index is not None:
+        index.remove(instance.pk)
+
+
+def reset_index():
+    _shared.reset()
+
+
+def search_property_names(query, limit=10):
+    return get_index().search(query, limit=limit)
@@ -0,0 +1,120 @@
+# users/notifications.py
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .fcm_utils import send_notification_to_users
+from .models import Notification, NotificationPreference, User
+from .places import cities_named
+from .tasks import enqueue
+
+SEGMENT_CHOICES = [
+    ('role', 'Role'),
+    ('property_tenants', 'Current tenants of a property'),
+    ('city', 'Current tenants in a city'),
+]
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def current_tenants():
+    today = timezone.now().date()
+    return User.objects.filter(
+        bookings__status='Confirmed',
+        bookings__is_deleted=False,
+        bookings__start_date__lte=today,
+        bookings__end_date__gte=today,
+    )
+
+
+def resolve_segment(segment, value):
+    """Return the recipients queryset for a fan-out segment."""
+    if segment == 'role':
+        users = User.objects.filter(role=value)
+    elif segment == 'property_tenants':
+        users = current_tenants().filter(bookings__property_id=value)
+    elif segment == 'city':
+        users = current_tenants().filter(bookings__property__location__canonical_city__in=cities_named(value))
+    else:
+        raise ValueError(f"Unknown segment: {segment}")
+    return users.filter(is_active=True).distinct()
+
+
+def fan_out(recipients, notification_type, message, push=True):
+    """
+    Create one Notification per recipient with chunked ``bulk_create`` and
+    queue push delivery for each chunk. Returns the number of rows created.
+    """
+    chunk_size = settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    user_ids = recipients.values_list('id', flat=True).order_by().iterator(chunk_size=chunk_size)
+    created = 0
+    for chunk in chunked(user_ids, chunk_size):
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, notification_type=notification_type, message=message) for user_id in chunk]
+        )
+        created += len(chunk)
+        if push:
+            enqueue(send_notification_to_users, chunk, notification_type, message)
+    return created
+
+
+def notify_users(recipients, notification_type, message):
+    """Fan out in the background so the caller's request returns immediately."""
+    enqueue(fan_out, recipients, notification_type, message)
+
+
+def get_preferences(user):
+    minutes = settings.NOTIFICATION_DIGEST_WINDOW_MINUTES
+    preference, _ = NotificationPreference.objects.get_or_create(
+        user=user,
+        # A window of 0 turns digests off; the stored window must still pass the field's validators.
+        defaults={'digest_enabled': minutes > 0, 'digest_window_minutes': min(max(minutes, 1), 1440)}
+    )
+    return preference
+
+
+def digest_window(user):
+    """Return the coalescing window for ``user``, or None when digests are off."""
+    preference = NotificationPreference.objects.filter(user=user).first()
+    if preference is None:
+        minutes = settings.NOTIFICATION_DIGEST_WINDOW_MINUTES
+    elif preference.digest_enabled:
+        minutes = preference.digest_window_minutes
+    else:
+        return None
+    return timedelta(minutes=minutes) if minutes else None
+
+
+def notify(user, notification_type, message):
+    """
+    Notify one user, coalescing into a digest.
+
+    If the user already has an unread notification of the same type that
+    opened within their digest window, that row absorbs the event (its count
+    goes up and its message becomes the latest one) and no push is sent.
+    Otherwise a new row is created and pushed. Returns ``(notification, created)``.
+    """
+    window = digest_window(user)
+    if window:
+        digest = Notification.get_active().filter(
+            user=user,
+            notification_type=notification_type,
+            read_status='Unread',
+            sent_at__gte=timezone.now() - window,
+        ).order_by('-sent_at').first()
+        if digest and Notification.objects.filter(pk=digest.pk, read_status='Unread').update(
+                count=F('count') + 1, message=message):
+            digest.count += 1
+            digest.message = message
+            return digest, False
+
+    notification = Notification.objects.create(user=user, notification_type=notification_type, message=message)
+    enqueue(send_notification_to_users, [user.id], notification_type, message)
+    return notification, True
@@ -0,0 +1,144 @@
+# users/payments.py
+# Reconciliation of pending payments against the processor. Payments only
+# change status when somebody calls update_status, so reconcile_payments()
+# pages through the pending ones that have a PaymentIntent, looks the intents
+# up concurrently (one keep-alive session per pool thread, as in fcm_utils)
+# and applies whatever settled with one UPDATE per outcome and page.
+# settle() is shared with the webhook path (users/webhooks.py), so a payment
+# leaves the same Payment and Booking state whichever of the two settled it.
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+
+from .intent_cache import booking_status_key, invalidate
+from .models import Booking, Payment
+
+# PaymentIntent statuses that settle a payment; every other status is still in flight.
+INTENT_OUTCOMES = {
+    'succeeded': 'Completed',
+    'canceled': 'Failed',
+}
+
+_local = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_session():
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PAYMENT_PROVIDER_MAX_CONCURRENCY,
+                    thread_name_prefix='payments'
+                )
+    return _executor
+
+
+def reset_executor():
+    """Drop the lookup pool, e.g. after changing PAYMENT_PROVIDER_MAX_CONCURRENCY."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown()
+
+
+def fetch_intent(intent_id):
+    """The PaymentIntent ``intent_id`` as the provider's API returns it."""
+    response = _get_session().get(
+        f'{settings.STRIPE_API_BASE}/v1/payment_intents/{intent_id}',
+        headers={'Authorization': f'Bearer {settings.STRIPE_SECRET_KEY}'},
+        timeout=settings.PAYMENT_PROVIDER_TIMEOUT
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def intent_outcome(intent):
+    """The Payment status a PaymentIntent has settled on, or None while it is in flight."""
+    if intent.get('status') == 'requires_payment_method' and intent.get('last_payment_error'):
+        # The last attempt was declined and nobody has retried it.
+        return 'Failed'
+    return INTENT_OUTCOMES.get(intent.get('status'))
+
+
+def _outcome(intent_id):
+    try:
+        return intent_outcome(fetch_intent(intent_id))
+    except (requests.RequestException, ValueError) as e:
+        print(f"Payment provider error for {intent_id}: {e}")
+        return 'error'
+
+
+def fetch_outcomes(intent_ids):
+    """``{intent id: outcome}`` looked up concurrently; 'error' where the lookup failed."""
+    intent_ids = list(dict.fromkeys(intent_ids))
+    if len(intent_ids) == 1:
+        return {intent_ids[0]: _outcome(intent_ids[0])}
+    return dict(zip(intent_ids, _get_executor().map(_outcome, intent_ids)))
+
+
+def settle(payments, outcome):
+    """
+    Move ``payments``, a queryset already narrowed to the rows allowed to
+    change, to ``outcome``. A Completed payment also confirms its Pending
+    booking. Returns how many payments changed.
+    """
+    rows = list(payments.values_list('pk', 'booking_id', 'booking__user_id'))
+    if not rows:
+        return 0
+    changed = payments.filter(pk__in=[pk for pk, _, _ in rows]).update(payment_status=outcome)
+    if outcome == 'Completed':
+        # Pending and Confirmed bookings both hold the property, so availability is unchanged.
+        confirmed = Booking.objects.filter(pk__in={booking_id for _, booking_id, _ in rows}, status='Pending').update(
+            status='Confirmed'
+        )
+        if confirmed:
+            invalidate(*{booking_status_key(user_id) for _, _, user_id in rows})
+    return changed
+
+
+def reconcile_payments(batch_size=None):
+    """
+    Settle pending payments whose PaymentIntent has succeeded or failed, a page
+    of ``batch_size`` at a time. Returns counts per new status, plus
+    ``pending`` (still in flight) and ``errors`` (lookups that failed).
+    """
+    batch_size = batch_size or settings.PAYMENT_RECONCILE_BATCH_SIZE
+    pending = Payment.objects.filter(payment_status='Pending', stripe_payment_intent_id__isnull=False).exclude(
+        stripe_payment_intent_id=''
+    )
+    counts = Counter()
+    last_pk = 0
+    while True:
+        page = list(
+            pending.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'stripe_payment_intent_id')[:batch_size]
+        )
+        if not page:
+            return dict(counts)
+        last_pk = page[-1][0]
+        outcomes = fetch_outcomes(intent_id for _, intent_id in page)
+        settled = {}
+        for pk, intent_id in page:
+            outcome = outcomes[intent_id]
+            if outcome == 'error':
+                counts['errors'] += 1
+            elif outcome is None:
+                counts['pending'] += 1
+            else:
+                settled.setdefault(outcome, []).append(pk)
+        for status, pks in settled.items():
+            # Still Pending: a status set by hand since the page was read wins.
+            counts[status] += settle(Payment.objects.filter(pk__in=pks, payment_status='Pending'), status)
@@ -0,0 +1,61 @@
+# users/places.py
+# City and region filtering on the City/Region dimension tables. A name in
+# any spelling becomes a subquery on the indexed slug and the filter itself an
+# integer comparison on Location's canonical_city/canonical_region keys.
+# Location.save() keeps those keys current; assign_places() fills them in for
+# rows written without it (bulk_create, raw SQL).
+from . import autocomplete, catalogue, search_index
+from .models import City, Location, Property, Region, place_key
+
+
+def cities_named(name):
+    return City.objects.filter(slug=place_key(name)).values('pk')
+
+
+def regions_named(name):
+    return Region.objects.filter(slug=place_key(name)).values('pk')
+
+
+def filter_by_places(queryset, params, location='location'):
+    """
+    Apply ``?city_id=``/``?region_id=`` and ``?<location>__city=``/``?<location>__region=``
+    (names in any spelling) to ``queryset``, whose ``location`` path leads to a
+    Location. Raises ValueError on a malformed id.
+    """
+    lookups = {
+        'city_id': ('canonical_city', int),
+        'region_id': ('canonical_region', int),
+        f'{location}__city': ('canonical_city__in', cities_named),
+        f'{location}__region': ('canonical_region__in', regions_named),
+    }
+    for param, (field, value) in lookups.items():
+        if params.get(param):
+            queryset = queryset.filter(**{f'{location}__{field}': value(params[param])})
+    return queryset
+
+
+def assign_places(batch_size=1000):
+    """
+    Canonicalize locations that have no city key yet: one UPDATE per spelling
+    found, ``batch_size`` rows at a time. Returns how many were assigned.
+    """
+    unassigned = Location.objects.filter(canonical_city__isnull=True)
+    spellings = list(unassigned.order_by().values_list(*Location.PLACE_FIELDS).distinct())
+    assigned = 0
+    for names in spellings:
+        city = City.resolve(*names)
+        canonical = (city.name, city.region.name, city.region.country)
+        rows = unassigned.filter(**dict(zip(Location.PLACE_FIELDS, names)))
+        while pks := list(rows.values_list('pk', flat=True)[:batch_size]):
+            Location.objects.filter(pk__in=pks).update(
+                canonical_city=city, canonical_region=city.region, **dict(zip(Location.PLACE_FIELDS, canonical))
+            )
+            assigned += len(pks)
+            if canonical != names:
+                # update() skips post_save, so refresh what copies the names, as location_saved would.
+                property_ids = list(Property.objects.filter(location__in=pks).values_list('pk', flat=True))
+                if property_ids:
+                    search_index.reindex_properties(property_ids)
+                    autocomplete.refresh_properties(property_ids)
+                    catalogue.schedule_refresh(property_ids)
+    return assigned
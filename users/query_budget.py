@@ -0,0 +1,180 @@
+# users/query_budget.py
+# Per-request SQL accounting. QueryBudgetMiddleware wraps every database
+# connection while a request runs and records how many queries it made, how
+# long they took and which statements repeated (the same SQL with different
+# parameters, the signature of an N+1). Totals are kept per endpoint
+# ("property-list", "booking-retrieve") in query_stats(); with
+# QUERY_BUDGET_HEADERS on (the default under DEBUG) each response also carries
+# them as headers. A viewset declares ceilings per action in ``query_budgets``;
+# requests over budget are counted and reported, and the test suite runs every
+# router endpoint against its ceiling.
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+_NUMBER = re.compile(r'\b\d+\b')
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(Counter)  # endpoint -> totals and maxima
+_repeats = defaultdict(Counter)  # endpoint -> fingerprint -> requests that repeated it
+
+
+def fingerprint(sql):
+    """``sql`` with its IN lists and inlined numbers collapsed, so the queries of an N+1 loop share one."""
+    return _NUMBER.sub('N', _IN_LIST.sub('(%s, ...)', sql))
+
+
+class QueryProfile:
+    """Execute wrapper counting and timing the queries run through it."""
+
+    def __init__(self):
+        self.count = 0
+        self.sql_ms = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.sql_ms += (time.perf_counter() - started) * 1000
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """``{fingerprint: executions}`` for the statements run more than once."""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        return sum(count - 1 for count in self.duplicates.values())
+
+
+def endpoint_for(request, view_func):
+    """``(endpoint name, declared budget or None)`` for the view ``request`` resolved to."""
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None)
+    method = request.method.lower()
+    if view_class is None or not actions or method not in actions:
+        return request.resolver_match.view_name, None
+    action = actions[method]
+    basename = view_func.initkwargs.get('basename') or view_class.__name__
+    return f'{basename}-{action}', getattr(view_class, 'query_budgets', {}).get(action)
+
+
+def record(endpoint, profile, budget):
+    with _stats_lock:
+        stats = _stats[endpoint]
+        stats['requests'] += 1
+        stats['queries'] += profile.count
+        stats['sql_ms'] += profile.sql_ms
+        stats['max_queries'] = max(stats['max_queries'], profile.count)
+        stats['max_sql_ms'] = max(stats['max_sql_ms'], profile.sql_ms)
+        stats['duplicates'] += profile.duplicate_count
+        stats['over_budget'] += profile.count > budget
+        _repeats[endpoint].update(profile.duplicates.keys())
+
+
+def query_stats():
+    """
+    ``{endpoint: {...}}`` for the requests this process served since the last
+    reset: requests, mean and max queries and SQL milliseconds, repeated
+    queries, requests over budget and the most often repeated statements.
+    """
+    with _stats_lock:
+        return {
+            endpoint: {
+                'requests': stats['requests'],
+                'mean_queries': stats['queries'] / stats['requests'],
+                'max_queries': stats['max_queries'],
+                'mean_sql_ms': stats['sql_ms'] / stats['requests'],
+                'max_sql_ms': stats['max_sql_ms'],
+                'duplicates': stats['duplicates'],
+                'over_budget': stats['over_budget'],
+                'repeated': [sql for sql, _ in _repeats[endpoint].most_common(5)],
+            }
+            for endpoint, stats in _stats.items()
+        }
+
+
+def reset_query_stats():
+    with _stats_lock:
+        _stats.clear()
+        _repeats.clear()
+
+
+class QueryBudgetMiddleware:
+    """Profile each request's queries against its endpoint's budget."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = QueryProfile()
+        with self.profiling(profile):
+            response = self.get_response(request)
+        return self.report(request, profile, response)
+
+    async def __acall__(self, request):
+        profile = QueryProfile()
+        # The view's ORM calls run on the request's sync_to_async thread, whose connections are its own.
+        profiling = await sync_to_async(self.profiling)(profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(profiling.close)()
+        return self.report(request, profile, response)
+
+    def profiling(self, profile):
+        """Wrap this thread's connections with ``profile`` until the returned stack is closed."""
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(profile))
+        return stack
+
+    def report(self, request, profile, response):
+        endpoint, budget = getattr(request, 'query_endpoint', (None, None))
+        if endpoint is None:
+            # Never reached a view: a 404, or a response from earlier middleware.
+            return response
+        budget = budget if budget is not None else settings.QUERY_BUDGET_DEFAULT
+        record(endpoint, profile, budget)
+        if profile.count > budget:
+            print(f"Query budget exceeded on {endpoint}: {profile.count} queries, budget {budget}")
+        # Read by tests; the headers below are only sent when enabled.
+        response.query_profile = profile
+        response.query_budget = budget
+        if settings.QUERY_BUDGET_HEADERS:
+            response['X-Query-Count'] = str(profile.count)
+            response['X-Query-Budget'] = str(budget)
+            response['X-Query-Time-Ms'] = f'{profile.sql_ms:.2f}'
+            response['X-Query-Duplicates'] = str(profile.duplicate_count)
+            timing = f'db;dur={profile.sql_ms:.2f}'
+            response['Server-Timing'] = f"{response['Server-Timing']}, {timing}" if response.has_header('Server-Timing') else timing
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_endpoint = endpoint_for(request, view_func)
+
+
+def router_endpoints(router):
+    """``(basename, viewset, action, method, url name, detail)`` for every route ``router`` serves."""
+    for _, viewset, basename in router.registry:
+        for route in router.get_routes(viewset):
+            for method, action in route.mapping.items():
+                if hasattr(viewset, action):
+                    yield basename, viewset, action, method.upper(), route.name.format(basename=basename), route.detail
@@ -0,0 +1,19 @@
+# users/read_state.py
+from django.conf import settings
+
+
+def mark_read_in_chunks(queryset, batch_size=None):
+    """
+    Flip every unread row of ``queryset`` to 'Read' with a series of small
+    primary-key-bounded UPDATEs. Each statement commits on its own, so row
+    locks are held for one chunk at a time rather than for the whole set.
+    Returns the number of rows updated.
+    """
+    batch_size = batch_size or settings.READ_STATE_BATCH_SIZE
+    unread = queryset.filter(read_status='Unread').order_by('pk')
+    updated = 0
+    while True:
+        pks = list(unread.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return updated
+        updated += queryset.model._base_manager.filter(pk__in=pks, read_status='Unread').update(read_status='Read')
@@ -0,0 +1,46 @@
+# users/retention.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Message, MessageArchive, Notification, NotificationArchive
+
+
+def archive_rows(model, archive_model, condition, batch_size=1000):
+    """
+    Move rows of ``model`` matching ``condition`` into ``archive_model`` in
+    primary-key batches. Each batch is copied and deleted in its own short
+    transaction so the hot table is never locked for the whole run.
+    Returns the number of rows moved.
+    """
+    fields = [f.attname for f in archive_model._meta.concrete_fields if f.attname != 'archived_at']
+    # The base manager also sees soft-deleted rows, which ActiveManager hides.
+    queryset = model._base_manager.filter(condition).order_by('pk')
+    moved = 0
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.values(*fields)[:batch_size])
+            if not rows:
+                break
+            archive_model.objects.bulk_create([archive_model(**row) for row in rows], ignore_conflicts=True)
+            model._base_manager.filter(pk__in=[row['id'] for row in rows]).delete()
+        moved += len(rows)
+    return moved
+
+
+def archive_condition(retention_days, now=None):
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    return Q(is_deleted=True) | Q(sent_at__lt=cutoff)
+
+
+def archive_notifications(batch_size=1000, now=None):
+    condition = archive_condition(settings.NOTIFICATION_RETENTION_DAYS, now)
+    return archive_rows(Notification, NotificationArchive, condition, batch_size)
+
+
+def archive_messages(batch_size=1000, now=None):
+    condition = archive_condition(settings.MESSAGE_RETENTION_DAYS, now)
+    return archive_rows(Message, MessageArchive, condition, batch_size)
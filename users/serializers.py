@@ -2,8 +2,9 @@ from rest_framework import serializers
 from .models import (
     User, Location, Property, Booking, Payment, Review, Message, PropertyMedia,
     Notification, BookingInquiry, Room, Amenity, PropertyAmenity, Favorite, Manager,
-    MaintenanceRequest, SupportTicket
+    MaintenanceRequest, SupportTicket, NotificationPreference, ChatTurn, CatalogueEntry
 )
+from .notifications import SEGMENT_CHOICES
 
 class UserSerializer(serializers.ModelSerializer):
     profile_picture = serializers.ImageField(required=False)
@@ -57,9 +58,14 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
 class LocationSerializer(serializers.ModelSerializer):
+    city_id = serializers.IntegerField(source='canonical_city_id', read_only=True)
+    region_id = serializers.IntegerField(source='canonical_region_id', read_only=True)
+
     class Meta:
         model = Location
-        fields = ['id', 'address', 'city', 'region', 'country', 'latitude', 'longitude', 'postal_code']
+        fields = [
+            'id', 'address', 'city', 'region', 'country', 'latitude', 'longitude', 'postal_code', 'city_id', 'region_id'
+        ]
 
 class PropertyMediaSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
@@ -83,7 +89,8 @@ class PropertySerializer(serializers.ModelSerializer):
         fields = [
             'id', 'owner', 'location', 'property_name', 'property_type', 'rental_type',
             'price_per_night', 'price_per_month', 'availability_status', 'media', 'distance',
-            'is_multi_room', 'number_of_bedrooms', 'number_of_bathrooms', 'square_footage', 'description'
+            'is_multi_room', 'number_of_bedrooms', 'number_of_bathrooms', 'square_footage', 'description',
+            'average_rating', 'review_count', 'favorite_count', 'booking_count'
         ]
 
     def validate(self, data):
@@ -127,8 +134,42 @@ class MessageSerializer(serializers.ModelSerializer):
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
-        fields = ['id', 'user', 'notification_type', 'message', 'sent_at', 'read_status']
-        extra_kwargs = {'user': {'read_only': True}}  # User set by view, not request
+        fields = ['id', 'user', 'notification_type', 'message', 'count', 'sent_at', 'read_status']
+        extra_kwargs = {'user': {'read_only': True}, 'count': {'read_only': True}}  # User set by view, not request
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationPreference
+        fields = ['digest_enabled', 'digest_window_minutes']
+
+class ChatTurnSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ChatTurn
+        fields = ['id', 'message', 'response', 'intent_name', 'created_at']
+
+class CatalogueEntrySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='property_id', read_only=True)
+    distance = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = CatalogueEntry
+        fields = [
+            'id', 'property_name', 'property_type', 'rental_type', 'availability_status', 'is_multi_room',
+            'number_of_bedrooms', 'number_of_bathrooms', 'price_per_month', 'price_per_night', 'city', 'region',
+            'city_id', 'region_id', 'latitude', 'longitude', 'distance', 'thumbnail', 'rating', 'review_count',
+            'created_at'
+        ]
+
+class NotificationBroadcastSerializer(serializers.Serializer):
+    segment = serializers.ChoiceField(choices=SEGMENT_CHOICES)
+    value = serializers.CharField(max_length=100)
+    notification_type = serializers.ChoiceField(choices=Notification.NOTIFICATION_TYPE_CHOICES)
+    message = serializers.CharField()
+
+    def validate(self, data):
+        if data['segment'] == 'property_tenants' and not data['value'].isdigit():
+            raise serializers.ValidationError("Property tenants segment requires a property id.")
+        return data
 
 class BookingInquirySerializer(serializers.ModelSerializer):
     class Meta:
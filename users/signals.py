@@ -0,0 +1,145 @@
+# users/signals.py
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import aggregates, amenities, autocomplete, catalogue, db_connections, search_index
+from .intent_cache import LIST_PROPERTIES_KEY, booking_status_key, invalidate, property_details_key
+from .models import Amenity, Booking, Favorite, Location, Property, PropertyAmenity, PropertyMedia, Review
+from .name_index import index_property, unindex_property
+from .soft_delete import soft_deleted
+
+
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    index_property(instance)
+    search_index.reindex_properties([instance.pk])
+    autocomplete.refresh_properties([instance.pk])
+    catalogue.schedule_refresh([instance.pk])
+    keys = [property_details_key(instance.pk), LIST_PROPERTIES_KEY]
+    if not created and (update_fields is None or 'property_name' in update_fields):
+        # Booking-status answers name the property; its tenants' may now be stale.
+        tenants = Booking.objects.filter(property_id=instance.pk).order_by().values_list('user_id', flat=True)
+        keys += [booking_status_key(user_id) for user_id in set(tenants)]
+    invalidate(*keys)
+
+
+@receiver(post_delete, sender=Property)
+def property_deleted(sender, instance, **kwargs):
+    unindex_property(instance)
+    search_index.unindex_property(instance.pk)
+    autocomplete.unindex_property(instance.pk)
+    catalogue.schedule_refresh([instance.pk])
+    invalidate(property_details_key(instance.pk), LIST_PROPERTIES_KEY)
+
+
+@receiver([post_save, post_delete], sender=PropertyAmenity)
+def property_amenity_changed(sender, instance, **kwargs):
+    search_index.reindex_properties([instance.property_id])
+
+
+@receiver(post_save, sender=PropertyAmenity)
+def property_amenity_saved(sender, instance, created, **kwargs):
+    if created:
+        amenities.add_amenity(instance.property_id, instance.amenity_id)
+    else:
+        amenities.rebuild_amenity_masks([instance.property_id])
+    catalogue.schedule_refresh([instance.property_id])
+
+
+@receiver(post_delete, sender=PropertyAmenity)
+def property_amenity_deleted(sender, instance, **kwargs):
+    amenities.remove_amenity(instance.property_id, instance.amenity_id)
+    catalogue.schedule_refresh([instance.property_id])
+
+
+# The querysets below are lazy: they only run when the search index is loaded.
+@receiver(post_save, sender=Amenity)
+def amenity_saved(sender, instance, created, **kwargs):
+    if not created:
+        search_index.reindex_properties(
+            PropertyAmenity.objects.filter(amenity=instance).values_list('property_id', flat=True)
+        )
+
+
+@receiver(post_delete, sender=Amenity)
+def amenity_deleted(sender, instance, **kwargs):
+    if instance.bit is not None:
+        amenities.clear_amenity_bit(instance.bit)
+        catalogue.clear_amenity_bit(instance.bit)
+
+
+@receiver(post_save, sender=Location)
+def location_saved(sender, instance, created, **kwargs):
+    if not created:
+        property_ids = list(Property.objects.filter(location=instance).values_list('pk', flat=True))
+        search_index.reindex_properties(property_ids)
+        autocomplete.refresh_properties(property_ids)
+        catalogue.schedule_refresh(property_ids)
+
+
+@receiver([post_save, post_delete], sender=Booking)
+def booking_changed(sender, instance, created=False, **kwargs):
+    if created and not instance.is_deleted:
+        aggregates.booking_added(instance.property_id)
+    elif kwargs['signal'] is post_delete:
+        aggregates.refresh_aggregates([instance.property_id])
+    invalidate(booking_status_key(instance.user_id))
+    autocomplete.refresh_properties([instance.property_id])
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+def favorite_changed(sender, instance, created=False, **kwargs):
+    if created:
+        aggregates.favorite_added(instance.property_id)
+    elif kwargs['signal'] is post_delete:
+        aggregates.favorite_removed(instance.property_id)
+    autocomplete.refresh_properties([instance.property_id])
+
+
+@receiver([post_save, post_delete], sender=PropertyMedia)
+def catalogue_source_changed(sender, instance, **kwargs):
+    catalogue.schedule_refresh([instance.property_id])
+
+
+@receiver([post_save, post_delete], sender=Review)
+def review_changed(sender, instance, created=False, **kwargs):
+    # Aggregates first: the catalogue entry copies them.
+    if created and not instance.is_deleted:
+        aggregates.review_added(instance.property_id, instance.rating)
+    else:
+        aggregates.refresh_aggregates([instance.property_id])
+    catalogue.schedule_refresh([instance.property_id])
+
+
+@receiver(connection_created)
+def database_connected(sender, connection, **kwargs):
+    db_connections.record_connect(connection.alias)
+
+
+@receiver(soft_deleted, sender=Property)
+def properties_soft_deleted(sender, pks, **kwargs):
+    for pk in pks:
+        unindex_property(Property(pk=pk))
+        search_index.unindex_property(pk)
+    autocomplete.refresh_properties(pks)
+    catalogue.schedule_refresh(pks)
+    invalidate(LIST_PROPERTIES_KEY, *[property_details_key(pk) for pk in pks])
+
+
+@receiver(soft_deleted, sender=Booking)
+def bookings_soft_deleted(sender, pks, **kwargs):
+    rows = list(Booking._base_manager.filter(pk__in=pks).values_list('user_id', 'property_id'))
+    property_ids = {property_id for _, property_id in rows}
+    aggregates.refresh_aggregates(property_ids)
+    Booking.release_properties(property_ids)
+    invalidate(*{booking_status_key(user_id) for user_id, _ in rows})
+    autocomplete.refresh_properties(property_ids)
+    catalogue.schedule_refresh(property_ids)
+
+
+@receiver(soft_deleted, sender=Review)
+def reviews_soft_deleted(sender, pks, **kwargs):
+    property_ids = set(Review._base_manager.filter(pk__in=pks).values_list('property_id', flat=True))
+    aggregates.refresh_aggregates(property_ids)
+    catalogue.schedule_refresh(property_ids)
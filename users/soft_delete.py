@@ -0,0 +1,174 @@
+# users/soft_delete.py
+# Soft delete with cascades. Deleting a row flags it and, in the same
+# transaction, every live row that depends on it through a CASCADE foreign key
+# (a landlord's properties, their bookings, those bookings' payments...): one
+# UPDATE per model, with the rows being deleted above it as a subquery.
+# purge_soft_deleted() later hard-deletes rows flagged for longer than
+# SOFT_DELETE_RETENTION_DAYS, a bounded batch per transaction, except rows a
+# hard delete would cascade into records that are kept (KEPT).
+from collections import Counter
+from datetime import timedelta
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.apps import apps
+from django.conf import settings
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import (
+    ActiveManager, ActiveUserManager, Message, MessageArchive, Notification, NotificationArchive, Payment
+)
+
+# Sent per model after a soft delete's UPDATEs, with the ``pks`` it flagged; they
+# skip post_save, so derived data (indexes, caches) listens here instead.
+soft_deleted = Signal()
+
+# Never hard-deleted, and neither is any row whose delete would cascade into them:
+# payments are financial records, and messages and notifications are moved to the
+# archives by archive_history and kept there (both sides of a conversation).
+KEPT = (Payment, Message, Notification, MessageArchive, NotificationArchive)
+
+
+def soft_deletable(model):
+    return isinstance(model._default_manager, (ActiveManager, ActiveUserManager))
+
+
+@lru_cache(maxsize=None)
+def cascade_plan():
+    """
+    ``(model, foreign key names)`` for every soft-deletable model, parents
+    before children. The keys are those that cascade from another
+    soft-deletable model.
+    """
+    parents = {
+        model: tuple(
+            field.name for field in model._meta.concrete_fields
+            if field.many_to_one and field.remote_field.on_delete is models.CASCADE
+            and field.related_model is not model and soft_deletable(field.related_model)
+        )
+        for model in apps.get_app_config('users').get_models() if soft_deletable(model)
+    }
+    plan = []
+    while parents:
+        ready = [
+            model for model, keys in parents.items()
+            if all(model._meta.get_field(key).related_model not in parents for key in keys)
+        ]
+        if not ready:
+            raise RuntimeError(f"Soft-delete cascade has a cycle among {sorted(m.__name__ for m in parents)}")
+        for model in ready:
+            plan.append((model, parents.pop(model)))
+    return plan
+
+
+@lru_cache(maxsize=None)
+def kept_dependents(model):
+    """Lookups from ``model`` to the KEPT rows that hard-deleting it would cascade into."""
+    paths, pending = [], [(model, '', {model})]
+    while pending:
+        parent, prefix, seen = pending.pop()
+        for relation in parent._meta.related_objects:
+            child = relation.related_model
+            if relation.on_delete is not models.CASCADE or child in seen:
+                continue
+            path = f'{prefix}{relation.field.related_query_name()}'
+            if child in KEPT:
+                paths.append(path)
+            else:
+                pending.append((child, f'{path}__', seen | {child}))
+    return tuple(sorted(paths))
+
+
+def _flag(model, condition, now):
+    """Flag the live rows matching ``condition``; return the pks flagged (None if nobody listens) and the count."""
+    flagged = model._base_manager.filter(condition, is_deleted=False).update(is_deleted=True, deleted_at=now)
+    if not flagged or not soft_deleted.has_listeners(model):
+        return None, flagged
+    # ``deleted_at=now`` picks out exactly this run's rows.
+    return list(model._base_manager.filter(condition, deleted_at=now).values_list('pk', flat=True)), flagged
+
+
+def _cascade(selections, now):
+    """
+    Flag every model with a selection and cascade it down the plan.
+    ``selections`` maps a model to the Q of the rows being deleted in it.
+    """
+    flagged, counts = [], Counter()
+    with transaction.atomic():
+        for model, keys in cascade_plan():
+            conditions = [selections[model]] if model in selections else []
+            for key in keys:
+                parent = model._meta.get_field(key).related_model
+                if parent in selections:
+                    conditions.append(models.Q(**{f'{key}__in': parent._base_manager.filter(selections[parent]).values('pk')}))
+            if not conditions:
+                continue
+            selections[model] = reduce(or_, conditions)
+            pks, count = _flag(model, selections[model], now)
+            if count:
+                counts[model._meta.label] = count
+            if pks:
+                flagged.append((model, pks))
+    for model, pks in flagged:
+        soft_deleted.send(sender=model, pks=pks)
+    return sum(counts.values()), dict(counts)
+
+
+def soft_delete(target, now=None):
+    """
+    Flag ``target`` (an instance or a queryset) and every live row cascading
+    from it as deleted. Returns ``(total, {model label: rows})`` like
+    ``QuerySet.delete()``.
+    """
+    now = now or timezone.now()
+    if isinstance(target, models.Model):
+        model, pks = type(target), [target.pk]
+        target.is_deleted, target.deleted_at = True, now
+    else:
+        model, pks = target.model, list(target.values_list('pk', flat=True))
+    if not pks:
+        return 0, {}
+    return _cascade({model: models.Q(pk__in=pks)}, now)
+
+
+def cascade_orphans(now=None):
+    """Flag live rows whose parent was soft-deleted without cascading (before this module existed)."""
+    now = now or timezone.now()
+    selections = {}
+    for model, keys in cascade_plan():
+        if keys:
+            selections[model] = reduce(or_, [models.Q(**{f'{key}__is_deleted': True}) for key in keys])
+    return _cascade(selections, now)
+
+
+def purge_soft_deleted(retention_days=None, batch_size=1000, now=None):
+    """
+    Hard-delete rows soft-deleted more than ``retention_days`` ago, children
+    first and at most ``batch_size`` rows per transaction. Rows that still
+    have KEPT dependents stay soft-deleted. Returns ``{model label: rows}``,
+    including rows removed by database cascades.
+    """
+    retention_days = settings.SOFT_DELETE_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    purged = Counter()
+    for model, _ in reversed(cascade_plan()):
+        if model in KEPT:
+            continue
+        queryset = model._base_manager.filter(is_deleted=True, deleted_at__lt=cutoff).order_by('pk')
+        last_pk = 0
+        while True:
+            with transaction.atomic():
+                pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                last_pk = pks[-1]
+                held = set()
+                for path in kept_dependents(model):
+                    held.update(
+                        model._base_manager.filter(pk__in=pks, **{f'{path}__isnull': False}).values_list('pk', flat=True)
+                    )
+                _, deleted = model._base_manager.filter(pk__in=set(pks) - held).delete()
+            purged.update(deleted)
+    return dict(purged)
@@ -0,0 +1,55 @@
+# users/tasks.py
+# Minimal in-process background execution for work that should not hold a request open.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.BACKGROUND_TASK_WORKERS,
+                    thread_name_prefix='tasks'
+                )
+    return _executor
+
+
+def _run(fn, args, kwargs):
+    from .db_router import use_primary
+
+    try:
+        # Tasks follow the writes that queued them; a replica may not have those yet.
+        with use_primary():
+            return fn(*args, **kwargs)
+    except Exception as e:
+        print(f"Background task {fn.__name__} failed: {e}")
+    finally:
+        # Worker threads get their own DB connections; don't leak them.
+        connections.close_all()
+
+
+def enqueue(fn, *args, **kwargs):
+    """
+    Run ``fn(*args, **kwargs)`` on the background pool once the current
+    transaction commits. With BACKGROUND_TASKS_EAGER it runs inline instead.
+    """
+    if settings.BACKGROUND_TASKS_EAGER:
+        return fn(*args, **kwargs)
+    transaction.on_commit(lambda: _get_executor().submit(_run, fn, args, kwargs))
+
+
+def drain():
+    """Wait for every submitted task to finish; the next enqueue starts a fresh pool."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
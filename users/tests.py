@@ -1,12 +1,56 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
 from rest_framework.test import APIClient
 from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework.exceptions import ValidationError
+from rest_framework.throttling import UserRateThrottle
 from django.utils import timezone
 from rest_framework_simplejwt.tokens import RefreshToken
-from .models import User, Property, Room, Booking, PropertyMedia, Location, SupportTicket, Notification
+from .models import (
+    User, Property, Room, Booking, PropertyMedia, Location, SupportTicket, Notification, DeviceToken,
+    Message, NotificationArchive, MessageArchive, ChatSession, ChatTurn, Amenity, PropertyAmenity,
+    Favorite, Review, CatalogueEntry, Payment, BookingInquiry, MaintenanceRequest, Manager, City, Region,
+    PaymentEvent
+)
+from .fcm_utils import send_multicast, send_fcm_notification
+from .notifications import digest_window, get_preferences, notify, resolve_segment
+from .retention import archive_notifications, archive_messages
+from . import chatbot
+from .intent_classifier import extract_property_name, local_intent
+from . import name_index
+from .transcripts import TranscriptWriter
+from . import search_index
+from django.core.cache import cache
+from django.test.utils import CaptureQueriesContext
+from django.db import DatabaseError, IntegrityError, connection, connections, transaction
+from django.http import HttpResponse
+from django.db.backends.signals import connection_created
+from .amenities import rebuild_amenity_masks
+from . import autocomplete
+from . import db_router
+from . import db_connections
+from .soft_delete import cascade_plan, purge_soft_deleted, soft_delete
+from .aggregates import reconcile_aggregates
+from .query_budget import QueryBudgetMiddleware, query_stats, reset_query_stats, router_endpoints
+from .places import assign_places
+from . import payments
+from . import webhooks
+from .views import BookingViewSet
+from .urls import router
+from django.urls import reverse
+from .management.commands._stubs import fake_dialogflow_server, fake_stripe_server
 from .serializers import UserSerializer
+from django.apps import apps
+from django.conf import settings
+from google.api_core import exceptions as google_exceptions
+import asyncio
 import datetime
+from importlib import import_module
+import json
+import time
 
 class BookingTests(TestCase):
     def setUp(self):
@@ -102,6 +146,21 @@ class BookingTests(TestCase):
     def test_property_creation(self):
         self.assertEqual(self.property.property_name, 'Dar Property 1')
 
+    def test_bookings_list_newest_first_with_ties_broken_by_id(self):
+        start = self.booking.start_date
+        later = [
+            Booking.objects.create(
+                user=self.tenant, property=prop, start_date=start, end_date=start + datetime.timedelta(days=2),
+                rental_type='short-term', total_price=200, status='Pending'
+            )
+            for prop in (self.property_expensive, self.property_nairobi)
+        ]
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.tenant_token}')
+        response = self.client.get('/api/v1/bookings/')
+        self.assertEqual(
+            [item['id'] for item in response.data['results']], [later[1].pk, later[0].pk, self.booking.pk]
+        )
+
     def test_property_media_upload(self):
         media = PropertyMedia.objects.create(property=self.property, file='test.jpg', media_type='image')
         self.assertEqual(media.media_type, 'image')
@@ -320,4 +379,1872 @@ class BookingTests(TestCase):
         self.assertEqual(response.status_code, 201)
         self.assertEqual(Notification.objects.filter(user=self.tenant).count(), 1)
         notification = Notification.objects.get(user=self.tenant, notification_type='Alert')
-        self.assertEqual(notification.message, 'FCM Notification Test')
\ No newline at end of file
+        self.assertEqual(notification.message, 'FCM Notification Test')
+
+class PushDeliveryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant = User.objects.create_user(
+            username='pushtenant',
+            name='Push Tenant',
+            email='push@example.com',
+            phone_number='+255712345681',
+            password='Test1234',
+            role='tenant'
+        )
+        self.token = str(RefreshToken.for_user(self.tenant).access_token)
+
+    def test_update_fcm_token_registers_devices(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        for token, platform in [('phone-token', 'android'), ('tablet-token', 'ios')]:
+            response = self.client.post(
+                f'/api/v1/users/{self.tenant.id}/update_fcm_token/',
+                {'fcm_token': token, 'platform': platform},
+                format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(self.tenant.device_tokens.values_list('token', flat=True)),
+            {'phone-token', 'tablet-token'}
+        )
+
+    @override_settings(FCM_MULTICAST_BATCH_SIZE=2)
+    def test_multicast_batches_and_prunes_invalid_tokens(self):
+        for i in range(5):
+            DeviceToken.register(self.tenant, f'token-{i}')
+        sent = []
+
+        def fake_send(tokens, title, body, data=None):
+            sent.append(list(tokens))
+            return [{'error': 'NotRegistered'} if t == 'token-3' else {'message_id': t} for t in tokens]
+
+        with mock.patch('users.fcm_utils._send_batch', side_effect=fake_send):
+            stats = send_multicast(DeviceToken.objects.values_list('token', flat=True), 'Title', 'Body')
+        self.assertEqual(sorted(len(batch) for batch in sent), [1, 2, 2])
+        self.assertEqual(stats['success'], 4)
+        self.assertEqual(stats['invalid_tokens'], ['token-3'])
+        self.assertFalse(DeviceToken.objects.filter(token='token-3').exists())
+
+    def test_send_without_devices_skips_provider(self):
+        with mock.patch('users.fcm_utils._send_batch') as fake_send:
+            self.assertFalse(send_fcm_notification(self.tenant, 'Title', 'Body'))
+        fake_send.assert_not_called()
+
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='fanoutadmin', name='Admin', email='fanoutadmin@example.com',
+            phone_number='+255712345690', password='Test1234', role='admin'
+        )
+        self.landlord = User.objects.create_user(
+            username='fanoutlandlord', name='Landlord', email='fanoutlandlord@example.com',
+            phone_number='+255712345691', password='Test1234', role='landlord'
+        )
+        self.other_landlord = User.objects.create_user(
+            username='otherlandlord', name='Other', email='otherlandlord@example.com',
+            phone_number='+255712345692', password='Test1234', role='landlord'
+        )
+        self.tenants = [
+            User.objects.create_user(
+                username=f'fanouttenant{i}', name=f'Tenant {i}', email=f'fanouttenant{i}@example.com',
+                phone_number=f'+25571234570{i}', password='Test1234', role='tenant'
+            )
+            for i in range(3)
+        ]
+        self.location = Location.objects.create(
+            city='Arusha', address='1 Clock Tower', country='Tanzania', postal_code='23100'
+        )
+        self.property = Property.objects.create(
+            owner=self.landlord, location=self.location, property_name='Fan-out House',
+            property_type='House', rental_type='long-term', price_per_month=500, is_multi_room=True
+        )
+        today = datetime.date.today()
+        for i, tenant in enumerate(self.tenants[:2]):
+            room = Room.objects.create(property=self.property, room_number=str(i))
+            booking = Booking.objects.create(
+                user=tenant, property=self.property, room=room, rental_type='long-term', monthly_rent=500,
+                start_date=today - datetime.timedelta(days=10), end_date=today + datetime.timedelta(days=20)
+            )
+            booking.status = 'Confirmed'
+            booking.save()
+
+    def broadcast(self, user, payload):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        return self.client.post('/api/v1/notifications/broadcast/', payload, format='json')
+
+    @override_settings(NOTIFICATION_FANOUT_CHUNK_SIZE=2)
+    def test_admin_broadcast_to_role(self):
+        with mock.patch('users.notifications.send_notification_to_users') as fake_push:
+            response = self.broadcast(self.admin, {
+                'segment': 'role', 'value': 'tenant', 'notification_type': 'Alert', 'message': 'Water outage'
+            })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['recipients'], 3)
+        self.assertEqual(Notification.objects.filter(message='Water outage').count(), 3)
+        self.assertEqual(fake_push.call_count, 2)
+
+    def test_landlord_broadcast_to_current_tenants(self):
+        response = self.broadcast(self.landlord, {
+            'segment': 'property_tenants', 'value': str(self.property.id),
+            'notification_type': 'Reminder', 'message': 'Rent is due'
+        })
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            set(Notification.objects.filter(message='Rent is due').values_list('user', flat=True)),
+            {self.tenants[0].id, self.tenants[1].id}
+        )
+
+    def test_landlord_cannot_broadcast_to_other_property(self):
+        response = self.broadcast(self.other_landlord, {
+            'segment': 'property_tenants', 'value': str(self.property.id),
+            'notification_type': 'Alert', 'message': 'Not yours'
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Notification.objects.filter(message='Not yours').exists())
+
+class NotificationDigestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.landlord = User.objects.create_user(
+            username='digestlandlord', name='Landlord', email='digest@example.com',
+            phone_number='+255712345693', password='Test1234', role='landlord'
+        )
+
+    def test_same_type_notifications_coalesce_into_one_push(self):
+        with mock.patch('users.notifications.send_notification_to_users') as fake_push:
+            first, created = notify(self.landlord, 'Message', 'Inquiry 1')
+            second, coalesced_created = notify(self.landlord, 'Message', 'Inquiry 2')
+            notify(self.landlord, 'Alert', 'Maintenance 1')
+        self.assertTrue(created)
+        self.assertFalse(coalesced_created)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.count, 2)
+        self.assertEqual(second.message, 'Inquiry 2')
+        self.assertEqual(Notification.objects.filter(user=self.landlord).count(), 2)
+        self.assertEqual(fake_push.call_count, 2)
+
+    def test_read_or_expired_digest_starts_a_new_row(self):
+        first, _ = notify(self.landlord, 'Message', 'Inquiry 1')
+        Notification.objects.filter(pk=first.pk).update(read_status='Read')
+        second, created = notify(self.landlord, 'Message', 'Inquiry 2')
+        self.assertTrue(created)
+        Notification.objects.filter(pk=second.pk).update(sent_at=timezone.now() - datetime.timedelta(hours=1))
+        _, created = notify(self.landlord, 'Message', 'Inquiry 3')
+        self.assertTrue(created)
+
+    def test_preferences_can_disable_digests(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.landlord).access_token}')
+        response = self.client.patch('/api/v1/notifications/preferences/', {'digest_enabled': False}, format='json')
+        self.assertEqual(response.status_code, 200)
+        notify(self.landlord, 'Message', 'Inquiry 1')
+        notify(self.landlord, 'Message', 'Inquiry 2')
+        self.assertEqual(Notification.objects.filter(user=self.landlord).count(), 2)
+
+    @override_settings(NOTIFICATION_DIGEST_WINDOW_MINUTES=0)
+    def test_default_window_of_zero_is_stored_as_disabled(self):
+        preference = get_preferences(self.landlord)
+        preference.full_clean()
+        self.assertFalse(preference.digest_enabled)
+        self.assertEqual(preference.digest_window_minutes, 1)
+        self.assertIsNone(digest_window(self.landlord))
+
+class HistoryArchiveTests(TestCase):
+    def setUp(self):
+        self.tenant = User.objects.create_user(
+            username='archivetenant', name='Tenant', email='archive@example.com',
+            phone_number='+255712345694', password='Test1234', role='tenant'
+        )
+        self.admin = User.objects.create_user(
+            username='archiveadmin', name='Admin', email='archiveadmin@example.com',
+            phone_number='+255712345695', password='Test1234', role='admin'
+        )
+
+    def test_archive_moves_aged_and_soft_deleted_rows(self):
+        recent = Notification.objects.create(user=self.tenant, notification_type='Alert', message='Recent')
+        aged = Notification.objects.create(user=self.tenant, notification_type='Alert', message='Aged')
+        Notification.objects.filter(pk=aged.pk).update(sent_at=timezone.now() - datetime.timedelta(days=400))
+        deleted = Notification.objects.create(user=self.tenant, notification_type='Alert', message='Deleted')
+        deleted.delete()
+        old_message = Message.objects.create(sender=self.tenant, receiver=self.admin, content='Old')
+        Message.objects.filter(pk=old_message.pk).update(sent_at=timezone.now() - datetime.timedelta(days=400))
+        live_message = Message.objects.create(sender=self.tenant, receiver=self.admin, content='Live')
+
+        call_command('archive_history', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(list(Notification._base_manager.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(
+            set(NotificationArchive.objects.values_list('pk', flat=True)), {aged.pk, deleted.pk}
+        )
+        self.assertTrue(NotificationArchive.objects.get(pk=deleted.pk).is_deleted)
+        self.assertEqual(list(Message._base_manager.values_list('pk', flat=True)), [live_message.pk])
+        self.assertEqual(MessageArchive.objects.get().content, 'Old')
+
+    def test_archive_is_idempotent(self):
+        self.assertEqual(archive_notifications(), 0)
+        self.assertEqual(archive_messages(), 0)
+
+class ReadStateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.tenant = User.objects.create_user(
+            username='readtenant', name='Tenant', email='read@example.com',
+            phone_number='+255712345696', password='Test1234', role='tenant'
+        )
+        self.landlord = User.objects.create_user(
+            username='readlandlord', name='Landlord', email='readlandlord@example.com',
+            phone_number='+255712345697', password='Test1234', role='landlord'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.tenant).access_token}')
+
+    @override_settings(READ_STATE_BATCH_SIZE=2)
+    def test_mark_conversation_read_up_to_message(self):
+        messages = [
+            Message.objects.create(sender=self.landlord, receiver=self.tenant, content=f'Hi {i}') for i in range(5)
+        ]
+        sent = Message.objects.create(sender=self.tenant, receiver=self.landlord, content='Reply')
+        response = self.client.post(
+            '/api/v1/messages/mark_conversation_read/',
+            {'user': self.landlord.id, 'up_to': messages[3].id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 4)
+        self.assertEqual(
+            list(Message.objects.filter(receiver=self.tenant, read_status='Unread').values_list('pk', flat=True)),
+            [messages[4].pk]
+        )
+        sent.refresh_from_db()
+        self.assertEqual(sent.read_status, 'Unread')
+
+    def test_mark_all_read_before_timestamp(self):
+        older = Notification.objects.create(user=self.tenant, notification_type='Alert', message='Old')
+        Notification.objects.filter(pk=older.pk).update(sent_at=timezone.now() - datetime.timedelta(days=1))
+        newer = Notification.objects.create(user=self.tenant, notification_type='Alert', message='New')
+        other = Notification.objects.create(user=self.landlord, notification_type='Alert', message='Not mine')
+        before = (timezone.now() - datetime.timedelta(hours=1)).isoformat()
+        response = self.client.post('/api/v1/notifications/mark_all_read/', {'before': before}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 1)
+        statuses = dict(Notification.objects.values_list('pk', 'read_status'))
+        self.assertEqual(statuses, {older.pk: 'Read', newer.pk: 'Unread', other.pk: 'Unread'})
+
+    def test_mark_all_read_rejects_bad_timestamp(self):
+        response = self.client.post('/api/v1/notifications/mark_all_read/', {'before': 'yesterday'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+class ChatbotClientTests(TestCase):
+    def setUp(self):
+        self.tenant = User.objects.create_user(
+            username='chattenant', name='Tenant', email='chat@example.com',
+            phone_number='+255712345698', password='Test1234', role='tenant'
+        )
+        self.token = str(RefreshToken.for_user(self.tenant).access_token)
+        chatbot.reset_clients()
+        self.addCleanup(chatbot.reset_clients)
+        cache.clear()
+
+    @override_settings(DIALOGFLOW_EMULATOR_HOST='127.0.0.1:1', DIALOGFLOW_CHANNEL_POOL_SIZE=2)
+    def test_sessions_clients_are_pooled(self):
+        clients = [chatbot.get_sessions_client() for _ in range(4)]
+        self.assertIsNot(clients[0], clients[1])
+        self.assertIs(clients[0], clients[2])
+        self.assertIs(clients[1], clients[3])
+
+    def test_async_chat_endpoint(self):
+        with fake_dialogflow_server() as host, override_settings(DIALOGFLOW_EMULATOR_HOST=host):
+            response = self.client.post(
+                '/api/v1/users/chat/async/',
+                {'message': 'Check my booking status'},
+                content_type='application/json',
+                HTTP_AUTHORIZATION=f'Bearer {self.token}'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['response'], 'You have no bookings yet.')
+
+    def test_async_chat_requires_authentication(self):
+        response = self.client.post('/api/v1/users/chat/async/', {'message': 'Hi'}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_provider_errors_are_reported_as_bad_gateway_or_unavailable(self):
+        # Small talk is not classified locally, so it goes to Dialogflow.
+        for error, status in [
+            (google_exceptions.ServiceUnavailable('down'), 503), (google_exceptions.PermissionDenied('no'), 502)
+        ]:
+            client = mock.Mock(detect_intent=mock.Mock(side_effect=error))
+            async_client = mock.Mock(detect_intent=mock.AsyncMock(side_effect=error))
+            with mock.patch.object(chatbot, 'get_sessions_client', return_value=client), \
+                    mock.patch.object(chatbot, 'get_async_sessions_client', return_value=async_client):
+                for url in ['/api/v1/users/chat/', '/api/v1/users/chat/async/']:
+                    response = self.client.post(
+                        url, {'message': 'hello'}, content_type='application/json',
+                        HTTP_AUTHORIZATION=f'Bearer {self.token}'
+                    )
+                    self.assertEqual(response.status_code, status, url)
+                    self.assertIn('error', response.json())
+
+    def test_async_chat_is_throttled_like_the_sync_endpoint(self):
+        throttles = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_CLASSES': ['rest_framework.throttling.UserRateThrottle']}
+        # Throttle classes read their rates when they are defined.
+        with override_settings(REST_FRAMEWORK=throttles), \
+                mock.patch.object(UserRateThrottle, 'THROTTLE_RATES', {'user': '1/minute'}), \
+                mock.patch('users.views.handle_chatbot_request_async', return_value='Hi there'):
+            statuses = [
+                self.client.post(
+                    '/api/v1/users/chat/async/', {'message': 'hello'}, content_type='application/json',
+                    HTTP_AUTHORIZATION=f'Bearer {self.token}'
+                ).status_code
+                for _ in range(2)
+            ]
+        self.assertEqual(statuses, [200, 429])
+
+class LocalIntentTests(TestCase):
+    def test_confident_messages_are_classified_locally(self):
+        self.assertEqual(local_intent('is my booking confirmed yet?'), ('', 'CheckBookingStatus', None))
+        self.assertEqual(local_intent('Tell me about Sunset Villa'), ('', 'PropertyDetails', 'Sunset Villa'))
+
+    def test_small_talk_and_unknown_messages_go_to_dialogflow(self):
+        for text in ['hello', 'who won the match yesterday', '']:
+            self.assertIsNone(local_intent(text))
+
+    def test_property_names_are_only_taken_from_leading_phrasings(self):
+        self.assertEqual(extract_property_name("what's the price of Ocean View Apartment?"), 'Ocean View Apartment')
+        self.assertEqual(extract_property_name('how much does Oyster Bay Suite cost per night'), 'Oyster Bay Suite')
+        for text in ['is there wifi at Sunset Villa', 'tell me about the booking i made', 'what about it']:
+            self.assertIsNone(extract_property_name(text))
+            self.assertIsNone(local_intent(text))
+
+    @override_settings(CHATBOT_LOCAL_INTENTS=False)
+    def test_fast_path_can_be_disabled(self):
+        self.assertIsNone(local_intent('Check my booking status'))
+
+    def test_local_hit_skips_dialogflow(self):
+        tenant = User.objects.create_user(
+            username='localintent', name='Tenant', email='localintent@example.com',
+            phone_number='+255712345699', password='Test1234', role='tenant'
+        )
+        with mock.patch('users.chatbot.detect_intent') as remote:
+            response = chatbot.handle_chatbot_request(tenant, 'Show me available properties')
+        remote.assert_not_called()
+        self.assertEqual(response, 'No available properties found.')
+
+class PropertyNameIndexTests(TestCase):
+    def setUp(self):
+        name_index.reset_index()
+        self.addCleanup(name_index.reset_index)
+        self.landlord = User.objects.create_user(
+            username='nameindexowner', name='Landlord', email='nameindex@example.com',
+            phone_number='+255712345703', password='Test1234', role='landlord'
+        )
+        self.location = Location.objects.create(
+            address='1 Ocean Rd', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='11101'
+        )
+        self.villa = self.create_property('Sunset Villa Masaki')
+        self.create_property('Ocean View Apartments')
+
+    def create_property(self, name):
+        return Property.objects.create(
+            owner=self.landlord, location=self.location, property_name=name, property_type='Villa',
+            rental_type='long-term', description='Test', price_per_month=800
+        )
+
+    def test_typos_and_partial_names_match(self):
+        for query in ['Sunset Vila', 'sunet villa masaki', 'sunset']:
+            matches = name_index.search_property_names(query)
+            self.assertEqual(matches[0][0], self.villa.id, query)
+        self.assertEqual(name_index.search_property_names('Kariakoo Towers'), [])
+
+    def test_index_follows_property_changes(self):
+        name_index.get_index()
+        self.villa.property_name = 'Palm Court'
+        self.villa.save()
+        self.assertEqual(name_index.search_property_names('palm court')[0][0], self.villa.id)
+        self.assertEqual(name_index.search_property_names('sunset villa'), [])
+        new = self.create_property('Coral Gardens')
+        self.assertEqual(name_index.search_property_names('coral garden')[0][0], new.id)
+        new.is_deleted = True
+        new.save()
+        self.assertEqual(name_index.search_property_names('coral garden'), [])
+
+    def test_chatbot_property_details_uses_fuzzy_match(self):
+        tenant = User.objects.create_user(
+            username='nameindextenant', name='Tenant', email='nameindextenant@example.com',
+            phone_number='+255712345704', password='Test1234', role='tenant'
+        )
+        response = chatbot.respond_to_intent(tenant, 'Tell me about sunset vila', '', 'PropertyDetails', 'sunset vila')
+        self.assertEqual(response, 'Sunset Villa Masaki is Available. Price: $800.00/month.')
+
+    def test_name_search_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(user=self.landlord)
+        response = client.get('/api/v1/properties/name_search/', {'q': 'ocean veiw'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['property_name'], 'Ocean View Apartments')
+        self.assertEqual(client.get('/api/v1/properties/name_search/').status_code, 400)
+
+class ChatTranscriptTests(TestCase):
+    def setUp(self):
+        self.tenant = User.objects.create_user(
+            username='transcripttenant', name='Tenant', email='transcript@example.com',
+            phone_number='+255712345705', password='Test1234', role='tenant'
+        )
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.tenant)
+
+    def test_chat_turns_stay_out_of_the_inbox(self):
+        response = self.client.post('/api/v1/users/chat/', {'message': 'Check my booking status'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Message.objects.exists())
+        history = self.client.get('/api/v1/users/chat_history/')
+        self.assertEqual(history.status_code, 200)
+        self.assertEqual(len(history.data['turns']), 1)
+        turn = history.data['turns'][0]
+        self.assertEqual(turn['message'], 'Check my booking status')
+        self.assertEqual(turn['response'], 'You have no bookings yet.')
+        self.assertEqual(turn['intent_name'], 'CheckBookingStatus')
+
+    @override_settings(BACKGROUND_TASKS_EAGER=False)
+    def test_turns_are_written_in_batches(self):
+        writer = TranscriptWriter(batch_size=3, flush_interval=3600)
+        with mock.patch.object(writer, '_ensure_thread'):
+            writer.record(self.tenant, 'one', 'a')
+            writer.record(self.tenant, 'two', 'b')
+            self.assertEqual(ChatTurn.objects.count(), 0)
+            writer.record(self.tenant, 'three', 'c')
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(list(ChatTurn.objects.order_by('id').values_list('message', flat=True)), ['one', 'two', 'three'])
+        self.assertEqual(ChatSession.objects.filter(user=self.tenant).count(), 1)
+
+    def test_idle_gap_starts_a_new_session(self):
+        writer = TranscriptWriter()
+        writer.record(self.tenant, 'first', 'a')
+        ChatSession.objects.update(last_activity=timezone.now() - datetime.timedelta(hours=2))
+        writer.record(self.tenant, 'second', 'b')
+        writer.record(self.tenant, 'third', 'c')
+        sessions = ChatSession.objects.filter(user=self.tenant).order_by('id')
+        self.assertEqual([s.turns.count() for s in sessions], [1, 2])
+
+    def test_turns_continue_the_latest_session_only(self):
+        writer = TranscriptWriter()
+        writer.record(self.tenant, 'first', 'a')
+        ChatSession.objects.update(last_activity=timezone.now() - datetime.timedelta(hours=2))
+        writer.record(self.tenant, 'second', 'b')
+        with self.assertNumQueries(5):
+            # One query for the user's latest session, then the update and insert in a savepoint.
+            writer.record(self.tenant, 'third', 'c')
+        latest = ChatSession.objects.filter(user=self.tenant).order_by('-last_activity').first()
+        self.assertEqual(latest.turns.count(), 2)
+
+    def test_unwritable_turns_are_dropped_without_blocking_the_rest(self):
+        writer = TranscriptWriter(batch_size=10)
+        write = writer._write
+
+        def write_checking_users(turns):
+            # SQLite only checks foreign keys at commit, which a test never reaches.
+            if not all(User._base_manager.filter(pk=turn[0]).exists() for turn in turns):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return write(turns)
+
+        with mock.patch.object(writer, '_ensure_thread'), \
+                mock.patch.object(writer, '_write', side_effect=write_checking_users), \
+                override_settings(BACKGROUND_TASKS_EAGER=False):
+            writer.record(User(pk=999999), 'purged', 'a')
+            writer.record(self.tenant, 'kept', 'b')
+            self.assertEqual(writer.flush(), 1)
+        self.assertEqual(len(writer), 0)
+        self.assertEqual(list(ChatTurn.objects.values_list('message', flat=True)), ['kept'])
+
+    def test_inline_flush_errors_do_not_reach_the_chat_response(self):
+        writer = TranscriptWriter()
+        with mock.patch.object(writer, '_write', side_effect=DatabaseError('database is down')):
+            writer.record(self.tenant, 'one', 'a')
+        self.assertEqual(len(writer), 1)
+
+class ChatbotIntentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        # Transcript writes are not what these tests count.
+        patcher = mock.patch('users.chatbot.record_turn')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.landlord = User.objects.create_user(
+            username='intentcachelandlord', name='Landlord', email='intentcachelandlord@example.com',
+            phone_number='+255712345706', password='Test1234', role='landlord'
+        )
+        self.tenant = User.objects.create_user(
+            username='intentcachetenant', name='Tenant', email='intentcachetenant@example.com',
+            phone_number='+255712345707', password='Test1234', role='tenant'
+        )
+        self.property = Property.objects.create(
+            owner=self.landlord, property_name='Cache House', property_type='House',
+            rental_type='long-term', description='Test', price_per_month=600
+        )
+
+    def ask(self, intent_name):
+        return chatbot.respond_to_intent(self.tenant, 'question', '', intent_name, None)
+
+    def test_global_answers_are_shared(self):
+        self.assertEqual(self.ask('ListProperties'), 'Here are some available properties: Cache House')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.ask('ListProperties'), 'Here are some available properties: Cache House')
+
+    def test_booking_status_is_invalidated_by_booking_changes(self):
+        self.assertEqual(self.ask('CheckBookingStatus'), 'You have no bookings yet.')
+        with self.assertNumQueries(0):
+            self.ask('CheckBookingStatus')
+        today = timezone.now().date()
+        booking = Booking.objects.create(
+            user=self.tenant, property=self.property, start_date=today,
+            end_date=today + datetime.timedelta(days=30), rental_type='long-term', monthly_rent=600
+        )
+        self.assertEqual(self.ask('CheckBookingStatus'), 'Your latest booking for Cache House is Pending.')
+        booking.status = 'Confirmed'
+        booking.save()
+        self.assertEqual(self.ask('CheckBookingStatus'), 'Your latest booking for Cache House is Confirmed.')
+
+    def test_booking_status_is_invalidated_by_a_property_rename(self):
+        today = timezone.now().date()
+        Booking.objects.create(
+            user=self.tenant, property=self.property, start_date=today,
+            end_date=today + datetime.timedelta(days=30), rental_type='long-term', monthly_rent=600
+        )
+        self.assertEqual(self.ask('CheckBookingStatus'), 'Your latest booking for Cache House is Pending.')
+        self.property.property_name = 'Cache Villa'
+        self.property.save()
+        self.assertEqual(self.ask('CheckBookingStatus'), 'Your latest booking for Cache Villa is Pending.')
+
+    def test_property_details_are_invalidated_by_property_changes(self):
+        name_index.reset_index()
+        self.addCleanup(name_index.reset_index)
+        ask = lambda: chatbot.respond_to_intent(self.tenant, 'q', '', 'PropertyDetails', 'cache house')
+        self.assertEqual(ask(), 'Cache House is Available. Price: $600.00/month.')
+        self.property.availability_status = 'Rented'
+        self.property.save()
+        self.assertEqual(ask(), 'Cache House is Rented. Price: $600.00/month.')
+
+    @override_settings(CHATBOT_INTENT_CACHE=False)
+    def test_cache_can_be_disabled(self):
+        self.ask('ListProperties')
+        with self.assertNumQueries(1):
+            self.ask('ListProperties')
+
+class PropertySearchTests(TestCase):
+    def setUp(self):
+        search_index.reset_index()
+        self.addCleanup(search_index.reset_index)
+        self.landlord = User.objects.create_user(
+            username='searchlandlord', name='Landlord', email='searchlandlord@example.com',
+            phone_number='+255712345708', password='Test1234', role='landlord'
+        )
+        other = User.objects.create_user(
+            username='searchother', name='Other', email='searchother@example.com',
+            phone_number='+255712345709', password='Test1234', role='landlord'
+        )
+        self.location = Location.objects.create(
+            address='1 Toure Dr', city='Dar es Salaam', region='Masaki', country='Tanzania', postal_code='14111'
+        )
+        self.pool = Amenity.objects.create(name='Swimming Pool')
+        self.flat = self.create_property(self.landlord, 'Ocean View Apartments', 'Sea-facing flat with a balcony')
+        self.house = self.create_property(self.landlord, 'Garden House', 'Quiet house a short walk from the ocean')
+        self.create_property(other, 'Ocean Breeze', 'Another landlord')
+        PropertyAmenity.objects.create(property=self.flat, amenity=self.pool)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.landlord)
+
+    def create_property(self, owner, name, description):
+        return Property.objects.create(
+            owner=owner, location=self.location, property_name=name, property_type='Apartment',
+            rental_type='long-term', description=description, price_per_month=700
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/v1/properties/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['property_name'] for item in response.data['results']]
+
+    def test_results_are_ranked_and_scoped_to_owner(self):
+        self.assertEqual(self.search('ocean'), ['Ocean View Apartments', 'Garden House'])
+
+    def test_city_region_amenities_and_prefixes_are_searchable(self):
+        self.assertEqual(self.search('swimming pool'), ['Ocean View Apartments'])
+        self.assertEqual(sorted(self.search('masaki')), ['Garden House', 'Ocean View Apartments'])
+        self.assertEqual(self.search('apart'), ['Ocean View Apartments'])
+
+    def test_truncated_results_are_reported(self):
+        self.assertFalse(self.client.get('/api/v1/properties/', {'search': 'ocean'}).data['search_truncated'])
+        with override_settings(PROPERTY_SEARCH_MAX_RESULTS=1):
+            response = self.client.get('/api/v1/properties/', {'search': 'ocean'})
+        self.assertEqual([item['property_name'] for item in response.data['results']], ['Ocean View Apartments'])
+        self.assertTrue(response.data['search_truncated'])
+        self.assertNotIn('search_truncated', self.client.get('/api/v1/properties/').data)
+
+    def test_matches_are_ranked_within_the_other_filters(self):
+        parking = Amenity.objects.create(name='Parking')
+        PropertyAmenity.objects.create(property=self.house, amenity=parking)
+        # More matches than the cap, and the filter keeps only the lower-ranked one.
+        with override_settings(PROPERTY_SEARCH_MAX_RESULTS=1):
+            response = self.client.get('/api/v1/properties/', {'search': 'ocean', 'amenities': 'Parking'})
+        self.assertEqual([item['property_name'] for item in response.data['results']], ['Garden House'])
+        self.assertFalse(response.data['search_truncated'])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search('ocean pool'), ['Ocean View Apartments'])
+        self.assertEqual(self.search('ocean sauna'), [])
+
+    def test_index_follows_related_changes(self):
+        search_index.get_index()
+        PropertyAmenity.objects.create(property=self.house, amenity=self.pool)
+        self.assertEqual(sorted(self.search('pool')), ['Garden House', 'Ocean View Apartments'])
+        self.location.region = 'Oysterbay'
+        self.location.save()
+        self.assertEqual(self.search('masaki'), [])
+        self.assertEqual(len(self.search('oysterbay')), 2)
+        self.flat.is_deleted = True
+        self.flat.save()
+        self.assertEqual(self.search('pool'), ['Garden House'])
+
+    def test_compaction_keeps_live_documents(self):
+        index = search_index.SearchIndex()
+        for pk in range(1500):
+            index.add(pk, 1, search_index.document(f'Unit {pk}', 'quiet' if pk % 2 else 'busy'))
+        for pk in range(1100):
+            index.remove(pk)
+        self.assertEqual(len(index), 400)
+        self.assertLess(len(index._ids), 1500)
+        self.assertEqual(sorted(pk for pk, _ in index.search('quiet', limit=1000)), list(range(1101, 1500, 2)))
+        self.assertEqual([pk for pk, _ in index.search('1499')], [1499])
+
+class PropertyFacetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.landlord = User.objects.create_user(
+            username='facetlandlord', name='Landlord', email='facetlandlord@example.com',
+            phone_number='+255712345710', password='Test1234', role='landlord'
+        )
+        dar = Location.objects.create(
+            address='1 Ali Hassan Mwinyi Rd', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+            postal_code='14111', latitude=-6.7924, longitude=39.2083
+        )
+        arusha = Location.objects.create(
+            address='2 Sokoine Rd', city='Arusha', region='Arusha', country='Tanzania', postal_code='23101'
+        )
+        for location, property_type, status in [
+            (dar, 'Apartment', 'Available'), (dar, 'Apartment', 'Rented'), (dar, 'Villa', 'Available'),
+            (arusha, 'Apartment', 'Available'),
+        ]:
+            Property.objects.create(
+                owner=self.landlord, location=location, property_name=f'{property_type} in {location.city}',
+                property_type=property_type, rental_type='long-term', description='Test', price_per_month=500,
+                availability_status=status
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.landlord)
+
+    def test_list_returns_facets_for_the_current_filters(self):
+        response = self.client.get('/api/v1/properties/', {'facets': 'true'})
+        self.assertEqual(response.status_code, 200)
+        facets = response.data['facets']
+        self.assertEqual(facets['property_type'], {'Apartment': 3, 'Villa': 1})
+        self.assertEqual(facets['city'], {'Dar es Salaam': 3, 'Arusha': 1})
+        self.assertEqual(facets['availability_status'], {'Available': 3, 'Rented': 1})
+        self.assertEqual(facets['rental_type'], {'long-term': 4})
+
+        response = self.client.get('/api/v1/properties/', {'facets': 'true', 'property_type': 'Apartment'})
+        self.assertEqual(response.data['facets']['city'], {'Dar es Salaam': 2, 'Arusha': 1})
+        self.assertNotIn('facets', self.client.get('/api/v1/properties/').data)
+
+    def test_facets_take_one_grouped_query_and_are_cached(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/properties/', {'facets': 'true'})
+        self.assertEqual(len([q for q in queries if 'GROUP BY' in q['sql']]), 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/properties/', {'facets': 'true', 'page': 1})
+        self.assertFalse([q for q in queries if 'GROUP BY' in q['sql']])
+
+    def test_cached_facets_are_retired_by_a_property_write(self):
+        self.client.get('/api/v1/properties/', {'facets': 'true'})
+        villa = Property.objects.get(property_type='Villa')
+        villa.availability_status = 'Rented'
+        villa.save()
+        response = self.client.get('/api/v1/properties/', {'facets': 'true'})
+        self.assertEqual(response.data['facets']['availability_status'], {'Available': 2, 'Rented': 2})
+
+    def test_nearby_returns_facets(self):
+        response = self.client.get('/api/v1/properties/nearby/', {
+            'latitude': -6.7924, 'longitude': 39.2083, 'radius': 5, 'facets': 'true'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['facets']['property_type'], {'Apartment': 2, 'Villa': 1})
+
+class AmenityMaskTests(TestCase):
+    def setUp(self):
+        self.landlord = User.objects.create_user(
+            username='amenitylandlord', name='Landlord', email='amenitylandlord@example.com',
+            phone_number='+255712345711', password='Test1234', role='landlord'
+        )
+        location = Location.objects.create(
+            address='1 Ali Hassan Mwinyi Rd', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+            postal_code='14111', latitude=-6.7924, longitude=39.2083
+        )
+        self.wifi, self.parking, self.pool = [
+            Amenity.objects.create(name=name) for name in ['Wi-Fi', 'Parking', 'Swimming Pool']
+        ]
+        self.properties = {}
+        for name, amenities in [('Both', [self.wifi, self.parking]), ('All', [self.wifi, self.parking, self.pool]),
+                                ('Wifi', [self.wifi]), ('None', [])]:
+            prop = Property.objects.create(
+                owner=self.landlord, location=location, property_name=name, property_type='Apartment',
+                rental_type='long-term', description='Test', price_per_month=500
+            )
+            for amenity in amenities:
+                PropertyAmenity.objects.create(property=prop, amenity=amenity)
+            self.properties[name] = prop
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.landlord)
+
+    def names(self, response):
+        return sorted(item['property_name'] for item in response.data['results'])
+
+    def test_amenities_get_distinct_bits_and_masks_follow_links(self):
+        self.assertEqual(len({self.wifi.bit, self.parking.bit, self.pool.bit}), 3)
+        both = Property.objects.get(pk=self.properties['Both'].pk)
+        self.assertEqual(both.amenity_mask, (1 << self.wifi.bit) | (1 << self.parking.bit))
+        PropertyAmenity.objects.get(property=both, amenity=self.wifi).delete()
+        both.refresh_from_db()
+        self.assertEqual(both.amenity_mask, 1 << self.parking.bit)
+
+    def test_list_filters_by_all_requested_amenities(self):
+        response = self.client.get('/api/v1/properties/', {'amenities': 'wi-fi,Parking'})
+        self.assertEqual(self.names(response), ['All', 'Both'])
+        response = self.client.get('/api/v1/properties/', {'amenities': f'{self.pool.id}'})
+        self.assertEqual(self.names(response), ['All'])
+        response = self.client.get('/api/v1/properties/', {'amenities': 'Wi-Fi,Sauna'})
+        self.assertEqual(self.names(response), [])
+
+    def test_nearby_filters_by_amenities(self):
+        response = self.client.get('/api/v1/properties/nearby/', {
+            'latitude': -6.7924, 'longitude': 39.2083, 'radius': 5, 'amenities': 'Wi-Fi'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), ['All', 'Both', 'Wifi'])
+
+    def test_deleted_amenity_frees_its_bit(self):
+        bit = self.pool.bit
+        self.pool.delete()
+        self.assertFalse(Property.objects.filter(amenity_mask__gte=1 << bit).exists())
+        self.assertEqual(Amenity.objects.create(name='Gym').bit, bit)
+
+    def test_amenity_picks_again_when_a_concurrent_create_took_its_bit(self):
+        free_bit = Amenity.free_bit
+        # The first pick is a bit another request committed after this one looked.
+        with mock.patch.object(Amenity, 'free_bit', side_effect=[self.wifi.bit, free_bit()]):
+            gym = Amenity.objects.create(name='Gym')
+        self.assertNotIn(gym.bit, {self.wifi.bit, self.parking.bit, self.pool.bit})
+        with self.assertRaises(IntegrityError):
+            Amenity.objects.create(name='Gym')
+
+    def test_rebuild_repairs_bulk_created_links(self):
+        target = self.properties['None']
+        PropertyAmenity.objects.bulk_create([PropertyAmenity(property=target, amenity=self.pool)])
+        self.assertEqual(rebuild_amenity_masks(), 1)
+        target.refresh_from_db()
+        self.assertEqual(target.amenity_mask, 1 << self.pool.bit)
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete.reset_index()
+        self.addCleanup(autocomplete.reset_index)
+        self.landlord = User.objects.create_user(
+            username='suggestlandlord', name='Landlord', email='suggestlandlord@example.com',
+            phone_number='+255712345712', password='Test1234', role='landlord'
+        )
+        self.tenant = User.objects.create_user(
+            username='suggesttenant', name='Tenant', email='suggesttenant@example.com',
+            phone_number='+255712345713', password='Test1234', role='tenant'
+        )
+        self.dar = Location.objects.create(
+            address='1 Ocean Rd', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania', postal_code='11101'
+        )
+        self.arusha = Location.objects.create(
+            address='2 Sokoine Rd', city='Arusha', region='Arusha', country='Tanzania', postal_code='23101'
+        )
+        self.masaki = self.create_property('Masaki Heights', self.dar)
+        self.mango = self.create_property('Mango Court', self.dar)
+        self.create_property('Arusha Lodge', self.arusha)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.tenant)
+
+    def create_property(self, name, location):
+        return Property.objects.create(
+            owner=self.landlord, location=location, property_name=name, property_type='Apartment',
+            rental_type='long-term', description='Test', price_per_month=800
+        )
+
+    def suggest(self, q, **params):
+        response = self.client.get('/api/v1/properties/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [(item['kind'], item['text']) for item in response.data]
+
+    def test_prefixes_of_any_word_match_names_and_places(self):
+        self.assertEqual(self.suggest('ar'), [('city', 'Arusha'), ('region', 'Arusha'), ('property', 'Arusha Lodge')])
+        self.assertEqual(self.suggest('salaam', kinds='city'), [('city', 'Dar es Salaam')])
+        self.assertEqual(self.suggest('heig'), [('property', 'Masaki Heights')])
+        self.assertEqual(self.client.get('/api/v1/properties/autocomplete/', {'q': 'a', 'kinds': 'x'}).status_code, 400)
+
+    def test_popular_properties_rank_first(self):
+        self.assertEqual(self.suggest('ma', kinds='property'), [('property', 'Mango Court'), ('property', 'Masaki Heights')])
+        Favorite.objects.create(user=self.tenant, property=self.masaki)
+        self.assertEqual(self.suggest('ma', kinds='property'), [('property', 'Masaki Heights'), ('property', 'Mango Court')])
+
+    def test_index_follows_property_and_location_changes(self):
+        autocomplete.get_index()
+        self.mango.location = self.arusha
+        self.mango.property_name = 'Palm Court'
+        self.mango.save()
+        self.assertEqual(self.suggest('palm'), [('property', 'Palm Court')])
+        self.assertEqual(self.suggest('mango'), [])
+        self.assertEqual(autocomplete.suggest('arusha', kinds=['city'])[0][3], 2)
+        self.dar.city = 'Dar'
+        self.dar.save()
+        self.assertEqual(self.suggest('dar', kinds='city'), [('city', 'Dar')])
+        self.masaki.delete()
+        self.assertEqual(self.suggest('dar', kinds='city'), [])
+
+class CatalogueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.landlord = User.objects.create_user(
+            username='cataloguelandlord', name='Landlord', email='cataloguelandlord@example.com',
+            phone_number='+255712345714', password='Test1234', role='landlord'
+        )
+        self.tenant = User.objects.create_user(
+            username='cataloguetenant', name='Tenant', email='cataloguetenant@example.com',
+            phone_number='+255712345715', password='Test1234', role='tenant'
+        )
+        self.dar = Location.objects.create(
+            address='1 Ali Hassan Mwinyi Rd', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+            postal_code='14111', latitude=-6.7924, longitude=39.2083
+        )
+        arusha = Location.objects.create(
+            address='2 Sokoine Rd', city='Arusha', region='Arusha', country='Tanzania', postal_code='23101',
+            latitude=-3.3869, longitude=36.6830
+        )
+        self.villa = self.create_property('Sea Villa', self.dar, 1200)
+        self.flat = self.create_property('City Flat', self.dar, 500)
+        self.lodge = self.create_property('Mountain Lodge', arusha, 800)
+        self.create_property('Taken House', self.dar, 700, availability_status='Rented')
+        self.client = APIClient()
+
+    def create_property(self, name, location, price, **extra):
+        return Property.objects.create(
+            owner=self.landlord, location=location, property_name=name, property_type='Apartment',
+            rental_type='long-term', description='Test', price_per_month=price, **extra
+        )
+
+    def names(self, params=None):
+        response = self.client.get('/api/v1/catalogue/', params or {})
+        self.assertEqual(response.status_code, 200)
+        return [item['property_name'] for item in response.data['results']]
+
+    def test_anonymous_users_see_available_properties(self):
+        PropertyMedia.objects.create(property=self.villa, file='property_media/villa.jpg', media_type='image')
+        Review.objects.create(user=self.tenant, property=self.villa, rating=4, review_text='Good')
+        Review.objects.create(user=self.tenant, property=self.villa, rating=5, review_text='Great')
+        response = self.client.get('/api/v1/catalogue/', {'sort_by': 'rating'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        first = response.data['results'][0]
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual((first['id'], first['city'], first['rating'], first['review_count']),
+                         (self.villa.id, 'Dar es Salaam', '4.50', 2))
+        self.assertTrue(first['thumbnail'].endswith('property_media/villa.jpg'))
+        detail = self.client.get(f'/api/v1/catalogue/{self.flat.id}/')
+        self.assertEqual(detail.data['property_name'], 'City Flat')
+
+    def test_filters_and_sorting(self):
+        self.assertEqual(self.names({'city': 'Dar es Salaam', 'sort_by': 'price_per_month'}), ['City Flat', 'Sea Villa'])
+        self.assertEqual(self.names({'price_per_month_max': 900, 'sort_by': 'price_per_month'}),
+                         ['City Flat', 'Mountain Lodge'])
+        self.assertEqual(
+            self.names({'latitude': -6.79, 'longitude': 39.21, 'radius': 5, 'sort_by': 'distance'}),
+            ['Sea Villa', 'City Flat']
+        )
+        wifi = Amenity.objects.create(name='Wi-Fi')
+        PropertyAmenity.objects.create(property=self.lodge, amenity=wifi)
+        self.assertEqual(self.names({'amenities': 'Wi-Fi'}), ['Mountain Lodge'])
+        self.assertEqual(self.client.get('/api/v1/catalogue/', {'sort_by': 'nope'}).status_code, 400)
+
+    def test_pages_are_cached_until_the_catalogue_changes(self):
+        self.names()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.names()), 3)
+        self.assertEqual(len(queries), 0)
+        self.flat.availability_status = 'Rented'
+        self.flat.save()
+        self.assertEqual(self.names(), ['Mountain Lodge', 'Sea Villa'])
+        self.lodge.delete()
+        self.assertEqual(self.names(), ['Sea Villa'])
+
+    def test_anonymous_callers_are_throttled_per_client(self):
+        with override_settings(CATALOGUE_THROTTLE_RATE='2/minute'):
+            statuses = [self.client.get('/api/v1/catalogue/', REMOTE_ADDR='10.0.0.1').status_code for _ in range(3)]
+            self.assertEqual(statuses, [200, 200, 429])
+            self.assertEqual(self.client.get('/api/v1/catalogue/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_rebuild_restores_bulk_created_properties(self):
+        Property.objects.bulk_create([Property(
+            owner=self.landlord, location=self.dar, property_name='Imported', property_type='Apartment',
+            rental_type='long-term', description='Test', price_per_month=100
+        )])
+        self.assertFalse(CatalogueEntry.objects.filter(property_name='Imported').exists())
+        call_command('rebuild_catalogue', stdout=StringIO())
+        self.assertIn('Imported', self.names())
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'], REPLICA_MAX_LAG_SECONDS=2,
+                   REPLICA_LAG_CHECK_SECONDS=60, REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTests(SimpleTestCase):
+    # Routing decisions only; no query runs, so the replica aliases need not exist.
+
+    def setUp(self):
+        cache.clear()
+        db_router.reset_routing_stats()
+        db_router.unpin()  # earlier tests wrote from this thread
+        self.router = db_router.ReplicaRouter()
+        self.lag = {'replica_1': 0.1, 'replica_2': 0.1}
+        probe = mock.patch.object(db_router, 'lag_probe', side_effect=lambda alias: self.lag[alias])
+        self.probe = probe.start()
+        self.addCleanup(probe.stop)
+
+    def request(self, method, token):
+        """Run a request through the middleware and return the alias its read went to."""
+        routed = []
+
+        def view(request):
+            if request.method != 'GET':
+                self.router.db_for_write(User)
+            routed.append(self.router.db_for_read(User))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/api/v1/properties/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        db_router.ReadYourWritesMiddleware(view)(request)
+        return routed[0]
+
+    def test_reads_go_to_replicas_and_writes_to_primary(self):
+        reads = {self.router.db_for_read(User) for _ in range(50)}
+        self.assertEqual(reads, {'replica_1', 'replica_2'})
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertEqual(db_router.routing_stats()['default'], {'read': 0, 'write': 1})
+        self.assertEqual(sum(db_router.routing_stats()[alias]['read'] for alias in reads), 50)
+        self.assertFalse(self.router.allow_migrate('replica_1', 'users'))
+        self.assertTrue(self.router.allow_migrate('default', 'users'))
+
+    def test_lagging_or_unreachable_replica_falls_back(self):
+        self.lag['replica_1'] = 30
+        self.assertEqual({self.router.db_for_read(User) for _ in range(20)}, {'replica_2'})
+        db_router.reset_routing_stats()
+        self.probe.side_effect = DatabaseError('connection refused')
+        with mock.patch('builtins.print'):
+            self.assertEqual(self.router.db_for_read(User), 'default')
+        # The measurement is reused until REPLICA_LAG_CHECK_SECONDS pass.
+        self.assertEqual(self.probe.call_count, 4)
+        self.router.db_for_read(User)
+        self.assertEqual(self.probe.call_count, 4)
+
+    def test_client_reads_its_own_writes(self):
+        self.assertIn(self.request('get', 'alice'), ('replica_1', 'replica_2'))
+        self.assertEqual(self.request('post', 'alice'), 'default')
+        # Alice is pinned to the primary for a while; Bob is not.
+        self.assertEqual(self.request('get', 'alice'), 'default')
+        self.assertIn(self.request('get', 'bob'), ('replica_1', 'replica_2'))
+        cache.delete(db_router.pin_key(RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer alice')))
+        self.assertIn(self.request('get', 'alice'), ('replica_1', 'replica_2'))
+
+    def test_reads_in_a_transaction_stay_on_the_primary(self):
+        with mock.patch.object(connection, 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_lag_is_measured_against_a_streaming_upstream(self):
+        cursor = mock.MagicMock()
+        replica = connections['default']
+        with mock.patch.object(replica, 'vendor', 'postgresql'), mock.patch.object(replica, 'cursor', return_value=cursor):
+            cursor.__enter__.return_value.fetchone.return_value = (0.5,)
+            self.assertEqual(db_router.database_lag('default'), 0.5)
+            # Never replayed anything: not usable.
+            cursor.__enter__.return_value.fetchone.return_value = (None,)
+            self.assertEqual(db_router.database_lag('default'), float('inf'))
+        [sql], _ = cursor.__enter__.return_value.execute.call_args
+        self.assertIn('pg_stat_wal_receiver', sql)
+
+    def test_concurrent_async_requests_route_independently(self):
+        routed = {}
+
+        async def view(request):
+            if request.method != 'GET':
+                await sync_to_async(self.router.db_for_write)(User)
+            await asyncio.sleep(0)  # the other request runs in between
+            routed[request.method] = await sync_to_async(self.router.db_for_read)(User)
+            return HttpResponse()
+
+        middleware = db_router.ReadYourWritesMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        factory = RequestFactory()
+
+        async def serve():
+            await asyncio.gather(
+                middleware(factory.post('/api/v1/bookings/', HTTP_AUTHORIZATION='Bearer alice')),
+                middleware(factory.get('/api/v1/properties/', HTTP_AUTHORIZATION='Bearer bob')),
+            )
+
+        async_to_sync(serve)()
+        # Alice's write pins her request, not Bob's running alongside it on the same thread.
+        self.assertEqual(routed['POST'], 'default')
+        self.assertIn(routed['GET'], ('replica_1', 'replica_2'))
+        self.assertEqual(self.request('get', 'alice'), 'default')
+
+
+class ConnectionWaitTests(TestCase):
+    def setUp(self):
+        db_connections.reset_connection_stats()
+        self.user = User.objects.create_user(
+            username='pooled', email='pooled@example.com', password='pass123', name='Pooled',
+            phone_number='+255712345716', role='tenant'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_requests_report_connection_wait(self):
+        for _ in range(3):
+            response = self.client.get('/api/v1/notifications/')
+            self.assertEqual(response.status_code, 200)
+            self.assertRegex(response['Server-Timing'], r'(^|, )db-connect;dur=\d+\.\d\d$')
+        stats = db_connections.connection_stats()
+        # The test database connection stays open, so every request reuses it.
+        self.assertEqual((stats['acquires'], stats['reused']), (3, 3))
+        self.assertLessEqual(stats['wait_ms']['p50'], stats['wait_ms']['max'])
+
+    def test_requests_without_queries_do_not_acquire(self):
+        response = self.client.get('/api/v1/no-such-endpoint/')
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('db-connect', response.get('Server-Timing', ''))
+        self.assertEqual(db_connections.connection_stats()['acquires'], 0)
+
+    def test_health_check_is_timed_where_the_request_first_queries(self):
+        wrapper = connections['default']
+
+        def slow_ping():
+            time.sleep(0.02)
+            return True
+
+        with mock.patch.object(wrapper, 'health_check_enabled', True), \
+                mock.patch.object(wrapper, 'is_usable', side_effect=slow_ping) as ping:
+            wrapper.health_check_done = False
+            response = self.client.get('/api/v1/notifications/')
+        ping.assert_called_once()
+        self.assertGreaterEqual(db_connections.connection_stats()['wait_ms']['max'], 20)
+        self.assertIn('db-connect;dur=', response['Server-Timing'])
+
+    def test_async_requests_report_connection_wait(self):
+        async def view(request):
+            await sync_to_async(User.objects.count)()
+            return HttpResponse()
+
+        middleware = db_connections.ConnectionWaitMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertRegex(response['Server-Timing'], r'^db-connect;dur=\d+\.\d\d$')
+        self.assertEqual(db_connections.connection_stats()['acquires'], 1)
+
+    def test_new_connections_are_counted(self):
+        connection_created.send(sender=connection.__class__, connection=connection)
+        self.assertEqual(db_connections.connection_stats()['connects'], {'default': 1})
+
+    def test_deploy_check_compares_workers_with_max_connections(self):
+        persistent = {**connection.settings_dict, 'CONN_MAX_AGE': 300}
+        with mock.patch.object(connection, 'vendor', 'postgresql'), \
+                mock.patch.object(connection, 'settings_dict', persistent), \
+                mock.patch.object(db_connections, 'server_max_connections', return_value=100):
+            with override_settings(WEB_CONCURRENCY=4, WEB_THREADS=8, BACKGROUND_TASK_WORKERS=4):
+                self.assertEqual(db_connections.check_connection_budget(databases=['default']), [])
+            with override_settings(WEB_CONCURRENCY=10, WEB_THREADS=8, BACKGROUND_TASK_WORKERS=4):
+                [warning] = db_connections.check_connection_budget(databases=['default'])
+                self.assertEqual(warning.id, 'users.W001')
+            self.assertEqual(db_connections.check_connection_budget(databases=None), [])
+
+
+class SoftDeleteCascadeTests(TestCase):
+    def setUp(self):
+        self.landlord = User.objects.create_user(
+            username='cascadelandlord', name='Landlord', email='cascadelandlord@example.com',
+            phone_number='+255712345717', password='Test1234', role='landlord'
+        )
+        self.tenant = User.objects.create_user(
+            username='cascadetenant', name='Tenant', email='cascadetenant@example.com',
+            phone_number='+255712345718', password='Test1234', role='tenant'
+        )
+        self.other_landlord = User.objects.create_user(
+            username='cascadeother', name='Other', email='cascadeother@example.com',
+            phone_number='+255712345719', password='Test1234', role='landlord'
+        )
+        self.house = self.create_property(self.landlord, 'Cascade House')
+        self.other_house = self.create_property(self.other_landlord, 'Other House')
+        today = datetime.date.today()
+        self.bookings = [
+            Booking.objects.create(
+                user=self.tenant, property=self.house, start_date=today + datetime.timedelta(days=10 * i + 1),
+                end_date=today + datetime.timedelta(days=10 * i + 5), rental_type='long-term', monthly_rent=500
+            )
+            for i in range(3)
+        ]
+        self.other_booking = Booking.objects.create(
+            user=self.tenant, property=self.other_house, start_date=today + datetime.timedelta(days=1),
+            end_date=today + datetime.timedelta(days=30), rental_type='long-term', monthly_rent=500
+        )
+        Payment.objects.create(booking=self.bookings[0], amount=500, payment_method='Mobile Money')
+        Payment.objects.create(booking=self.other_booking, amount=500, payment_method='Mobile Money')
+        Review.objects.create(user=self.tenant, property=self.other_house, rating=5, review_text='Great')
+        BookingInquiry.objects.create(user=self.tenant, property=self.house, message='Parking?')
+        MaintenanceRequest.objects.create(user=self.tenant, property=self.house, description='Leak')
+        Message.objects.create(sender=self.tenant, receiver=self.landlord, content='Hello')
+        Notification.objects.create(user=self.landlord, notification_type='Alert', message='Hi')
+
+    def create_property(self, owner, name):
+        return Property.objects.create(
+            owner=owner, property_name=name, property_type='Apartment', rental_type='long-term',
+            description='Test', price_per_month=500
+        )
+
+    def test_deleting_a_landlord_cascades_with_one_update_per_model(self):
+        with CaptureQueriesContext(connection) as queries:
+            total, counts = self.landlord.delete()
+        self.assertEqual(counts, {
+            'users.User': 1, 'users.Property': 1, 'users.Booking': 3, 'users.Payment': 1,
+            'users.BookingInquiry': 1, 'users.MaintenanceRequest': 1, 'users.Message': 1, 'users.Notification': 1,
+        })
+        self.assertEqual(total, 10)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(sum('"users_booking"' in sql.split(' SET ')[0] for sql in updates), 1)
+        # + releasing the property and refreshing its booking aggregates
+        self.assertLessEqual(len(updates), len(cascade_plan()) + 2)
+        self.assertFalse(Property.objects.filter(pk=self.house.pk).exists())
+        self.assertFalse(Booking.objects.filter(property=self.house).exists())
+        # The tenant's booking elsewhere, and everything of the other landlord, stay live.
+        self.assertTrue(Booking.objects.filter(pk=self.other_booking.pk).exists())
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertTrue(User.objects.filter(pk=self.tenant.pk).exists())
+
+    def test_deleting_a_tenant_releases_booked_properties(self):
+        self.other_house.refresh_from_db()
+        self.assertEqual(self.other_house.availability_status, 'Booked')
+        self.tenant.delete()
+        self.other_house.refresh_from_db()
+        self.assertEqual(self.other_house.availability_status, 'Available')
+        self.assertFalse(Review.objects.exists())
+        self.assertFalse(Message.objects.exists())
+        self.assertEqual(Notification.objects.count(), 1)
+
+    def test_property_delete_endpoint_cascades(self):
+        client = APIClient()
+        client.force_authenticate(user=self.landlord)
+        response = client.delete(f'/api/v1/properties/{self.house.pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(Booking._base_manager.filter(property=self.house, is_deleted=True).count(), 3)
+        self.assertTrue(User.objects.filter(pk=self.landlord.pk).exists())
+
+    def test_purge_repairs_orphans_and_removes_old_rows_in_batches(self):
+        # A landlord deleted before cascades existed: only their own row was flagged.
+        User._base_manager.filter(pk=self.landlord.pk).update(
+            is_deleted=True, deleted_at=timezone.now() - datetime.timedelta(days=1)
+        )
+        out = StringIO()
+        call_command('purge_soft_deleted', stdout=out)
+        self.assertIn('Soft-deleted 9 orphaned rows', out.getvalue())
+        self.assertIn('Purged 0 rows', out.getvalue())
+        self.assertFalse(Property.objects.filter(pk=self.house.pk).exists())
+
+        soft_delete(self.other_house, now=timezone.now() - datetime.timedelta(days=60))
+        purged = purge_soft_deleted(batch_size=1)
+        self.assertEqual(purged, {'users.Review': 1})
+        # The booking has a payment, a financial record, so neither it nor its property is purged.
+        self.assertEqual(Payment._base_manager.filter(booking=self.other_booking).count(), 1)
+        self.assertTrue(Property._base_manager.filter(pk=self.other_house.pk).exists())
+        # Rows still inside the retention window stay.
+        self.assertTrue(User._base_manager.filter(pk=self.landlord.pk).exists())
+        self.assertEqual(Booking._base_manager.filter(property=self.house).count(), 3)
+        self.assertTrue(User.objects.filter(pk=self.other_landlord.pk).exists())
+
+    def test_purge_keeps_payments_and_archived_history(self):
+        MessageArchive.objects.create(
+            id=10**9, sender=self.landlord, receiver=self.tenant, content='Archived', sent_at=timezone.now()
+        )
+        soft_delete(self.landlord, now=timezone.now() - datetime.timedelta(days=60))
+        purged = purge_soft_deleted(batch_size=1)
+        # The unpaid bookings and the requests go; the paid booking, its property and the landlord stay.
+        self.assertEqual(purged['users.Booking'], 2)
+        self.assertEqual(purged['users.BookingInquiry'], 1)
+        self.assertEqual(purged['users.MaintenanceRequest'], 1)
+        self.assertNotIn('users.Payment', purged)
+        self.assertNotIn('users.User', purged)
+        self.assertEqual(list(Booking._base_manager.filter(property=self.house)), [self.bookings[0]])
+        self.assertTrue(Payment._base_manager.filter(booking=self.bookings[0]).exists())
+        self.assertTrue(MessageArchive.objects.filter(receiver=self.tenant).exists())
+        self.assertTrue(Message._base_manager.filter(sender=self.tenant).exists())
+
+
+class PropertyAggregateTests(TestCase):
+    def setUp(self):
+        self.landlord = User.objects.create_user(
+            username='aggregatelandlord', name='Landlord', email='aggregatelandlord@example.com',
+            phone_number='+255712345720', password='Test1234', role='landlord'
+        )
+        self.tenants = [
+            User.objects.create_user(
+                username=f'aggregatetenant{i}', name='Tenant', email=f'aggregatetenant{i}@example.com',
+                phone_number=f'+25571234572{i + 1}', password='Test1234', role='tenant'
+            )
+            for i in range(2)
+        ]
+        dar = Location.objects.create(
+            address='1 Samora Ave', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+            postal_code='11101', latitude=-6.8161, longitude=39.2803
+        )
+        self.loft, self.villa, self.studio = [
+            Property.objects.create(
+                owner=self.landlord, location=dar, property_name=name, property_type='Apartment',
+                rental_type='long-term', description='Test', price_per_month=500
+            )
+            for name in ('Loft', 'Villa', 'Studio')
+        ]
+
+    def aggregates(self, prop):
+        prop.refresh_from_db()
+        return prop.review_count, prop.rating_total, prop.average_rating, prop.favorite_count, prop.booking_count
+
+    def test_counters_follow_creates_and_deletes(self):
+        first = Review.objects.create(user=self.tenants[0], property=self.loft, rating=5, review_text='Great')
+        Review.objects.create(user=self.tenants[1], property=self.loft, rating=2, review_text='Meh')
+        favorite = Favorite.objects.create(user=self.tenants[0], property=self.loft)
+        Favorite.objects.create(user=self.tenants[1], property=self.loft)
+        booking = Booking.objects.create(
+            user=self.tenants[0], property=self.loft, start_date=datetime.date.today() + datetime.timedelta(days=1),
+            end_date=datetime.date.today() + datetime.timedelta(days=30), rental_type='long-term', monthly_rent=500
+        )
+        self.assertEqual(self.aggregates(self.loft), (2, 7, 3.5, 2, 1))
+
+        first.rating = 4
+        first.save()
+        self.assertEqual(self.aggregates(self.loft)[:3], (2, 6, 3.0))
+        first.delete()
+        favorite.delete()
+        booking.delete()
+        self.assertEqual(self.aggregates(self.loft), (1, 2, 2.0, 1, 0))
+
+    def test_saving_a_stale_instance_keeps_the_counters(self):
+        stale = Property.objects.get(pk=self.villa.pk)
+        Review.objects.create(user=self.tenants[0], property=self.villa, rating=4, review_text='Nice')
+        stale.property_name = 'Sea Villa'
+        stale.save()
+        self.assertEqual(self.aggregates(self.villa)[:3], (1, 4, 4.0))
+        self.assertEqual(self.villa.property_name, 'Sea Villa')
+
+    def test_list_and_nearby_sort_and_filter_without_joins(self):
+        Review.objects.create(user=self.tenants[0], property=self.villa, rating=5, review_text='Great')
+        Review.objects.create(user=self.tenants[0], property=self.studio, rating=3, review_text='Ok')
+        Favorite.objects.create(user=self.tenants[0], property=self.studio)
+        client = APIClient()
+        client.force_authenticate(user=self.landlord)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get('/api/v1/properties/', {'sort_by': 'rating', 'rating_min': 3})
+        self.assertEqual([p['property_name'] for p in response.data['results']], ['Villa', 'Studio'])
+        self.assertEqual(response.data['results'][0]['average_rating'], 5.0)
+        listing = next(q['sql'] for q in queries if 'ORDER BY' in q['sql'] and '"users_property"' in q['sql'])
+        self.assertNotIn('users_review', listing)
+        self.assertEqual(client.get('/api/v1/properties/', {'rating_min': 'high'}).status_code, 400)
+
+        client.force_authenticate(user=self.tenants[1])
+        response = client.get('/api/v1/properties/nearby/', {
+            'latitude': -6.8161, 'longitude': 39.2803, 'sort_by': 'favorites', 'reviews_min': 1,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['property_name'] for p in response.data['results']], ['Studio', 'Villa'])
+
+    def test_reconcile_repairs_drift_from_bulk_writes(self):
+        Review.objects.bulk_create([
+            Review(user=self.tenants[0], property=self.studio, rating=rating, review_text='Imported')
+            for rating in (4, 5)
+        ])
+        Favorite.objects.bulk_create([Favorite(user=self.tenants[1], property=self.villa)])
+        self.assertEqual(reconcile_aggregates(batch_size=1), 2)
+        self.assertEqual(self.aggregates(self.studio)[:3], (2, 9, 4.5))
+        self.assertEqual(self.aggregates(self.villa)[3], 1)
+        out = StringIO()
+        call_command('reconcile_aggregates', stdout=out)
+        self.assertIn('0 properties had drifted', out.getvalue())
+
+
+class QueryBudgetTests(TestCase):
+    ROWS = 3  # Per model and user; an N+1 costs at least this many extra queries.
+    ROLES = {
+        'user': 'admin', 'location': 'landlord', 'property': 'landlord', 'catalogue': None,
+        'booking': 'tenant', 'payment': 'tenant', 'review': 'tenant', 'message': 'tenant',
+        'propertymedia': 'landlord', 'notification': 'tenant', 'bookinginquiry': 'tenant',
+        'maintenancerequest': 'tenant', 'room': 'landlord', 'amenity': 'landlord',
+        'propertyamenity': 'landlord', 'favorite': 'tenant', 'manager': 'landlord', 'supportticket': 'tenant',
+    }
+    # Writes a tenant or the admin makes on their own behalf rather than as the viewset's usual caller.
+    WRITE_ROLES = {
+        ('user', 'chat'): 'tenant', ('user', 'update_fcm_token'): 'tenant', ('user', 'update_profile'): 'tenant',
+        ('user', 'update_settings'): 'tenant', ('message', 'mark_conversation_read'): 'landlord',
+        ('notification', 'broadcast'): 'admin', ('supportticket', 'update_status'): 'admin',
+    }
+    # Their serializers leave the owner or property read-only, so no request can create one; nothing to budget.
+    UNWRITABLE = {('property', 'create'), ('booking', 'create')}
+    PARAMS = {
+        ('property', 'nearby'): {'latitude': -6.8161, 'longitude': 39.2803},
+        ('property', 'name_search'): {'q': 'Budget'},
+        ('property', 'autocomplete'): {'q': 'Bud'},
+    }
+
+    def setUp(self):
+        reset_query_stats()
+        self.users = {
+            role: User.objects.create_user(
+                username=f'budget{role}', name='Budget', email=f'budget{role}@example.com',
+                phone_number=f'+25571234573{i}', password='Test1234', role=role
+            )
+            for i, role in enumerate(('admin', 'landlord', 'tenant'))
+        }
+        landlord, tenant = self.users['landlord'], self.users['tenant']
+        start = datetime.date.today() + datetime.timedelta(days=1)
+        self.pks = {'user': tenant.pk}
+        for i in range(self.ROWS):
+            location = Location.objects.create(
+                address=f'{i} Samora Ave', city='Dar es Salaam', region='Dar es Salaam', country='Tanzania',
+                postal_code='11101', latitude=-6.8161, longitude=39.2803
+            )
+            prop = Property.objects.create(
+                owner=landlord, location=location, property_name=f'Budget Flat {i}', property_type='Apartment',
+                rental_type='long-term', description='Test', price_per_month=500, availability_status='Available'
+            )
+            # Booking marks ``prop`` as booked, which takes it out of the catalogue.
+            vacant = Property.objects.create(
+                owner=landlord, location=location, property_name=f'Budget Loft {i}', property_type='Apartment',
+                rental_type='long-term', description='Test', price_per_month=700, availability_status='Available'
+            )
+            room = Room.objects.create(property=prop, room_number=str(i))
+            booking = Booking.objects.create(
+                user=tenant, property=prop, room=room, start_date=start, end_date=start + datetime.timedelta(days=30),
+                rental_type='long-term', monthly_rent=500
+            )
+            amenity = Amenity.objects.create(name=f'Budget Amenity {i}')
+            self.pks.update({
+                'location': location.pk, 'property': prop.pk, 'catalogue': vacant.pk, 'booking': booking.pk,
+                'room': room.pk, 'amenity': amenity.pk,
+                'payment': Payment.objects.create(booking=booking, amount=500, payment_method='Mobile Money').pk,
+                'review': Review.objects.create(user=tenant, property=prop, rating=4, review_text='Good').pk,
+                'message': Message.objects.create(sender=tenant, receiver=landlord, content='Hello').pk,
+                'propertymedia': PropertyMedia.objects.create(
+                    property=prop, file=f'property_media/{i}.jpg', media_type='image'
+                ).pk,
+                'notification': Notification.objects.create(
+                    user=tenant, notification_type='Alert', message='Hi'
+                ).pk,
+                'bookinginquiry': BookingInquiry.objects.create(user=tenant, property=prop, message='Parking?').pk,
+                'maintenancerequest': MaintenanceRequest.objects.create(
+                    user=tenant, property=prop, description='Leak'
+                ).pk,
+                'propertyamenity': PropertyAmenity.objects.create(property=prop, amenity=amenity).pk,
+                'favorite': Favorite.objects.create(user=tenant, property=prop).pk,
+                'manager': Manager.objects.create(user=landlord, property=prop, role='Manager').pk,
+                'supportticket': SupportTicket.objects.create(user=tenant, subject='Help', description='Help').pk,
+            })
+
+    def read_endpoints(self):
+        return [endpoint for endpoint in router_endpoints(router) if endpoint[3] == 'GET']
+
+    def write_endpoints(self):
+        return [endpoint for endpoint in router_endpoints(router) if endpoint[3] != 'GET']
+
+    def write_data(self, basename, action):
+        """A valid body for the write endpoint: the model's fields for create and update, else the action's."""
+        landlord, tenant = self.users['landlord'], self.users['tenant']
+        booking = Booking.objects.get(pk=self.pks['booking'])
+        fields = {
+            'user': {
+                'username': 'budgetnew', 'name': 'Budget', 'email': 'budgetnew@example.com',
+                'phone_number': '+255712345791', 'password': 'Budget123', 'role': 'tenant',
+            },
+            'location': {
+                'address': '9 Budget Rd', 'city': 'Dar es Salaam', 'region': 'Dar es Salaam', 'country': 'Tanzania',
+                'postal_code': '11101', 'latitude': -6.8161, 'longitude': 39.2803,
+            },
+            'property': {
+                'property_name': 'Budget Flat', 'property_type': 'Apartment', 'rental_type': 'long-term',
+                'description': 'Test', 'price_per_month': 500,
+            },
+            'booking': {
+                'user': tenant.pk, 'start_date': booking.start_date, 'end_date': booking.end_date,
+                'rental_type': 'long-term', 'monthly_rent': 500,
+            },
+            'payment': {'booking': booking.pk, 'amount': 500, 'payment_method': 'Mobile Money'},
+            'review': {'user': tenant.pk, 'property': self.pks['property'], 'rating': 5, 'review_text': 'Great'},
+            'message': {'sender': tenant.pk, 'receiver': landlord.pk, 'content': 'Hello'},
+            'propertymedia': {'property': self.pks['property'], 'media_type': 'image'},
+            'notification': {'notification_type': 'Alert', 'message': 'Hi'},
+            'bookinginquiry': {'user': tenant.pk, 'property': self.pks['property'], 'message': 'Parking?'},
+            'maintenancerequest': {'user': tenant.pk, 'property': self.pks['property'], 'description': 'Leak'},
+            'room': {'property': self.pks['property'], 'room_number': '9'},
+            'amenity': {'name': 'Budget Pool'},
+            'propertyamenity': {'property': self.pks['catalogue'], 'amenity': self.pks['amenity']},
+            'favorite': {'user': tenant.pk, 'property': self.pks['catalogue']},
+            'manager': {'user': landlord.pk, 'property': self.pks['property'], 'role': 'Manager'},
+            'supportticket': {'subject': 'Help', 'description': 'Help'},
+        }
+        actions = {
+            ('user', 'chat'): {'message': 'is my booking confirmed yet?'},
+            ('user', 'register'): {**fields['user'], 'username': 'budgetsignup', 'email': 'budgetsignup@example.com'},
+            ('user', 'update_fcm_token'): {'fcm_token': 'budget-token', 'platform': 'android'},
+            ('user', 'update_profile'): {'name': 'Renamed'},
+            ('user', 'update_settings'): {'email': 'renamed@example.com'},
+            ('booking', 'update_status'): {'status': 'Confirmed'},
+            ('payment', 'update_status'): {'payment_status': 'Completed'},
+            ('message', 'mark_read'): {},
+            ('message', 'mark_conversation_read'): {'user': tenant.pk, 'up_to': self.pks['message']},
+            ('notification', 'broadcast'): {
+                'segment': 'role', 'value': 'tenant', 'notification_type': 'Alert', 'message': 'Hi'
+            },
+            ('notification', 'mark_all_read'): {},
+            ('notification', 'preferences'): {'digest_enabled': True, 'digest_window_minutes': 30},
+            ('supportticket', 'update_status'): {'status': 'Resolved'},
+        }
+        if action in ('create', 'update', 'partial_update'):
+            return fields[basename]
+        return actions.get((basename, action), {})
+
+    def assertWithinQueryBudget(self, basename, action, url_name, detail, method='GET'):
+        """
+        Call the endpoint as a user allowed to, with a valid body for writes,
+        and check its queries against the declared budget.
+        """
+        client = APIClient()
+        role = self.WRITE_ROLES.get((basename, action), self.ROLES[basename]) if method != 'GET' else self.ROLES[basename]
+        if role:
+            # A real token, so the budget covers authentication's own query.
+            token = RefreshToken.for_user(self.users[role]).access_token
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        url = reverse(url_name, kwargs={'pk': self.pks[basename]} if detail else None)
+        if method == 'GET':
+            response = client.get(url, self.PARAMS.get((basename, action), {}))
+            self.assertEqual(response.status_code, 200, f'{url_name}: {response.status_code}')
+        else:
+            response = getattr(client, method.lower())(url, self.write_data(basename, action), format='json')
+            self.assertLess(response.status_code, 300, f'{method} {url_name}: {response.status_code} {response.data}')
+        profile = response.query_profile
+        self.assertLessEqual(
+            profile.count, response.query_budget,
+            f'{basename}-{action} ran {profile.count} queries, budget {response.query_budget}; '
+            f'repeated: {list(profile.duplicates)}'
+        )
+        return profile
+
+    def test_every_read_endpoint_declares_a_budget(self):
+        missing = [
+            f'{basename}-{action}' for basename, viewset, action, _, _, _ in self.read_endpoints()
+            if action not in getattr(viewset, 'query_budgets', {})
+        ]
+        self.assertEqual(missing, [])
+
+    def test_every_read_endpoint_stays_within_its_budget(self):
+        for basename, _, action, _, url_name, detail in self.read_endpoints():
+            with self.subTest(endpoint=f'{basename}-{action}'):
+                self.assertWithinQueryBudget(basename, action, url_name, detail)
+
+    def test_every_write_endpoint_declares_a_budget(self):
+        missing = [
+            f'{basename}-{action}' for basename, viewset, action, _, _, _ in self.write_endpoints()
+            if action not in getattr(viewset, 'query_budgets', {}) and (basename, action) not in self.UNWRITABLE
+        ]
+        self.assertEqual(missing, [])
+
+    def test_every_write_endpoint_stays_within_its_budget(self):
+        # A serving process has its in-memory indexes loaded, and writes keep them current.
+        for index in (name_index, search_index, autocomplete):
+            index.get_index()
+        for basename, _, action, method, url_name, detail in self.write_endpoints():
+            if (basename, action) in self.UNWRITABLE:
+                continue
+            with self.subTest(endpoint=f'{basename}-{action}'), transaction.atomic():
+                # Each write starts from the same rows.
+                self.assertWithinQueryBudget(basename, action, url_name, detail, method)
+                transaction.set_rollback(True)
+
+    def test_async_requests_are_profiled(self):
+        async def view(request):
+            request.query_endpoint = ('async-view', 1)
+            for _ in range(2):
+                await sync_to_async(User.objects.count)()
+            return HttpResponse()
+
+        middleware = QueryBudgetMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch('builtins.print') as printed:
+            response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual((response.query_profile.count, response.query_profile.duplicate_count), (2, 1))
+        printed.assert_called_once()
+        self.assertEqual(query_stats()['async-view']['over_budget'], 1)
+
+    def test_n_plus_one_is_reported_in_headers_and_stats(self):
+        client = APIClient()
+        client.force_authenticate(user=self.users['tenant'])
+        unjoined = lambda view: Booking.objects.filter(user=view.request.user)
+        with override_settings(QUERY_BUDGET_HEADERS=True), \
+                mock.patch.object(BookingViewSet, 'get_queryset', unjoined), \
+                mock.patch('builtins.print') as printed:
+            response = client.get('/api/v1/bookings/')
+        self.assertEqual(response['X-Query-Count'], str(response.query_profile.count))
+        self.assertEqual(response['X-Query-Budget'], '5')
+        self.assertGreaterEqual(int(response['X-Query-Duplicates']), self.ROWS - 1)
+        self.assertIn('db;dur=', response['Server-Timing'])
+        printed.assert_called_once()
+        stats = query_stats()['booking-list']
+        self.assertEqual((stats['requests'], stats['over_budget']), (1, 1))
+        self.assertTrue(any('"users_property"' in sql for sql in stats['repeated']))
+
+        with override_settings(QUERY_BUDGET_HEADERS=False):
+            self.assertFalse(client.get('/api/v1/bookings/').has_header('X-Query-Count'))
+        self.assertEqual(client.get('/api/v1/metrics/queries/').status_code, 403)
+        client.force_authenticate(user=self.users['admin'])
+        metrics = client.get('/api/v1/metrics/queries/').data
+        self.assertEqual((metrics['booking-list']['requests'], metrics['booking-list']['over_budget']), (2, 1))
+
+
+class PlaceTests(TestCase):
+    def setUp(self):
+        self.landlord = User.objects.create_user(
+            username='placelandlord', name='Landlord', email='placelandlord@example.com',
+            phone_number='+255712345740', password='Test1234', role='landlord'
+        )
+        self.tenant = User.objects.create_user(
+            username='placetenant', name='Tenant', email='placetenant@example.com',
+            phone_number='+255712345741', password='Test1234', role='tenant'
+        )
+        self.dar = self.create_location('Dar es Salaam', 'Dar es Salaam')
+        self.arusha = self.create_location('Arusha', 'Arusha')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.landlord)
+
+    def create_location(self, city, region, country='Tanzania'):
+        return Location.objects.create(
+            address='1 Main Rd', city=city, region=region, country=country, postal_code='0',
+            latitude=-6.8161, longitude=39.2803
+        )
+
+    def create_property(self, location, name):
+        return Property.objects.create(
+            owner=self.landlord, location=location, property_name=name, property_type='Apartment',
+            rental_type='long-term', description='Test', price_per_month=500
+        )
+
+    def test_spelling_variants_share_one_city(self):
+        variant = self.create_location(' dar-es  SALAAM', 'dar es salaam', country='tanzania')
+        self.assertEqual(variant.canonical_city, self.dar.canonical_city)
+        self.assertEqual(variant.canonical_region, self.dar.canonical_region)
+        self.assertEqual((variant.city, variant.region, variant.country), ('Dar es Salaam', 'Dar es Salaam', 'Tanzania'))
+        self.assertEqual((City.objects.count(), Region.objects.count()), (2, 2))
+        variant.city, variant.region = 'arusha', 'Arusha'
+        variant.save(update_fields=['city', 'region'])
+        variant.refresh_from_db()
+        self.assertEqual((variant.canonical_city, variant.region), (self.arusha.canonical_city, 'Arusha'))
+
+    def test_city_filters_are_integer_lookups(self):
+        self.create_property(self.dar, 'Sea View')
+        self.create_property(self.create_location('DAR ES SALAAM', 'Dar es Salaam'), 'Harbour Loft')
+        self.create_property(self.arusha, 'Mountain Lodge')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/properties/', {'location__city': 'dar es salaam'})
+        self.assertEqual(response.data['count'], 2)
+        self.assertFalse(any('"users_location"."city" =' in q['sql'] for q in queries))
+        response = self.client.get('/api/v1/properties/', {'region_id': self.arusha.canonical_region_id})
+        self.assertEqual([p['property_name'] for p in response.data['results']], ['Mountain Lodge'])
+        response = self.client.get('/api/v1/properties/', {'city_id': self.dar.canonical_city_id})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(response.data['results'][0]['location']['city_id'], self.dar.canonical_city_id)
+        self.assertEqual(self.client.get('/api/v1/properties/', {'city_id': 'dar'}).status_code, 400)
+
+    def test_catalogue_filters_on_place_keys(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.create_property(self.dar, 'Sea View')
+        self.create_property(self.create_location('DAR ES SALAAM', 'Dar es Salaam'), 'Harbour Loft')
+        self.create_property(self.arusha, 'Mountain Lodge')
+        names = lambda params: sorted(
+            entry['property_name'] for entry in self.client.get('/api/v1/catalogue/', params).data['results']
+        )
+        self.assertEqual(names({'city': 'dar-es-salaam'}), ['Harbour Loft', 'Sea View'])
+        self.assertEqual(names({'region_id': self.arusha.canonical_region_id}), ['Mountain Lodge'])
+        self.assertEqual(names({'city_id': self.dar.canonical_city_id, 'region': 'ARUSHA'}), [])
+        self.assertEqual(self.client.get('/api/v1/catalogue/', {'city_id': 'dar'}).status_code, 400)
+
+    def test_migration_refreshes_catalogue_places(self):
+        prop = self.create_property(self.dar, 'Sea View')
+        # As left by 0016: names rewritten under the entry, which has no keys yet.
+        CatalogueEntry.objects.filter(property=prop).update(city='DAR ES SALAAM', city_id=None, region_id=None)
+        import_module('users.migrations.0019_catalogue_place_keys').refresh_places(apps, None)
+        entry = CatalogueEntry.objects.get(property=prop)
+        self.assertEqual(
+            (entry.city, entry.city_id, entry.region_id),
+            ('Dar es Salaam', self.dar.canonical_city_id, self.dar.canonical_region_id)
+        )
+
+    def test_locations_list_without_distinct(self):
+        self.create_property(self.dar, 'Sea View')
+        self.create_property(self.dar, 'Harbour Loft')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/locations/')
+        self.assertEqual([location['id'] for location in response.data['results']], [self.dar.id])
+        self.assertFalse(any('DISTINCT' in q['sql'] for q in queries))
+
+    def test_city_segment_matches_any_spelling(self):
+        prop = self.create_property(self.dar, 'Sea View')
+        today = datetime.date.today()
+        Booking.objects.create(
+            user=self.tenant, property=prop, start_date=today, end_date=today + datetime.timedelta(days=30),
+            rental_type='long-term', monthly_rent=500, status='Confirmed'
+        )
+        self.assertEqual(list(resolve_segment('city', 'DAR ES SALAAM')), [self.tenant])
+
+    def test_assign_places_links_bulk_created_locations(self):
+        prop = self.create_property(self.dar, 'Sea View')
+        imported = Location.objects.bulk_create([
+            Location(address='2 Main Rd', city='arusha', region='ARUSHA', country='Tanzania', postal_code='0'),
+            Location(address='3 Main Rd', city='Moshi', region='Kilimanjaro', country='Tanzania', postal_code='0'),
+        ])
+        prop.location = imported[0]
+        prop.save()
+        self.assertEqual(assign_places(batch_size=1), 2)
+        imported[0].refresh_from_db()
+        self.assertEqual((imported[0].canonical_city, imported[0].city), (self.arusha.canonical_city, 'Arusha'))
+        self.assertTrue(City.objects.filter(name='Moshi', region__name='Kilimanjaro').exists())
+        self.assertEqual(CatalogueEntry.objects.get(property=prop).city, 'Arusha')
+        out = StringIO()
+        call_command('assign_places', stdout=out)
+        self.assertIn('Assigned places to 0 locations', out.getvalue())
+
+
+class PaymentReconciliationTests(TestCase):
+    def setUp(self):
+        self.tenant = User.objects.create_user(
+            username='paymenttenant', name='Tenant', email='paymenttenant@example.com',
+            phone_number='+255712345750', password='Test1234', role='tenant'
+        )
+        landlord = User.objects.create_user(
+            username='paymentlandlord', name='Landlord', email='paymentlandlord@example.com',
+            phone_number='+255712345751', password='Test1234', role='landlord'
+        )
+        prop = Property.objects.create(
+            owner=landlord, property_name='Pay Flat', property_type='Apartment', rental_type='long-term',
+            description='Test', price_per_month=500
+        )
+        start = datetime.date.today() + datetime.timedelta(days=1)
+        self.booking = Booking.objects.create(
+            user=self.tenant, property=prop, start_date=start, end_date=start + datetime.timedelta(days=30),
+            rental_type='long-term', monthly_rent=500
+        )
+        self.addCleanup(payments.reset_executor)
+
+    def create_payments(self, intents):
+        return [
+            Payment.objects.create(booking=self.booking, amount=500, payment_method='Credit Card',
+                                   stripe_payment_intent_id=intent_id)
+            for intent_id in intents
+        ]
+
+    def test_reconcile_settles_pages_with_one_update_per_outcome(self):
+        intents = {
+            'pi_ok1': 'succeeded', 'pi_ok2': 'succeeded', 'pi_cancelled': 'canceled', 'pi_busy': 'processing',
+            'pi_declined': {'id': 'pi_declined', 'status': 'requires_payment_method',
+                            'last_payment_error': {'code': 'card_declined'}},
+        }
+        created = self.create_payments([*intents, 'pi_unknown'])
+        manual = self.create_payments(['pi_ok3'])[0]
+        manual.payment_status = 'Failed'
+        manual.save()
+        with fake_stripe_server({**intents, 'pi_ok3': 'succeeded'}) as url, \
+                override_settings(STRIPE_API_BASE=url), mock.patch('builtins.print'), \
+                CaptureQueriesContext(connection) as queries:
+            counts = payments.reconcile_payments(batch_size=4)
+        self.assertEqual(counts, {'Completed': 2, 'Failed': 2, 'pending': 1, 'errors': 1})
+        self.assertEqual(
+            [payment.payment_status for payment in Payment.objects.filter(pk__in=[p.pk for p in created]).order_by('pk')],
+            ['Completed', 'Completed', 'Failed', 'Pending', 'Failed', 'Pending']
+        )
+        # Two pages; the first settles both outcomes and confirms the booking, the second only the declined intent.
+        self.assertEqual(sum(q['sql'].startswith('UPDATE') for q in queries), 4)
+        manual.refresh_from_db()
+        self.assertEqual(manual.payment_status, 'Failed')
+        # The same state the webhook path leaves.
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'Confirmed')
+
+    def test_command_reports_counts(self):
+        self.create_payments(['pi_ok'])
+        out = StringIO()
+        with fake_stripe_server({'pi_ok': 'succeeded'}) as url, override_settings(STRIPE_API_BASE=url):
+            call_command('reconcile_payments', stdout=out)
+        self.assertIn('Completed 1, failed 0, still pending 0, lookup errors 0', out.getvalue())
+
+    def test_idempotency_key_replays_the_first_payment(self):
+        client = APIClient()
+        client.force_authenticate(user=self.tenant)
+        data = {'booking': self.booking.pk, 'amount': '500.00', 'payment_method': 'Mobile Money'}
+        first = client.post('/api/v1/payments/', data, HTTP_IDEMPOTENCY_KEY='order-1')
+        retry = client.post('/api/v1/payments/', data, HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 200))
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Payment.objects.count(), 1)
+
+        changed = client.post('/api/v1/payments/', {**data, 'amount': '600.00'}, HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertEqual(changed.status_code, 422)
+        self.assertEqual(client.post('/api/v1/payments/', data, HTTP_IDEMPOTENCY_KEY='order-2').status_code, 201)
+        self.assertEqual(client.post('/api/v1/payments/', data).status_code, 201)
+        self.assertEqual(Payment.objects.count(), 3)
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET='whsec_test')
+class PaymentWebhookTests(TestCase):
+    def setUp(self):
+        tenant = User.objects.create_user(
+            username='webhooktenant', name='Tenant', email='webhooktenant@example.com',
+            phone_number='+255712345760', password='Test1234', role='tenant'
+        )
+        landlord = User.objects.create_user(
+            username='webhooklandlord', name='Landlord', email='webhooklandlord@example.com',
+            phone_number='+255712345761', password='Test1234', role='landlord'
+        )
+        prop = Property.objects.create(
+            owner=landlord, property_name='Hook Flat', property_type='Apartment', rental_type='long-term',
+            description='Test', price_per_month=500
+        )
+        start = datetime.date.today() + datetime.timedelta(days=1)
+        self.booking = Booking.objects.create(
+            user=tenant, property=prop, start_date=start, end_date=start + datetime.timedelta(days=30),
+            rental_type='long-term', monthly_rent=500
+        )
+        self.payment = Payment.objects.create(
+            booking=self.booking, amount=500, payment_method='Credit Card', stripe_payment_intent_id='pi_hook'
+        )
+
+    def deliver(self, event_id, event_type, created=1700000000, intent_id='pi_hook', secret='whsec_test',
+                timestamp=None):
+        body = json.dumps({
+            'id': event_id, 'type': event_type, 'created': created,
+            'data': {'object': {'id': intent_id, 'object': 'payment_intent'}},
+        }).encode()
+        timestamp = timestamp or int(time.time())
+        return self.client.post(
+            '/api/v1/payments/webhook/', body, content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=f't={timestamp},v1={webhooks.sign(body, timestamp, secret)}'
+        )
+
+    def test_succeeded_event_completes_payment_and_confirms_booking_once(self):
+        for _ in range(2):
+            response = self.deliver('evt_1', 'payment_intent.succeeded')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'received': 'evt_1'})
+        event = PaymentEvent.objects.get()
+        self.assertEqual((event.status, event.event_type, event.payment_intent_id), ('Applied', 'payment_intent.succeeded', 'pi_hook'))
+        self.assertIn('"evt_1"', event.payload)
+        self.payment.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertEqual((self.payment.payment_status, self.booking.status), ('Completed', 'Confirmed'))
+
+    def test_unverified_deliveries_are_rejected(self):
+        self.assertEqual(self.deliver('evt_1', 'payment_intent.succeeded', secret='whsec_other').status_code, 400)
+        stale = int(time.time()) - settings.STRIPE_WEBHOOK_TOLERANCE - 60
+        self.assertEqual(self.deliver('evt_1', 'payment_intent.succeeded', timestamp=stale).status_code, 400)
+        self.assertEqual(
+            self.client.post('/api/v1/payments/webhook/', b'{}', content_type='application/json').status_code, 400
+        )
+        with override_settings(STRIPE_WEBHOOK_SECRET=''):
+            self.assertEqual(self.deliver('evt_1', 'payment_intent.succeeded').status_code, 503)
+        self.assertFalse(PaymentEvent.objects.exists())
+
+    def test_events_apply_in_created_order(self):
+        # Delivered newest first: the late failure must not undo the success.
+        self.deliver('evt_2', 'payment_intent.succeeded', created=1700000200)
+        self.deliver('evt_1', 'payment_intent.payment_failed', created=1700000100)
+        self.assertEqual(
+            dict(PaymentEvent.objects.values_list('event_id', 'status')), {'evt_1': 'Ignored', 'evt_2': 'Applied'}
+        )
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'Completed')
+
+        # Queued together, they apply oldest first: a decline, then the retry that succeeded.
+        retried = Payment.objects.create(
+            booking=self.booking, amount=100, payment_method='Credit Card', stripe_payment_intent_id='pi_retry'
+        )
+        for event_id, created, event_type in [('evt_4', 400, 'payment_intent.succeeded'),
+                                              ('evt_3', 300, 'payment_intent.payment_failed')]:
+            PaymentEvent.objects.create(event_id=event_id, event_type=event_type, payment_intent_id='pi_retry',
+                                        created=datetime.datetime.fromtimestamp(1700000000 + created, datetime.timezone.utc),
+                                        payload='{}')
+        self.assertEqual(webhooks.apply_events('pi_retry'), 2)
+        retried.refresh_from_db()
+        self.assertEqual(retried.payment_status, 'Completed')
+        self.assertEqual(PaymentEvent.objects.filter(payment_intent_id='pi_retry', status='Applied').count(), 2)
+
+    def test_failure_in_the_same_second_never_undoes_a_success(self):
+        self.deliver('evt_1', 'payment_intent.succeeded', created=1700000100)
+        self.deliver('evt_2', 'payment_intent.payment_failed', created=1700000100)
+        self.deliver('evt_3', 'payment_intent.canceled', created=1700000200)
+        self.assertEqual(
+            dict(PaymentEvent.objects.values_list('event_id', 'status')),
+            {'evt_1': 'Applied', 'evt_2': 'Ignored', 'evt_3': 'Ignored'}
+        )
+        self.payment.refresh_from_db()
+        self.booking.refresh_from_db()
+        self.assertEqual((self.payment.payment_status, self.booking.status), ('Completed', 'Confirmed'))
+
+        # Queued together in arrival order, a same-second failure loses the tie too.
+        Payment.objects.filter(pk=self.payment.pk).update(payment_status='Pending', stripe_payment_intent_id='pi_tie')
+        at = datetime.datetime.fromtimestamp(1700000300, datetime.timezone.utc)
+        for event_id, event_type in [('evt_4', 'payment_intent.succeeded'), ('evt_5', 'payment_intent.payment_failed')]:
+            PaymentEvent.objects.create(event_id=event_id, event_type=event_type, payment_intent_id='pi_tie',
+                                        created=at, payload='{}')
+        webhooks.apply_events('pi_tie')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'Completed')
+        self.assertEqual(PaymentEvent.objects.get(event_id='evt_5').status, 'Ignored')
+
+    def test_other_event_types_are_stored_but_not_applied(self):
+        self.assertEqual(self.deliver('evt_1', 'payment_intent.created').status_code, 200)
+        self.assertEqual(PaymentEvent.objects.get().status, 'Ignored')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'Pending')
+
+    def test_replay_applies_unmatched_and_failed_events(self):
+        self.deliver('evt_early', 'payment_intent.succeeded', intent_id='pi_later')
+        with mock.patch.object(Booking.objects, 'filter', side_effect=DatabaseError('boom')), \
+                mock.patch('builtins.print'):
+            self.deliver('evt_boom', 'payment_intent.succeeded')
+        self.assertEqual(
+            dict(PaymentEvent.objects.values_list('event_id', 'status')), {'evt_early': 'Unmatched', 'evt_boom': 'Failed'}
+        )
+        self.assertEqual(PaymentEvent.objects.get(event_id='evt_boom').error, 'boom')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.payment_status, 'Pending')
+
+        later = Payment.objects.create(
+            booking=self.booking, amount=100, payment_method='Credit Card', stripe_payment_intent_id='pi_later'
+        )
+        out = StringIO()
+        call_command('replay_payment_events', '--status', 'Unmatched', 'Failed', stdout=out)
+        self.assertIn('Replayed 2 events (Applied 2)', out.getvalue())
+        later.refresh_from_db()
+        self.payment.refresh_from_db()
+        self.assertEqual((later.payment_status, self.payment.payment_status), ('Completed', 'Completed'))
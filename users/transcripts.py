@@ -0,0 +1,147 @@
+# users/transcripts.py
+# Buffered writer for chatbot transcripts. Chat turns are queued in memory and
+# written with one bulk insert per batch instead of one INSERT per message.
+import atexit
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+
+class TranscriptWriter:
+    """
+    Collects chat turns and writes them to ChatSession/ChatTurn in batches.
+
+    A batch is flushed inline by the turn that fills it (``batch_size``) and
+    by a daemon thread every ``flush_interval`` seconds, so a quiet process
+    still persists its last turns promptly. Turns more than
+    CHATBOT_SESSION_IDLE_MINUTES apart start a new session.
+    """
+
+    def __init__(self, batch_size=None, flush_interval=None):
+        self.batch_size = batch_size or settings.CHATBOT_TRANSCRIPT_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.CHATBOT_TRANSCRIPT_FLUSH_SECONDS
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def record(self, user, message, response, intent_name=''):
+        turn = (user.pk, message, response, intent_name or '', timezone.now())
+        with self._lock:
+            self._buffer.append(turn)
+            full = len(self._buffer) >= self.batch_size
+        if full or settings.BACKGROUND_TASKS_EAGER:
+            # The turns stay buffered for the next flush; the chat answer does not depend on them.
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Transcript flush failed: {e}")
+        else:
+            self._ensure_thread()
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='transcripts', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Transcript flush failed: {e}")
+            finally:
+                connection.close()
+
+    def flush(self):
+        """Write every buffered turn. Returns the number of turns written."""
+        from .models import User
+
+        with self._flush_lock:
+            with self._lock:
+                turns, self._buffer = self._buffer, []
+            if not turns:
+                return 0
+            try:
+                return self._write(turns)
+            except IntegrityError as e:
+                # Turns that can never be written, e.g. of a user purged since,
+                # must not block every later batch: write the others, drop them.
+                users = set(User._base_manager.filter(pk__in={turn[0] for turn in turns}).values_list('pk', flat=True))
+                kept = [turn for turn in turns if turn[0] in users]
+                written = 0
+                if kept and len(kept) < len(turns):
+                    try:
+                        written = self._write(kept)
+                    except IntegrityError:
+                        pass
+                print(f"Dropped {len(turns) - written} transcript turns that cannot be written: {e}")
+                return written
+            except Exception:
+                with self._lock:
+                    self._buffer[:0] = turns
+                raise
+
+    def _write(self, turns):
+        from .models import ChatSession, ChatTurn, User
+
+        idle = timedelta(minutes=settings.CHATBOT_SESSION_IDLE_MINUTES)
+        # Only each user's latest session: one lookup on idx_chatsession_user_activity per user.
+        latest = ChatSession.objects.filter(user_id=OuterRef('pk')).order_by('-last_activity').values('pk')[:1]
+        latest_ids = User._base_manager.filter(pk__in={turn[0] for turn in turns}).values(latest=Subquery(latest))
+        sessions = {
+            session.user_id: session
+            for session in ChatSession.objects.filter(pk__in=latest_ids).only('id', 'user_id', 'last_activity')
+        }
+
+        touched, new_sessions, rows = [], [], []
+        for user_id, message, response, intent_name, created_at in turns:
+            session = sessions.get(user_id)
+            if session is None or created_at - session.last_activity > idle:
+                session = sessions[user_id] = ChatSession(
+                    user_id=user_id, started_at=created_at, last_activity=created_at
+                )
+                new_sessions.append(session)
+            elif session.pk and session not in touched:
+                touched.append(session)
+            session.last_activity = created_at
+            rows.append(ChatTurn(
+                session=session, message=message, response=response,
+                intent_name=intent_name, created_at=created_at
+            ))
+
+        with transaction.atomic():
+            if touched:
+                ChatSession.objects.bulk_update(touched, ['last_activity'])
+            ChatSession.objects.bulk_create(new_sessions)
+            ChatTurn.objects.bulk_create(rows)
+        return len(rows)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = TranscriptWriter()
+                atexit.register(_writer.flush)
+    return _writer
+
+
+def record_turn(user, message, response, intent_name=''):
+    get_writer().record(user, message, response, intent_name)
@@ -5,13 +5,15 @@ from .views import (
     UserViewSet, LocationViewSet, PropertyViewSet, BookingViewSet, PaymentViewSet,
     ReviewViewSet, MessageViewSet, PropertyMediaViewSet, NotificationViewSet,
     BookingInquiryViewSet, RoomViewSet, AmenityViewSet, PropertyAmenityViewSet,
-    FavoriteViewSet, ManagerViewSet, MaintenanceRequestViewSet, SupportTicketViewSet
+    FavoriteViewSet, ManagerViewSet, MaintenanceRequestViewSet, SupportTicketViewSet, CatalogueViewSet,
+    chat_async, payment_webhook, query_metrics
 )
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
 router.register(r'locations', LocationViewSet, basename='location')
 router.register(r'properties', PropertyViewSet, basename='property')
+router.register(r'catalogue', CatalogueViewSet, basename='catalogue')
 router.register(r'bookings', BookingViewSet, basename='booking')
 router.register(r'payments', PaymentViewSet, basename='payment')
 router.register(r'reviews', ReviewViewSet, basename='review')
@@ -30,6 +32,9 @@ router.register(r'support/tickets', SupportTicketViewSet, basename='supportticke
 urlpatterns = [
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('users/chat/async/', chat_async, name='chat_async'),
+    path('metrics/queries/', query_metrics, name='query_metrics'),
+    path('payments/webhook/', payment_webhook, name='payment_webhook'),
     path('', include(router.urls)),
     path('api/', include(router.urls))
 ]
@@ -1,28 +1,54 @@
-from django.views.decorators.cache import cache_page
+import json
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed, ParseError
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework import status
 from rest_framework.pagination import PageNumberPagination
-from django.db.models import F, FloatField
+from rest_framework.settings import api_settings
+from rest_framework.throttling import AnonRateThrottle
+from django.db import IntegrityError, transaction
+from django.db.models import F, FloatField, Q
+from django.utils.dateparse import parse_datetime
 from django.db.models.functions import Sin, Cos, Radians, Sqrt, ACos
-from math import radians
+from math import ceil, radians, cos
+from django.conf import settings
+from django.utils.cache import patch_cache_control
 from .models import (
     User, Location, Property, Booking, Payment, Review, Message, PropertyMedia,
     Notification, BookingInquiry, Room, Amenity, PropertyAmenity, Favorite, Manager,
-    MaintenanceRequest, SupportTicket
+    MaintenanceRequest, SupportTicket, DeviceToken, ChatSession, CatalogueEntry
 )
 from .serializers import (
     UserSerializer, LocationSerializer, PropertySerializer, BookingSerializer,
     PaymentSerializer, ReviewSerializer, MessageSerializer, PropertyMediaSerializer,
-    NotificationSerializer, BookingInquirySerializer, RoomSerializer,
+    NotificationSerializer, NotificationBroadcastSerializer, NotificationPreferenceSerializer,
+    BookingInquirySerializer, RoomSerializer,
     AmenitySerializer, PropertyAmenitySerializer, FavoriteSerializer, ManagerSerializer,
-    MaintenanceRequestSerializer, SupportTicketSerializer
+    MaintenanceRequestSerializer, SupportTicketSerializer, ChatTurnSerializer, CatalogueEntrySerializer
 )
-from .chatbot import handle_chatbot_request
+from .chatbot import ProviderError, handle_chatbot_request, handle_chatbot_request_async
 from .fcm_utils import send_fcm_notification
+from .notifications import resolve_segment, notify_users, notify, get_preferences
+from .read_state import mark_read_in_chunks
+from .name_index import search_property_names
+from .transcripts import get_writer
+from .search_index import search_properties, rank_order
+from .facets import cached_facet_counts
+from .amenities import filter_by_amenities
+from .aggregates import SORTS as AGGREGATE_SORTS, filter_by_aggregates
+from .places import cities_named, filter_by_places, regions_named
+from .autocomplete import KINDS, suggest
+from .catalogue import cached_page
+from .query_budget import query_stats
+from .webhooks import SignatureError, ingest, verify_signature
 
 class IsAdmin(IsAuthenticated):
     def has_permission(self, request, view):
@@ -36,6 +62,81 @@ class IsTenant(IsAuthenticated):
     def has_permission(self, request, view):
         return super().has_permission(request, view) and request.user.role == 'tenant'
 
+class CatalogueRateThrottle(AnonRateThrottle):
+    # Per client IP, like the anonymous default, but sized for a public listing.
+    scope = 'catalogue'
+
+    def get_rate(self):
+        return settings.CATALOGUE_THROTTLE_RATE
+
+class PropertySearchFilter(filters.BaseFilterBackend):
+    """
+    Ranked full-text search over name, description, city, region and amenities
+    (users/search_index.py). Matches are ranked among the rows the backends
+    before it left, so list it last; views may also define ``search_owner()``
+    to limit matches to one owner's listings. Only the best
+    PROPERTY_SEARCH_MAX_RESULTS matches are listed; ``request.search_truncated``
+    says whether there were more. An explicit ``?sort_by=`` order is kept.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        owner_id = view.search_owner() if hasattr(view, 'search_owner') else None
+        limit = settings.PROPERTY_SEARCH_MAX_RESULTS
+        among = queryset.order_by().values_list('pk', flat=True)
+        ids = [pk for pk, _ in search_properties(query, limit=limit + 1, owner_id=owner_id, among=among)]
+        request.search_truncated = len(ids) > limit
+        ids = ids[:limit]
+        if not ids:
+            return queryset.none()
+        queryset = queryset.filter(pk__in=ids)
+        return queryset if queryset.query.order_by else queryset.order_by(rank_order(ids))
+
+class AmenityFilter(filters.BaseFilterBackend):
+    """
+    ``?amenities=Wi-Fi,Parking`` (names or ids) keeps properties that have all
+    of them, with one bitwise AND on ``Property.amenity_mask`` (users/amenities.py).
+    """
+    amenities_param = 'amenities'
+
+    def filter_queryset(self, request, queryset, view):
+        wanted = request.query_params.get(self.amenities_param, '').strip()
+        if not wanted:
+            return queryset
+        return filter_by_amenities(queryset, wanted)
+
+class PropertyAggregateFilter(filters.BaseFilterBackend):
+    """
+    ``?rating_min=4&reviews_min=10`` thresholds and ``?sort_by=rating`` (or
+    reviews, favorites, bookings) on the aggregate columns kept on Property
+    (users/aggregates.py), so neither needs a join.
+    """
+    sort_param = 'sort_by'
+
+    def filter_queryset(self, request, queryset, view):
+        try:
+            queryset = filter_by_aggregates(queryset, request.query_params)
+        except ValueError:
+            raise ParseError('Invalid parameters')
+        sort_by = request.query_params.get(self.sort_param)
+        if sort_by in AGGREGATE_SORTS:
+            queryset = queryset.order_by(*AGGREGATE_SORTS[sort_by])
+        return queryset
+
+class PlaceFilter(filters.BaseFilterBackend):
+    """
+    City and region filters as integer key lookups: ?city_id=&region_id=, or
+    ?location__city=&location__region= with a name in any spelling.
+    """
+    def filter_queryset(self, request, queryset, view):
+        try:
+            return filter_by_places(queryset, request.query_params)
+        except ValueError:
+            raise ParseError('Invalid parameters')
+
 class StandardPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
@@ -45,6 +146,10 @@ class UserViewSet(viewsets.ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAdmin]
     pagination_class = StandardPagination
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'chat_history': 3, 'create': 5, 'update': 6, 'partial_update': 6, 'destroy': 28,
+        'register': 5, 'chat': 7, 'update_fcm_token': 9, 'update_profile': 3, 'update_settings': 4,
+    }
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -93,9 +198,30 @@ class UserViewSet(viewsets.ModelViewSet):
         message = request.data.get('message')
         if not message:
             return Response({'error': 'Message required'}, status=400)
-        response = handle_chatbot_request(request.user, message)
+        try:
+            response = handle_chatbot_request(request.user, message)
+        except ProviderError as e:
+            return Response({'error': 'The chatbot is unavailable, try again later'}, status=e.status)
         return Response({'response': response})
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def chat_history(self, request):
+        # Make this process's buffered turns visible before reading.
+        get_writer().flush()
+        sessions = ChatSession.objects.filter(user=request.user)
+        session_id = request.query_params.get('session')
+        if session_id:
+            if not session_id.isdigit():
+                return Response({'error': 'Invalid session'}, status=400)
+            session = sessions.filter(pk=session_id).first()
+        else:
+            session = sessions.order_by('-last_activity').first()
+        if session is None:
+            return Response({'session': None, 'turns': []})
+        # Latest turns, oldest first, as a chat window displays them.
+        turns = list(session.turns.order_by('-created_at')[:100])[::-1]
+        return Response({'session': session.id, 'turns': ChatTurnSerializer(turns, many=True).data})
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def update_fcm_token(self, request, pk=None):
         user = self.get_object()
@@ -104,31 +230,41 @@ class UserViewSet(viewsets.ModelViewSet):
         fcm_token = request.data.get('fcm_token')
         if not fcm_token:
             return Response({'error': 'FCM token required'}, status=400)
+        platform = request.data.get('platform')
+        if platform and platform not in dict(DeviceToken.PLATFORM_CHOICES):
+            return Response({'error': 'Invalid platform'}, status=400)
+        DeviceToken.register(user, fcm_token, platform)
         user.fcm_token = fcm_token
-        user.save()
+        user.save(update_fields=['fcm_token'])
         return Response({'status': 'FCM token updated'})
 
 class LocationViewSet(viewsets.ModelViewSet):
     serializer_class = LocationSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 5, 'update': 14, 'partial_update': 14, 'destroy': 4}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
             return Location.objects.all()
+        # Semi-joins: no row fan-out through the join, so no DISTINCT over it.
         if self.request.user.role in ['landlord', 'hotel_manager']:
-            return Location.objects.filter(property__owner=self.request.user).distinct()
-        return Location.objects.filter(property__bookings__user=self.request.user).distinct()
+            properties = Property._base_manager.filter(owner=self.request.user)
+        else:
+            properties = Property._base_manager.filter(bookings__user=self.request.user)
+        return Location.objects.filter(pk__in=properties.values('location'))
 
 class PropertyViewSet(viewsets.ModelViewSet):
     serializer_class = PropertySerializer
     permission_classes = [IsLandlordOrManager]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['property_type', 'rental_type', 'availability_status', 'location__city', 'location__region']
-    search_fields = ['property_name', 'description']
+    filter_backends = [DjangoFilterBackend, PlaceFilter, AmenityFilter, PropertyAggregateFilter, PropertySearchFilter]
+    filterset_fields = ['property_type', 'rental_type', 'availability_status']
     pagination_class = StandardPagination
+    query_budgets = {
+        'list': 5, 'retrieve': 4, 'nearby': 5, 'name_search': 3, 'autocomplete': 5, 'update': 13, 'partial_update': 13,
+        'destroy': 31,
+    }
 
-    @cache_page(60 * 15)
     def get_queryset(self):
         if self.request.user.role == 'admin':
             return Property.objects.all()
@@ -137,6 +273,27 @@ class PropertyViewSet(viewsets.ModelViewSet):
     def get_serializer_context(self):
         return {'request': self.request}
 
+    def search_owner(self):
+        return None if self.request.user.role == 'admin' else self.request.user.id
+
+    def with_facets(self, response, queryset, scope=None):
+        # Facet counts ride along with the page when asked for: ?facets=true
+        if self.request.query_params.get('facets') in ('1', 'true') and isinstance(response.data, dict):
+            response.data['facets'] = cached_facet_counts(queryset, self.request, scope=scope)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+        else:
+            response = Response(self.get_serializer(queryset, many=True).data)
+        if hasattr(request, 'search_truncated') and isinstance(response.data, dict):
+            # The count and the last page only cover the best-ranked matches.
+            response.data['search_truncated'] = request.search_truncated
+        return self.with_facets(response, queryset, scope=self.search_owner())
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def nearby(self, request):
         try:
@@ -151,13 +308,14 @@ class PropertyViewSet(viewsets.ModelViewSet):
             price_per_night_max = request.query_params.get('price_per_night_max')
             price_per_month_min = request.query_params.get('price_per_month_min')
             price_per_month_max = request.query_params.get('price_per_month_max')
+            amenities = request.query_params.get('amenities')
 
             MAIN_CITY = "Dar es Salaam"
             queryset = Property.get_active().filter(
                 location__latitude__isnull=False,
                 location__longitude__isnull=False,
-                location__city=MAIN_CITY
-            )
+                location__canonical_city__in=cities_named(MAIN_CITY)
+            ).select_related('location', 'owner').prefetch_related('media')
 
             if property_type:
                 queryset = queryset.filter(property_type=property_type)
@@ -173,6 +331,9 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 queryset = queryset.filter(price_per_month__gte=float(price_per_month_min))
             if price_per_month_max:
                 queryset = queryset.filter(price_per_month__lte=float(price_per_month_max))
+            if amenities:
+                queryset = filter_by_amenities(queryset, amenities)
+            queryset = filter_by_aggregates(queryset, request.query_params)
 
             queryset = queryset.annotate(
                 distance=6371 * ACos(
@@ -187,30 +348,153 @@ class PropertyViewSet(viewsets.ModelViewSet):
                 queryset = queryset.order_by('price_per_night')
             elif sort_by == 'price_per_month':
                 queryset = queryset.order_by('price_per_month')
+            elif sort_by in AGGREGATE_SORTS:
+                queryset = queryset.order_by(*AGGREGATE_SORTS[sort_by])
             else:
                 queryset = queryset.order_by('distance')
 
             page = self.paginate_queryset(queryset)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
-                return self.get_paginated_response(serializer.data)
+                return self.with_facets(self.get_paginated_response(serializer.data), queryset)
 
             serializer = self.get_serializer(queryset, many=True)
             return Response(serializer.data)
         except (ValueError, TypeError):
             return Response({'error': 'Invalid parameters'}, status=400)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def name_search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q is required'}, status=400)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=400)
+        matches = search_property_names(query, limit=max(limit, 1))
+        return Response([
+            {'id': pk, 'property_name': name, 'score': score}
+            for pk, name, score in matches
+        ])
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def autocomplete(self, request):
+        prefix = request.query_params.get('q', '').strip()
+        if not prefix:
+            return Response({'error': 'q is required'}, status=400)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 20)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=400)
+        kinds = request.query_params.get('kinds')
+        kinds = [kind.strip() for kind in kinds.split(',')] if kinds else KINDS
+        if not set(kinds) <= set(KINDS):
+            return Response({'error': f"kinds must be among {', '.join(KINDS)}"}, status=400)
+        return Response([
+            {'kind': kind, 'id': pk, 'text': text, 'weight': weight}
+            for kind, pk, text, weight in suggest(prefix, limit=max(limit, 1), kinds=kinds)
+        ])
+
+class CatalogueViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Public, read-only catalogue of every active, available property, served
+    from the denormalized CatalogueEntry read model (users/catalogue.py).
+    Pages are cached until the catalogue changes and marked publicly cacheable.
+    """
+    serializer_class = CatalogueEntrySerializer
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    # Every caller is anonymous here, so the anonymous default of 100/day would apply.
+    throttle_classes = [CatalogueRateThrottle]
+    pagination_class = StandardPagination
+    query_budgets = {'list': 3, 'retrieve': 2}
+    SORTS = {
+        'newest': ('-created_at', '-pk'),
+        'price_per_month': ('price_per_month', 'pk'),
+        'price_per_night': ('price_per_night', 'pk'),
+        'rating': (F('rating').desc(nulls_last=True), '-review_count', 'pk'),
+    }
+
+    def get_queryset(self):
+        return CatalogueEntry.objects.filter(availability_status='Available')
+
+    def filter_catalogue(self, queryset, params):
+        for field in ('property_type', 'rental_type'):
+            if params.get(field):
+                queryset = queryset.filter(**{field: params[field]})
+        # Places by key, ?city_id=&region_id=, or by name in any spelling, ?city=&region=.
+        for field, named in (('city', cities_named), ('region', regions_named)):
+            if params.get(f'{field}_id'):
+                queryset = queryset.filter(**{f'{field}_id': int(params[f'{field}_id'])})
+            if params.get(field):
+                queryset = queryset.filter(**{f'{field}_id__in': named(params[field])})
+        for field in ('price_per_night', 'price_per_month'):
+            if params.get(f'{field}_min'):
+                queryset = queryset.filter(**{f'{field}__gte': float(params[f'{field}_min'])})
+            if params.get(f'{field}_max'):
+                queryset = queryset.filter(**{f'{field}__lte': float(params[f'{field}_max'])})
+        if params.get('bedrooms_min'):
+            queryset = queryset.filter(number_of_bedrooms__gte=int(params['bedrooms_min']))
+        if params.get('amenities'):
+            queryset = filter_by_amenities(queryset, params['amenities'])
+
+        sort_by = params.get('sort_by', 'newest')
+        if 'latitude' in params or 'longitude' in params:
+            user_lat = float(params.get('latitude'))
+            user_lon = float(params.get('longitude'))
+            radius_km = float(params.get('radius', 10))
+            # A bounding box on the indexed coordinates first, so the exact distance is only computed for nearby rows.
+            lat_delta = radius_km / 111.0
+            lon_delta = radius_km / (111.32 * max(cos(radians(user_lat)), 0.01))
+            queryset = queryset.filter(
+                latitude__range=(user_lat - lat_delta, user_lat + lat_delta),
+                longitude__range=(user_lon - lon_delta, user_lon + lon_delta),
+            ).annotate(
+                distance=6371 * ACos(
+                    Cos(Radians(user_lat)) * Cos(Radians(F('latitude'))) *
+                    Cos(Radians(F('longitude')) - Radians(user_lon)) +
+                    Sin(Radians(user_lat)) * Sin(Radians(F('latitude'))),
+                    output_field=FloatField()
+                )
+            ).filter(distance__lte=radius_km)
+            if sort_by == 'distance':
+                return queryset.order_by('distance', 'pk')
+        if sort_by not in self.SORTS:
+            raise ValueError(f"Unknown sort {sort_by}")
+        return queryset.order_by(*self.SORTS[sort_by])
+
+    def list(self, request, *args, **kwargs):
+        def render():
+            queryset = self.filter_catalogue(self.get_queryset(), request.query_params)
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data).data
+
+        try:
+            data = cached_page(request, render)
+        except (ValueError, TypeError):
+            return Response({'error': 'Invalid parameters'}, status=400)
+        return self.cacheable(Response(data))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cacheable(super().retrieve(request, *args, **kwargs))
+
+    def cacheable(self, response):
+        patch_cache_control(response, public=True, max_age=settings.CATALOGUE_MAX_AGE)
+        return response
+
 class BookingViewSet(viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [IsTenant | IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 5, 'retrieve': 4, 'update': 19, 'partial_update': 19, 'destroy': 16, 'update_status': 22}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return Booking.objects.all()
+            return Booking.objects.order_by('-start_date', '-pk')
         if self.request.user.role in ['landlord', 'hotel_manager']:
-            return Booking.get_active().filter(property__owner=self.request.user).select_related('property', 'user').prefetch_related('room')
-        return Booking.get_active().filter(user=self.request.user).select_related('property', 'user').prefetch_related('room')
+            return Booking.get_active().filter(property__owner=self.request.user).select_related('property__location', 'property__owner', 'user', 'room').prefetch_related('property__media').order_by('-start_date', '-pk')
+        return Booking.get_active().filter(user=self.request.user).select_related('property__location', 'property__owner', 'user', 'room').prefetch_related('property__media').order_by('-start_date', '-pk')
 
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
@@ -220,6 +504,8 @@ class BookingViewSet(viewsets.ModelViewSet):
             booking.status = new_status
             try:
                 booking.save()
+                recipient = booking.property.owner if request.user == booking.user else booking.user
+                notify(recipient, 'Alert', f"Booking for {booking.property.property_name} is now {new_status}")
                 return Response({'status': f'Booking updated to {new_status}'})
             except ValidationError as e:
                 return Response({'error': str(e)}, status=400)
@@ -229,6 +515,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardPagination
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'create': 3, 'update': 4, 'partial_update': 4, 'destroy': 5, 'update_status': 3,
+    }
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -237,6 +526,33 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Payment.get_active().filter(booking__property__owner=self.request.user)
         return Payment.get_active().filter(booking__user=self.request.user)
 
+    def create(self, request, *args, **kwargs):
+        # A retried request with the same Idempotency-Key gets the payment the first one created.
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': 'Idempotency-Key must be at most 255 characters'}, status=400)
+        key = f'{request.user.pk}:{key}'
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                payment = serializer.save(idempotency_key=key)
+        except IntegrityError:
+            payment = Payment._base_manager.filter(idempotency_key=key).first()
+            if payment is None:
+                raise
+            data = serializer.validated_data
+            if (payment.booking_id, payment.amount, payment.payment_method) != (
+                data['booking'].pk, data['amount'], data['payment_method']
+            ):
+                return Response({'error': 'Idempotency-Key was already used for a different payment'}, status=422)
+            response = Response(self.get_serializer(payment).data, status=200)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        return Response(self.get_serializer(payment).data, status=201)
+
     @action(detail=True, methods=['post'])
     def update_status(self, request, pk=None):
         payment = self.get_object()
@@ -251,35 +567,53 @@ class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [IsTenant]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 7, 'update': 8, 'partial_update': 8, 'destroy': 10}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return Review.objects.all()
+            return Review.objects.order_by('-created_at', '-pk')
         if self.request.user.role in ['landlord', 'hotel_manager']:
-            return Review.get_active().filter(property__owner=self.request.user)
-        return Review.get_active().filter(user=self.request.user)
+            return Review.get_active().filter(property__owner=self.request.user).order_by('-created_at', '-pk')
+        return Review.get_active().filter(user=self.request.user).order_by('-created_at', '-pk')
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardPagination
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'create': 4, 'update': 5, 'partial_update': 5, 'destroy': 5, 'mark_read': 3,
+        'mark_conversation_read': 4,
+    }
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return Message.objects.all()
-        return Message.get_active().filter(receiver=self.request.user) | Message.get_active().filter(sender=self.request.user)
+            return Message.objects.order_by('-sent_at', '-pk')
+        return Message.get_active().filter(Q(receiver=self.request.user) | Q(sender=self.request.user)).order_by('-sent_at', '-pk')
 
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         message = self.get_object()
         message.read_status = 'Read'
-        message.save()
+        message.save(update_fields=['read_status'])
         return Response({'status': 'Message marked as read'})
 
+    @action(detail=False, methods=['post'])
+    def mark_conversation_read(self, request):
+        try:
+            other_user = int(request.data.get('user'))
+            up_to = int(request.data.get('up_to'))
+        except (TypeError, ValueError):
+            return Response({'error': 'user and up_to message id required'}, status=400)
+        updated = mark_read_in_chunks(
+            Message.get_active().filter(receiver=request.user, sender_id=other_user, pk__lte=up_to)
+        )
+        return Response({'status': 'Conversation marked as read', 'updated': updated})
+
 class PropertyMediaViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyMediaSerializer
     permission_classes = [IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 5, 'update': 6, 'partial_update': 6, 'destroy': 5}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -293,11 +627,15 @@ class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardPagination
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'preferences': 6, 'create': 3, 'update': 3, 'partial_update': 3, 'destroy': 5,
+        'broadcast': 5, 'mark_all_read': 4,
+    }
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return Notification.objects.all()
-        queryset = Notification.get_active().filter(user=self.request.user)
+            return Notification.objects.order_by('-sent_at')
+        queryset = Notification.get_active().filter(user=self.request.user).order_by('-sent_at')
         read_status = self.request.query_params.get('read_status', None)
         if read_status:
             queryset = queryset.filter(read_status=read_status)
@@ -313,39 +651,92 @@ class NotificationViewSet(viewsets.ModelViewSet):
         if not success:
             print(f"Failed to send push notification to {self.request.user.username}")
 
+    @action(detail=False, methods=['post'], permission_classes=[IsAdmin | IsLandlordOrManager])
+    def broadcast(self, request):
+        serializer = NotificationBroadcastSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if request.user.role != 'admin':
+            # Landlords and managers may only reach tenants of their own properties.
+            owns_property = data['segment'] == 'property_tenants' and Property.get_active().filter(
+                pk=data['value'], owner=request.user
+            ).exists()
+            if not owns_property:
+                return Response({'error': 'Permission denied'}, status=403)
+        recipients = resolve_segment(data['segment'], data['value'])
+        notify_users(recipients, data['notification_type'], data['message'])
+        return Response({'status': 'Broadcast queued', 'recipients': recipients.count()}, status=202)
+
+    @action(detail=False, methods=['get', 'patch'])
+    def preferences(self, request):
+        preference = get_preferences(request.user)
+        if request.method == 'GET':
+            return Response(NotificationPreferenceSerializer(preference).data)
+        serializer = NotificationPreferenceSerializer(preference, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=400)
+
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        self.get_queryset().update(read_status='Read')
-        return Response({'status': 'All notifications marked as read'})
+        queryset = Notification.get_active().filter(user=request.user)
+        before = request.data.get('before')
+        if before:
+            before = parse_datetime(str(before))
+            if before is None:
+                return Response({'error': 'Invalid before timestamp'}, status=400)
+            queryset = queryset.filter(sent_at__lte=before)
+        updated = mark_read_in_chunks(queryset)
+        return Response({'status': 'All notifications marked as read', 'updated': updated})
 
 class BookingInquiryViewSet(viewsets.ModelViewSet):
     serializer_class = BookingInquirySerializer
     permission_classes = [IsTenant | IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 9, 'update': 5, 'partial_update': 5, 'destroy': 5}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return BookingInquiry.objects.all()
+            return BookingInquiry.objects.order_by('-inquiry_date', '-pk')
         if self.request.user.role in ['landlord', 'hotel_manager']:
-            return BookingInquiry.get_active().filter(property__owner=self.request.user)
-        return BookingInquiry.get_active().filter(user=self.request.user)
+            return BookingInquiry.get_active().filter(property__owner=self.request.user).order_by('-inquiry_date', '-pk')
+        return BookingInquiry.get_active().filter(user=self.request.user).order_by('-inquiry_date', '-pk')
+
+    def perform_create(self, serializer):
+        inquiry = serializer.save()
+        notify(
+            inquiry.property.owner,
+            'Message',
+            f"New inquiry for {inquiry.property.property_name} from {inquiry.user.username}"
+        )
 
 class MaintenanceRequestViewSet(viewsets.ModelViewSet):
     serializer_class = MaintenanceRequestSerializer
     permission_classes = [IsTenant | IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 9, 'update': 5, 'partial_update': 5, 'destroy': 5}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return MaintenanceRequest.objects.all()
+            return MaintenanceRequest.objects.order_by('-created_at', '-pk')
         if self.request.user.role in ['landlord', 'hotel_manager']:
-            return MaintenanceRequest.get_active().filter(property__owner=self.request.user)
-        return MaintenanceRequest.get_active().filter(user=self.request.user)
+            return MaintenanceRequest.get_active().filter(property__owner=self.request.user).order_by('-created_at', '-pk')
+        return MaintenanceRequest.get_active().filter(user=self.request.user).order_by('-created_at', '-pk')
+
+    def perform_create(self, serializer):
+        maintenance_request = serializer.save()
+        notify(
+            maintenance_request.property.owner,
+            'Alert',
+            f"New maintenance request for {maintenance_request.property.property_name}"
+        )
 
 class RoomViewSet(viewsets.ModelViewSet):
     serializer_class = RoomSerializer
     permission_classes = [IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 3, 'update': 4, 'partial_update': 4, 'destroy': 4}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -356,6 +747,7 @@ class AmenityViewSet(viewsets.ModelViewSet):
     serializer_class = AmenitySerializer
     permission_classes = [IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 6, 'update': 7, 'partial_update': 7, 'destroy': 13}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -366,6 +758,7 @@ class PropertyAmenityViewSet(viewsets.ModelViewSet):
     serializer_class = PropertyAmenitySerializer
     permission_classes = [IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 11, 'update': 15, 'partial_update': 15, 'destroy': 9}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -376,6 +769,7 @@ class FavoriteViewSet(viewsets.ModelViewSet):
     serializer_class = FavoriteSerializer
     permission_classes = [IsTenant]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 9, 'update': 11, 'partial_update': 11, 'destroy': 7}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -386,6 +780,7 @@ class ManagerViewSet(viewsets.ModelViewSet):
     serializer_class = ManagerSerializer
     permission_classes = [IsLandlordOrManager]
     pagination_class = StandardPagination
+    query_budgets = {'list': 4, 'retrieve': 3, 'create': 4, 'update': 5, 'partial_update': 5, 'destroy': 3}
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
@@ -396,21 +791,22 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     serializer_class = SupportTicketSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = StandardPagination
+    query_budgets = {
+        'list': 4, 'retrieve': 3, 'create': 5, 'update': 3, 'partial_update': 3, 'destroy': 5, 'update_status': 5,
+    }
 
     def get_queryset(self):
         if self.request.user.role == 'admin':
-            return SupportTicket.objects.all()
-        return SupportTicket.get_active().filter(user=self.request.user)
+            return SupportTicket.objects.order_by('-created_at', '-pk')
+        return SupportTicket.get_active().filter(user=self.request.user).select_related('user').order_by('-created_at', '-pk')
 
     def perform_create(self, serializer):
         ticket = serializer.save(user=self.request.user)
-        admin = User.objects.filter(role='admin').first()
-        if admin:
-            Notification.objects.create(
-                user=admin,
-                notification_type='Support',
-                message=f"New support ticket #{ticket.id} from {self.request.user.username}"
-            )
+        notify_users(
+            resolve_segment('role', 'admin'),
+            'Support',
+            f"New support ticket #{ticket.id} from {self.request.user.username}"
+        )
 
     @action(detail=True, methods=['post'], permission_classes=[IsAdmin])
     def update_status(self, request, pk=None):
@@ -425,4 +821,63 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
                 message=f"Your ticket #{ticket.id} is now {new_status}"
             )
             return Response({'status': f'Ticket updated to {new_status}'})
-        return Response({'error': 'Invalid status'}, status=400)
\ No newline at end of file
+        return Response({'error': 'Invalid status'}, status=400)
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def query_metrics(request):
+    # This process's per-endpoint query counts, SQL time and repeated statements.
+    return Response(query_stats())
+
+@csrf_exempt
+@require_POST
+def payment_webhook(request):
+    # Provider callbacks: verify, store and acknowledge. The event is applied
+    # on the background pool, so bursts of deliveries never wait on it.
+    secret = settings.STRIPE_WEBHOOK_SECRET
+    if not secret:
+        return JsonResponse({'error': 'Payment webhooks are not configured'}, status=503)
+    try:
+        verify_signature(
+            request.body, request.headers.get('Stripe-Signature'), secret, settings.STRIPE_WEBHOOK_TOLERANCE
+        )
+    except SignatureError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    try:
+        event_id = ingest(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid event payload'}, status=400)
+    return JsonResponse({'received': event_id})
+
+@csrf_exempt
+@require_POST
+async def chat_async(request):
+    # Native async counterpart of UserViewSet.chat for the ASGI app: the
+    # Dialogflow round-trip awaits on the event loop instead of holding a
+    # worker thread. Only the ORM work runs in the sync thread pool.
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        auth = None
+    if auth is None:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    try:
+        message = json.loads(request.body or b'{}').get('message')
+    except (ValueError, AttributeError):
+        message = None
+    if not message:
+        return JsonResponse({'error': 'Message required'}, status=400)
+    # The same throttles DRF applies to UserViewSet.chat.
+    request.user = auth[0]
+    for throttle in [throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES]:
+        if not await sync_to_async(throttle.allow_request)(request, None):
+            response = JsonResponse({'error': 'Request was throttled'}, status=429)
+            wait = throttle.wait()
+            if wait is not None:
+                response['Retry-After'] = str(ceil(wait))
+            return response
+    try:
+        response = await handle_chatbot_request_async(auth[0], message)
+    except ProviderError as e:
+        return JsonResponse({'error': 'The chatbot is unavailable, try again later'}, status=e.status)
+    return JsonResponse({'response': response})
@@ -0,0 +1,197 @@
+# users/webhooks.py
+# Payment webhooks. The endpoint only checks the Stripe-Signature header and
+# stores the raw event, one INSERT that the unique event_id turns into a no-op
+# for redeliveries, then acknowledges. Applying events to Payment and Booking
+# happens on the background pool: each task takes every pending event of one
+# PaymentIntent, in the order the provider created them, under a lock held per
+# intent (a row lock on its payments across processes), so a payment's events
+# never apply concurrently or out of order while different payments proceed in
+# parallel. Events that arrive before their payment exists are left Unmatched;
+# replay_payment_events retries them, and reconcile_payments settles the
+# payment in the meantime.
+import hashlib
+import hmac
+import json
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Payment, PaymentEvent
+from .payments import settle
+from .tasks import drain, enqueue
+
+# Event types that settle a payment; every other type is stored as Ignored.
+EVENT_OUTCOMES = {
+    'payment_intent.succeeded': 'Completed',
+    'payment_intent.payment_failed': 'Failed',
+    'payment_intent.canceled': 'Failed',
+}
+
+_intent_locks = [threading.Lock() for _ in range(64)]
+_scheduled = set()  # Intents with a task queued and not yet started
+_scheduled_lock = threading.Lock()
+
+
+class SignatureError(ValueError):
+    pass
+
+
+def sign(payload, timestamp, secret):
+    """The v1 signature of ``payload`` (bytes) sent at ``timestamp``."""
+    return hmac.new(secret.encode(), f'{timestamp}.'.encode() + payload, hashlib.sha256).hexdigest()
+
+
+def verify_signature(payload, header, secret, tolerance, now=None):
+    """Raise SignatureError unless ``header`` signs ``payload`` with ``secret`` within ``tolerance`` seconds."""
+    timestamp, signatures = None, []
+    for item in (header or '').split(','):
+        key, _, value = item.strip().partition('=')
+        if key == 't':
+            timestamp = value
+        elif key == 'v1':
+            signatures.append(value)
+    try:
+        timestamp = int(timestamp)
+    except (TypeError, ValueError):
+        raise SignatureError("Missing or malformed signature header")
+    expected = sign(payload, timestamp, secret)
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise SignatureError("No matching signature")
+    if abs((now or time.time()) - timestamp) > tolerance:
+        raise SignatureError("Signature timestamp outside the tolerance")
+
+
+def intent_id_of(event):
+    """The PaymentIntent an event is about, or '' for events about anything else."""
+    obj = (event.get('data') or {}).get('object') or {}
+    if obj.get('object') == 'payment_intent':
+        return obj.get('id') or ''
+    # Charges, refunds and disputes name their intent.
+    intent = obj.get('payment_intent')
+    return intent if isinstance(intent, str) else ''
+
+
+def ingest(payload):
+    """
+    Store the raw event ``payload`` (bytes, already verified) and schedule it.
+    Returns the event id; raises ValueError if the payload is not an event.
+    """
+    event = json.loads(payload)
+    if not isinstance(event, dict) or not event.get('id') or not event.get('type'):
+        raise ValueError("Not an event")
+    try:
+        created = datetime.fromtimestamp(int(event['created']), dt_timezone.utc)
+    except (KeyError, TypeError, ValueError, OverflowError):
+        raise ValueError("Event has no valid created timestamp")
+    intent_id = intent_id_of(event)
+    status = 'Pending' if intent_id and event['type'] in EVENT_OUTCOMES else 'Ignored'
+    PaymentEvent.objects.bulk_create(
+        [PaymentEvent(
+            event_id=event['id'], event_type=event['type'], payment_intent_id=intent_id, created=created,
+            payload=payload.decode(), status=status,
+            processed_at=None if status == 'Pending' else timezone.now(),
+        )],
+        # A redelivery: the row from the first delivery wins.
+        ignore_conflicts=True
+    )
+    if status == 'Pending':
+        schedule(intent_id)
+    return event['id']
+
+
+def schedule(intent_id):
+    """Apply ``intent_id``'s pending events on the background pool, once per burst of deliveries."""
+    with _scheduled_lock:
+        if intent_id in _scheduled:
+            return
+        _scheduled.add(intent_id)
+    enqueue(_apply_scheduled, intent_id)
+
+
+def _apply_scheduled(intent_id):
+    with _scheduled_lock:
+        # Events stored from here on schedule another run.
+        _scheduled.discard(intent_id)
+    return apply_events(intent_id)
+
+
+def apply_events(intent_id):
+    """Apply the pending events of ``intent_id`` in order. Returns how many were processed."""
+    try:
+        with _intent_locks[zlib.crc32(intent_id.encode()) % len(_intent_locks)], transaction.atomic():
+            return _apply(intent_id)
+    except Exception as e:
+        print(f"Payment events for {intent_id} failed: {e}")
+        return PaymentEvent.objects.filter(payment_intent_id=intent_id, status='Pending').update(
+            status='Failed', error=str(e), processed_at=timezone.now()
+        )
+
+
+def _apply(intent_id):
+    # Locking the payments serializes workers in other processes on the same intent.
+    payments = list(
+        Payment.objects.select_for_update(of=('self',)).filter(stripe_payment_intent_id=intent_id).values_list(
+            'pk', 'payment_status'
+        )
+    )
+    events = list(
+        PaymentEvent.objects.filter(payment_intent_id=intent_id, status='Pending').order_by('created', 'pk').values_list(
+            'pk', 'event_type', 'created'
+        )
+    )
+    if not events:
+        return 0
+    now = timezone.now()
+    if not payments:
+        return PaymentEvent.objects.filter(pk__in=[pk for pk, _, _ in events]).update(status='Unmatched', processed_at=now)
+    latest = PaymentEvent.objects.filter(payment_intent_id=intent_id, status='Applied').aggregate(
+        latest=Max('created')
+    )['latest']
+    # A succeeded intent is final: nothing after it fails the payment.
+    completed = all(status == 'Completed' for _, status in payments)
+    outcome, processed = None, {'Applied': [], 'Ignored': []}
+    for pk, event_type, created in events:
+        event_outcome = EVENT_OUTCOMES.get(event_type)
+        if event_outcome is None or (latest is not None and created < latest):
+            # Replayed from elsewhere, or delivered late: a newer event already decided the payment.
+            processed['Ignored'].append(pk)
+        elif event_outcome != 'Completed' and (completed or created == latest):
+            # ``created`` has one-second resolution, so a tie is no evidence of order; success wins it.
+            processed['Ignored'].append(pk)
+        else:
+            outcome, latest = event_outcome, created
+            completed = completed or outcome == 'Completed'
+            processed['Applied'].append(pk)
+    if outcome:
+        settled = Payment.objects.filter(pk__in=[pk for pk, _ in payments]).exclude(payment_status=outcome)
+        if outcome != 'Completed':
+            settled = settled.exclude(payment_status='Completed')
+        settle(settled, outcome)
+    for status, pks in processed.items():
+        if pks:
+            PaymentEvent.objects.filter(pk__in=pks).update(status=status, processed_at=now)
+    return len(events)
+
+
+def replay(event_ids=(), statuses=()):
+    """
+    Return the events ``event_ids`` and those in ``statuses`` to Pending, then
+    apply every pending event and wait for the pool. Returns the replayed
+    events' ``{status: count}`` afterwards.
+    """
+    selected = PaymentEvent.objects.exclude(payment_intent_id='')
+    if event_ids or statuses:
+        chosen = selected.filter(event_id__in=event_ids) | selected.filter(status__in=statuses)
+        chosen.update(status='Pending', error='', processed_at=None)
+    pending = selected.filter(status='Pending')
+    pks = list(pending.values_list('pk', flat=True))
+    for intent_id in list(pending.order_by().values_list('payment_intent_id', flat=True).distinct()):
+        schedule(intent_id)
+    drain()
+    return dict(Counter(PaymentEvent.objects.filter(pk__in=pks).values_list('status', flat=True)))
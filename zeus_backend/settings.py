@@ -33,6 +33,9 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.db_router.ReadYourWritesMiddleware',
+    'users.db_connections.ConnectionWaitMiddleware',
+    'users.query_budget.QueryBudgetMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -51,6 +54,26 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# In-process background work (users/tasks.py)
+BACKGROUND_TASKS_EAGER = config('BACKGROUND_TASKS_EAGER', default=False, cast=bool)
+BACKGROUND_TASK_WORKERS = config('BACKGROUND_TASK_WORKERS', default=4, cast=int)
+NOTIFICATION_FANOUT_CHUNK_SIZE = config('NOTIFICATION_FANOUT_CHUNK_SIZE', default=1000, cast=int)
+NOTIFICATION_DIGEST_WINDOW_MINUTES = config('NOTIFICATION_DIGEST_WINDOW_MINUTES', default=15, cast=int)  # 0 disables digests
+
+# Retention for the archive_history job (users/retention.py)
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=90, cast=int)
+MESSAGE_RETENTION_DAYS = config('MESSAGE_RETENTION_DAYS', default=365, cast=int)
+SOFT_DELETE_RETENTION_DAYS = config('SOFT_DELETE_RETENTION_DAYS', default=30, cast=int)  # Before purge_soft_deleted removes a row
+READ_STATE_BATCH_SIZE = config('READ_STATE_BATCH_SIZE', default=500, cast=int)  # Rows per mark-read UPDATE
+
+# Per-request query accounting (users/query_budget.py). Endpoints without a declared
+# budget get QUERY_BUDGET_DEFAULT; the X-Query-* headers are sent when QUERY_BUDGET_HEADERS is on.
+QUERY_BUDGET_DEFAULT = config('QUERY_BUDGET_DEFAULT', default=30, cast=int)
+QUERY_BUDGET_HEADERS = config('QUERY_BUDGET_HEADERS', default=DEBUG, cast=bool)
+
+# Requests per client IP to the public catalogue (users/views.py CatalogueViewSet); empty disables.
+CATALOGUE_THROTTLE_RATE = config('CATALOGUE_THROTTLE_RATE', default='600/minute', cast=lambda v: v or None)
+
 # Override caching and throttling for tests
 if 'test' in os.sys.argv:
     CACHES = {
@@ -60,6 +83,7 @@ if 'test' in os.sys.argv:
         }
     }
     REST_FRAMEWORK['DEFAULT_THROTTLE_CLASSES'] = []
+    BACKGROUND_TASKS_EAGER = True
 else:
     CACHES = {
         'default': {
@@ -95,6 +119,21 @@ ROOT_URLCONF = 'zeus_backend.urls'
 
 # zeus_backend/settings.py
 FCM_SERVER_KEY = "your-fcm-server-key-here"  # Replace with your actual key
+FCM_ENDPOINT = config('FCM_ENDPOINT', default='https://fcm.googleapis.com/fcm/send')
+FCM_MULTICAST_BATCH_SIZE = config('FCM_MULTICAST_BATCH_SIZE', default=1000, cast=int)  # Provider limit per request
+FCM_MAX_CONCURRENCY = config('FCM_MAX_CONCURRENCY', default=8, cast=int)
+FCM_TIMEOUT = config('FCM_TIMEOUT', default=10, cast=int)
+
+# Payment processor (users/payments.py). STRIPE_API_BASE can point at a local stand-in.
+STRIPE_SECRET_KEY = config('STRIPE_SECRET_KEY', default='')
+STRIPE_API_BASE = config('STRIPE_API_BASE', default='https://api.stripe.com')
+PAYMENT_PROVIDER_MAX_CONCURRENCY = config('PAYMENT_PROVIDER_MAX_CONCURRENCY', default=8, cast=int)
+PAYMENT_PROVIDER_TIMEOUT = config('PAYMENT_PROVIDER_TIMEOUT', default=10, cast=int)
+PAYMENT_RECONCILE_BATCH_SIZE = config('PAYMENT_RECONCILE_BATCH_SIZE', default=500, cast=int)  # Pending payments per page
+# Payment webhooks (users/webhooks.py): deliveries must be signed with STRIPE_WEBHOOK_SECRET
+# and at most STRIPE_WEBHOOK_TOLERANCE seconds old. They are applied on the background pool.
+STRIPE_WEBHOOK_SECRET = config('STRIPE_WEBHOOK_SECRET', default='')
+STRIPE_WEBHOOK_TOLERANCE = config('STRIPE_WEBHOOK_TOLERANCE', default=300, cast=int)
 
 TEMPLATES = [
     {
@@ -122,8 +161,31 @@ DATABASES = {
         'PASSWORD': config('DB_PASSWORD', default='oncetttt'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        # Persistent connections (users/db_connections.py): each worker thread keeps its
+        # connection for DB_CONN_MAX_AGE seconds and pings it before reusing it in a new request.
+        'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=300, cast=int),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'connect_timeout': config('DB_CONNECT_TIMEOUT', default=5, cast=int)},
     }
 }
+# Worker layout, for sizing the connections above: every process holds up to
+# WEB_THREADS + BACKGROUND_TASK_WORKERS of them (`check --deploy --database default` compares
+# the total with the server's max_connections). Under ASGI set DB_CONN_MAX_AGE=0.
+WEB_CONCURRENCY = config('WEB_CONCURRENCY', default=4, cast=int)
+WEB_THREADS = config('WEB_THREADS', default=1, cast=int)
+
+# Read replicas (users/db_router.py): comma-separated hosts that stream from the primary
+# and share its credentials. Safe reads go to a replica lagging at most REPLICA_MAX_LAG_SECONDS
+# (re-measured every REPLICA_LAG_CHECK_SECONDS); a client that writes is pinned to the
+# primary for REPLICA_PIN_SECONDS so it reads its own writes.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=lambda v: [s.strip() for s in v.split(',') if s.strip()])):
+    DATABASES[f'replica_{_index + 1}'] = {**DATABASES['default'], 'HOST': _host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{_index + 1}')
+DATABASE_ROUTERS = ['users.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = config('REPLICA_PIN_SECONDS', default=5, cast=int)
+REPLICA_MAX_LAG_SECONDS = config('REPLICA_MAX_LAG_SECONDS', default=2, cast=float)
+REPLICA_LAG_CHECK_SECONDS = config('REPLICA_LAG_CHECK_SECONDS', default=1, cast=float)
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -147,6 +209,45 @@ SESSION_COOKIE_SECURE = config('SESSION_COOKIE_SECURE', default=False, cast=bool
 CSRF_COOKIE_SECURE = config('CSRF_COOKIE_SECURE', default=False, cast=bool)
 
 DIALOGFLOW_CREDENTIALS = r"c:\Users\DAVID\Downloads\zeuschatbot-wesq-d95fd845d6b6.json"  # Your existing path
+DIALOGFLOW_PROJECT_ID = config('DIALOGFLOW_PROJECT_ID', default='zeuschatbot-wesq')
+DIALOGFLOW_EMULATOR_HOST = config('DIALOGFLOW_EMULATOR_HOST', default='')  # host:port of a local stand-in (insecure channel)
+DIALOGFLOW_CHANNEL_POOL_SIZE = config('DIALOGFLOW_CHANNEL_POOL_SIZE', default=4, cast=int)
+DIALOGFLOW_TIMEOUT = config('DIALOGFLOW_TIMEOUT', default=10, cast=float)
+
+# Local intent classifier in front of Dialogflow (users/intent_classifier.py)
+CHATBOT_LOCAL_INTENTS = config('CHATBOT_LOCAL_INTENTS', default=True, cast=bool)
+CHATBOT_INTENT_PHRASES = BASE_DIR / 'users' / 'data' / 'intent_phrases.json'
+CHATBOT_LOCAL_INTENT_THRESHOLD = config('CHATBOT_LOCAL_INTENT_THRESHOLD', default=0.5, cast=float)
+CHATBOT_LOCAL_INTENT_MARGIN = config('CHATBOT_LOCAL_INTENT_MARGIN', default=0.1, cast=float)
+
+# Chatbot transcripts (users/transcripts.py)
+CHATBOT_TRANSCRIPT_BATCH_SIZE = config('CHATBOT_TRANSCRIPT_BATCH_SIZE', default=100, cast=int)
+CHATBOT_TRANSCRIPT_FLUSH_SECONDS = config('CHATBOT_TRANSCRIPT_FLUSH_SECONDS', default=2.0, cast=float)
+CHATBOT_SESSION_IDLE_MINUTES = config('CHATBOT_SESSION_IDLE_MINUTES', default=30, cast=int)
+
+# Cached answers for data-backed chatbot intents (users/intent_cache.py)
+CHATBOT_INTENT_CACHE = config('CHATBOT_INTENT_CACHE', default=True, cast=bool)
+CHATBOT_GLOBAL_CACHE_TTL = config('CHATBOT_GLOBAL_CACHE_TTL', default=60, cast=int)  # e.g. ListProperties
+CHATBOT_USER_CACHE_TTL = config('CHATBOT_USER_CACHE_TTL', default=300, cast=int)  # booking status, property details
+
+# Fuzzy property-name lookup (users/name_index.py)
+PROPERTY_NAME_MIN_SCORE = config('PROPERTY_NAME_MIN_SCORE', default=0.4, cast=float)
+PROPERTY_NAME_INDEX_TTL = config('PROPERTY_NAME_INDEX_TTL', default=300, cast=int)  # seconds between full rebuilds
+
+# Ranked property search (users/search_index.py)
+PROPERTY_SEARCH_MAX_RESULTS = config('PROPERTY_SEARCH_MAX_RESULTS', default=1000, cast=int)  # matches listed; beyond it search_truncated is set
+PROPERTY_SEARCH_INDEX_TTL = config('PROPERTY_SEARCH_INDEX_TTL', default=300, cast=int)
+
+# Search-box suggestions (users/autocomplete.py)
+PROPERTY_AUTOCOMPLETE_INDEX_TTL = config('PROPERTY_AUTOCOMPLETE_INDEX_TTL', default=300, cast=int)
+
+# Facet counts on property listings (users/facets.py); 0 disables the cache
+PROPERTY_FACET_CACHE_TTL = config('PROPERTY_FACET_CACHE_TTL', default=30, cast=int)
+
+# Public property catalogue (users/catalogue.py). Cached pages are retired on every catalogue
+# change; CATALOGUE_MAX_AGE is the Cache-Control max-age clients and CDNs may reuse a page for.
+CATALOGUE_CACHE_TTL = config('CATALOGUE_CACHE_TTL', default=300, cast=int)
+CATALOGUE_MAX_AGE = config('CATALOGUE_MAX_AGE', default=30, cast=int)
 
 LOGGING = {
     'version': 1,